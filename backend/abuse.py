@@ -0,0 +1,237 @@
+import argparse
+import hashlib
+import json
+import time
+from collections import Counter, deque
+from datetime import datetime, timedelta, timezone
+
+from pymongo import UpdateOne
+
+from config import load_config
+from db import ensure_indexes, get_db
+from tallies import read_tallies
+
+
+STATE_ID = "abuse"
+SWEEP_EVERY = 10000
+FLUSH_EVERY = 1000
+
+# (rule, grouping fields, threshold multiplier). A group is a burst once it
+# has at least threshold x multiplier votes inside the window; every vote of
+# the burst is flagged. Shared NAT plus the same phone model is common, so
+# device-wide bursts need more votes than same-candidate ones.
+RULES = (
+    ("same_candidate_burst", ("ip_prefix", "ua_hash", "candidate_id"), 1),
+    ("device_burst", ("ip_prefix", "ua_hash"), 4),
+)
+
+
+class _Group:
+    __slots__ = ("votes", "cluster")
+
+    def __init__(self):
+        # [voted_at, vote_id, constituency_no, candidate_id, flagged]
+        self.votes = deque()
+        self.cluster = None
+
+
+class BurstDetector:
+    """Sliding-window burst detection over votes in ``voted_at`` order.
+
+    Memory is bounded by the votes inside one window: groups whose newest
+    vote has left the window are dropped on each sweep.
+    """
+
+    def __init__(self, window: timedelta, threshold: int):
+        self.window = window
+        self.rules = [(name, fields, threshold * mult) for name, fields, mult in RULES]
+        self.groups = [{} for _ in self.rules]
+        self.seen = 0
+
+    def add(self, vote: dict) -> list:
+        """Feed one vote; returns (vote_id, flag) pairs newly flagged by it."""
+        if not vote.get("ip_prefix"):
+            return []
+        now = vote["voted_at"]
+        horizon = now - self.window
+        flags = []
+        for (rule, fields, limit), groups in zip(self.rules, self.groups):
+            key = tuple(vote.get(f) for f in fields)
+            group = groups.get(key)
+            if group is None:
+                group = groups[key] = _Group()
+            votes = group.votes
+            while votes and votes[0][0] < horizon:
+                votes.popleft()
+            if not votes:
+                group.cluster = None
+            votes.append([now, vote["_id"], vote.get("constituency_no"), vote.get("candidate_id"), False])
+            if len(votes) < limit:
+                continue
+            if group.cluster is None:
+                digest = hashlib.sha1(f"{rule}|{key}|{votes[0][0].isoformat()}".encode("utf-8")).hexdigest()
+                group.cluster = digest[:16]
+            for entry in votes:
+                if entry[4]:
+                    continue
+                entry[4] = True
+                flags.append((entry[1], {
+                    "rule": rule,
+                    "cluster_id": group.cluster,
+                    "constituency_no": entry[2],
+                    "candidate_id": entry[3],
+                    "voted_at": entry[0],
+                    "ip_prefix": vote.get("ip_prefix"),
+                    "ua_hash": vote.get("ua_hash"),
+                }))
+
+        self.seen += 1
+        if self.seen % SWEEP_EVERY == 0:
+            self.sweep(now)
+        return flags
+
+    def sweep(self, now):
+        for groups in self.groups:
+            horizon = now - self.window
+            stale = [k for k, g in groups.items() if not g.votes or g.votes[-1][0] < horizon]
+            for k in stale:
+                del groups[k]
+
+
+def _flush(db, pending: list, counts: Counter, dry_run: bool) -> int:
+    """Store flags; only votes not flagged before count towards the adjusted tallies."""
+    by_id = {}
+    for vote_id, flag in pending:
+        # A vote caught by several rules keeps the first one.
+        by_id.setdefault(vote_id, flag)
+    if not by_id:
+        return 0
+    if dry_run:
+        for flag in by_id.values():
+            counts[(flag["constituency_no"], flag["candidate_id"])] += 1
+        return len(by_id)
+    result = db.vote_flags.bulk_write([
+        UpdateOne({"_id": vote_id}, {"$setOnInsert": flag}, upsert=True)
+        for vote_id, flag in by_id.items()
+    ], ordered=False)
+    new = 0
+    for vote_id in (result.upserted_ids or {}).values():
+        flag = by_id[vote_id]
+        counts[(flag["constituency_no"], flag["candidate_id"])] += 1
+        new += 1
+    return new
+
+
+def write_adjusted_tallies(db, new_counts: Counter):
+    """Add newly flagged votes to ``flag_counts`` and rewrite ``adjusted_tallies``."""
+    if new_counts:
+        db.flag_counts.bulk_write([
+            UpdateOne({"constituency_no": no}, {"$inc": {f"flagged.{cid}": n}}, upsert=True)
+            for (no, cid), n in new_counts.items()
+        ], ordered=False)
+    flagged = {d["constituency_no"]: d.get("flagged", {}) for d in db.flag_counts.find({}, {"_id": 0})}
+    now = datetime.now(timezone.utc)
+    ops = []
+    for t in read_tallies(db):
+        no = t.get("constituency_no")
+        seat_flags = flagged.get(no, {})
+        totals = t.get("totals", {})
+        ops.append(UpdateOne({"constituency_no": no}, {"$set": {
+            "totals": {cid: max(v - seat_flags.get(cid, 0), 0) for cid, v in totals.items()},
+            "flagged": seat_flags,
+            "updated_at": now,
+        }}, upsert=True))
+    if ops:
+        db.adjusted_tallies.bulk_write(ops, ordered=False)
+
+
+def run(db, window: timedelta, threshold: int, settle: timedelta, full: bool = False,
+        dry_run: bool = False, out=None) -> dict:
+    """One detection pass; incremental from the stored watermark unless ``full``."""
+    state = db.meta.find_one({"_id": STATE_ID}) or {}
+    same_config = state.get("window_seconds") == window.total_seconds() and state.get("threshold") == threshold
+    watermark = None if full or not same_config else state.get("watermark")
+    if watermark is None and not dry_run:
+        db.vote_flags.delete_many({})
+        db.flag_counts.delete_many({})
+
+    cutoff = datetime.now(timezone.utc).replace(tzinfo=None) - settle
+    query = {"voted_at": {"$lte": cutoff}}
+    if watermark is not None:
+        # Re-read one window so bursts spanning the last run are seen whole;
+        # votes flagged last time are not counted again.
+        query["voted_at"]["$gt"] = watermark - window
+    fields = {"_id": 1, "voted_at": 1, "ip_prefix": 1, "ua_hash": 1, "candidate_id": 1, "constituency_no": 1}
+
+    detector = BurstDetector(window, threshold)
+    counts = Counter()
+    pending = []
+    flagged = 0
+    scanned = 0
+    started = time.monotonic()
+    for vote in db.votes.find(query, fields).sort("voted_at", 1).batch_size(10000):
+        scanned += 1
+        if vote.get("voted_at") is None:
+            continue
+        for vote_id, flag in detector.add(vote):
+            pending.append((vote_id, flag))
+            if out:
+                out.write(json.dumps({"vote_id": str(vote_id), **flag}, default=str) + "\n")
+        if len(pending) >= FLUSH_EVERY:
+            flagged += _flush(db, pending, counts, dry_run)
+            pending = []
+    flagged += _flush(db, pending, counts, dry_run)
+
+    if not dry_run:
+        write_adjusted_tallies(db, counts)
+        db.meta.update_one({"_id": STATE_ID}, {"$set": {
+            "watermark": cutoff,
+            "window_seconds": window.total_seconds(),
+            "threshold": threshold,
+        }}, upsert=True)
+    return {
+        "scanned": scanned,
+        "newly_flagged": flagged,
+        "incremental": watermark is not None,
+        "seconds": round(time.monotonic() - started, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Flag suspicious vote bursts and write adjusted tallies.")
+    parser.add_argument("--window-minutes", type=float, default=10)
+    parser.add_argument("--threshold", type=int, default=5,
+                        help="votes for one candidate from one ip_prefix + user agent within the window")
+    parser.add_argument("--settle-seconds", type=int, default=60)
+    parser.add_argument("--full", action="store_true", help="ignore the watermark and rescan every vote")
+    parser.add_argument("--dry-run", action="store_true", help="report without writing flags or tallies")
+    parser.add_argument("--out", help="also write flagged votes as JSON lines to this file")
+    args = parser.parse_args()
+
+    cfg = load_config()
+    if not cfg.mongo_uri:
+        raise RuntimeError("MONGODB_URI is required")
+    db = get_db(cfg.mongo_uri, cfg.db_name)
+    ensure_indexes(db)
+    out = open(args.out, "w", encoding="utf-8") if args.out else None
+    try:
+        report = run(
+            db,
+            timedelta(minutes=args.window_minutes),
+            args.threshold,
+            timedelta(seconds=args.settle_seconds),
+            full=args.full,
+            dry_run=args.dry_run,
+            out=out,
+        )
+    finally:
+        if out:
+            out.close()
+    print(
+        f"Scanned {report['scanned']} votes in {report['seconds']}s "
+        f"({'incremental' if report['incremental'] else 'full'}): {report['newly_flagged']} newly flagged"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+import re
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+
+
+LIMIT_PATTERN = re.compile(r"^\s*(\d+)\s*/\s*(second|minute|hour|day)\s*$")
+WINDOW_MS = {"second": 1000, "minute": 60000, "hour": 3600000, "day": 86400000}
+# Repeat-voter markers are spread over this many sets so no single key (or
+# cluster slot) holds every voter.
+VOTED_BUCKETS = 256
+# Keys tracked by the in-process fallback limiter; the least recently used
+# go first.
+LOCAL_MAX_KEYS = 100000
+
+# Sliding-window log per key: a sorted set of admission times. KEYS are the
+# window keys, ARGV[1] a unique member, then one "window_ms limit" pair per
+# key. Uses the Redis clock so every worker and node shares one timeline.
+# Admits (and records) only if every window has room; otherwise returns the
+# milliseconds until the tightest one frees a slot.
+SLIDING_WINDOW_SCRIPT = """
+local t = redis.call('TIME')
+local now = tonumber(t[1]) * 1000 + math.floor(tonumber(t[2]) / 1000)
+local wait = 0
+for i, key in ipairs(KEYS) do
+  local window = tonumber(ARGV[i * 2])
+  local limit = tonumber(ARGV[i * 2 + 1])
+  redis.call('ZREMRANGEBYSCORE', key, '-inf', now - window)
+  if redis.call('ZCARD', key) >= limit then
+    local oldest = redis.call('ZRANGE', key, 0, 0, 'WITHSCORES')
+    local free_at = tonumber(oldest[2]) + window - now
+    if free_at > wait then wait = free_at end
+  end
+end
+if wait > 0 then
+  return wait
+end
+for i, key in ipairs(KEYS) do
+  redis.call('ZADD', key, now, ARGV[1])
+  redis.call('PEXPIRE', key, tonumber(ARGV[i * 2]))
+end
+return 0
+"""
+
+
+def parse_limits(text: str) -> list:
+    """``"50/hour, 100/day"`` -> [(3600000, 50), (86400000, 100)]."""
+    limits = []
+    for part in (text or "").split(","):
+        if not part.strip():
+            continue
+        match = LIMIT_PATTERN.match(part)
+        if not match:
+            raise ValueError(f"bad rate limit {part.strip()!r}, expected e.g. 50/hour")
+        limits.append((WINDOW_MS[match.group(2)], int(match.group(1))))
+    return limits
+
+
+class LocalWindows:
+    """In-process sliding windows, used while Redis is unreachable.
+
+    Same limits as the Redis script, but counted per worker process (as the
+    in-memory limiter before it did), so an outage loosens limits instead of
+    removing them.
+    """
+
+    def __init__(self, max_keys: int = LOCAL_MAX_KEYS):
+        self.max_keys = max_keys
+        self._logs = OrderedDict()
+        self._lock = threading.Lock()
+
+    def admit(self, checks) -> float:
+        """``checks`` is [(key, window_ms, limit)]; returns seconds to wait, 0 if admitted."""
+        now = time.monotonic()
+        wait = 0.0
+        with self._lock:
+            for key, window_ms, limit in checks:
+                log = self._logs.get(key)
+                if log is None:
+                    continue
+                while log and log[0] <= now - window_ms / 1000.0:
+                    log.popleft()
+                if len(log) >= limit:
+                    wait = max(wait, log[0] + window_ms / 1000.0 - now)
+            if wait:
+                return wait
+            for key, _, _ in checks:
+                self._logs.setdefault(key, deque()).append(now)
+                self._logs.move_to_end(key)
+            while len(self._logs) > self.max_keys:
+                self._logs.popitem(last=False)
+        return 0
+
+
+def voted_key(voter_vid_hash: str) -> str:
+    return f"voted:{int(voter_vid_hash[:4], 16) % VOTED_BUCKETS:02x}"
+
+
+class Admission:
+    """Shared vote admission checks, run before the captcha and any Mongo work.
+
+    Rate limits are sliding windows in Redis keyed by IP prefix and by the
+    voter's vid hash, so they hold across workers and nodes. Devices that
+    have voted are remembered in Redis sets; a repeat ballot is turned away
+    with one SISMEMBER. The Mongo unique index on ``voters`` stays the
+    authority: if Redis is down or has lost the sets, ballots pass through
+    and the index still rejects repeats; rate limits fall back to
+    per-process windows.
+    """
+
+    def __init__(self, cache, ip_limits, vid_limits, enabled: bool = True):
+        self.cache = cache
+        self.ip_limits = ip_limits if enabled else []
+        self.vid_limits = vid_limits if enabled else []
+        self._script = cache.register_script(SLIDING_WINDOW_SCRIPT) if cache else None
+        self.local = LocalWindows()
+
+    def admit(self, ip_prefix: str, voter_vid_hash: str) -> float:
+        """Seconds until this ballot may be retried; 0 means admitted."""
+        checks = [
+            (f"admit:{name}:{window}:{value}", window, limit)
+            for name, value, limits in (("ip", ip_prefix, self.ip_limits), ("vid", voter_vid_hash, self.vid_limits))
+            for window, limit in limits
+        ]
+        if not checks:
+            return 0
+        if self._script:
+            args = [uuid.uuid4().hex]
+            for _, window, limit in checks:
+                args += [window, limit]
+            try:
+                return int(self._script(keys=[key for key, _, _ in checks], args=args)) / 1000.0
+            except Exception:
+                # Redis errors show up in bdelection_dependency_errors_total.
+                pass
+        return self.local.admit(checks)
+
+    def has_voted(self, voter_vid_hash: str) -> bool:
+        if not self.cache:
+            return False
+        try:
+            return bool(self.cache.sismember(voted_key(voter_vid_hash), voter_vid_hash))
+        except Exception:
+            return False
+
+    def mark_voted(self, voter_vid_hash: str):
+        if not self.cache:
+            return
+        try:
+            self.cache.sadd(voted_key(voter_vid_hash), voter_vid_hash)
+        except Exception:
+            pass
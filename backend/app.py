@@ -1,20 +1,41 @@
 import hashlib
+import hmac
 import os
+import threading
+import time
 import uuid
+from concurrent.futures import TimeoutError as FutureTimeoutError
 from datetime import datetime, timedelta, timezone
-from flask import Flask, jsonify, request, make_response
+from flask import Flask, Response, g, jsonify, request, make_response
 from flask_cors import CORS
-from flask_limiter import Limiter
-from flask_limiter.util import get_remote_address
-from pymongo import ReturnDocument
 from pymongo.errors import DuplicateKeyError
 import json
-import redis
-import feedparser
 
+import metrics
+from admission import Admission, parse_limits
 from config import load_config
-from db import get_db, ensure_indexes
-from captcha import verify_captcha
+from db import ensure_indexes
+from captcha import verify_captcha_async
+from catalog import CatalogHolder
+from live import LiveHub
+import mapformat
+from news import NewsFetcher
+from responses import EncodedCache, encoded_response
+from projection import LEVELS, METHODS
+from resources import Resources
+from results import ResultsAggregator, seat_result
+from rollups import DIMENSIONS, GRANULARITIES, VoteRollups, parse_range
+from search import tokenize
+from seatcache import SeatCache, vote_count
+from snapshots import VersionedSnapshot
+from tallies import TallyStore
+from tally_snapshot import TallySnapshot
+from votes import BallotNotRecorded, commit_vote
+from worker import DEFAULT_DRAWS, DRAW_COUNTS, NEWS_KEY, PROJECTION_KEY, Precomputed, overall_payload, projection_payload
+from writebehind import VoteBuffer
+
+# Enough for every seat on the map in one request.
+MAX_BATCH_SEATS = 300
 
 
 def sha256_hex(text: str) -> str:
@@ -35,22 +56,6 @@ def now_utc():
     return datetime.now(timezone(timedelta(hours=6)))
 
 
-def feed_published_dhaka(entry):
-    parsed = entry.get("published_parsed")
-    if parsed:
-        dt_utc = datetime(
-            parsed.tm_year,
-            parsed.tm_mon,
-            parsed.tm_mday,
-            parsed.tm_hour,
-            parsed.tm_min,
-            parsed.tm_sec,
-            tzinfo=timezone.utc,
-        )
-        return dt_utc.astimezone(timezone(timedelta(hours=6))).isoformat()
-    return entry.get("published")
-
-
 def create_app():
     cfg = load_config()
     if not cfg.mongo_uri:
@@ -60,21 +65,85 @@ def create_app():
     app.config["JSON_SORT_KEYS"] = False
 
     CORS(app, origins=[cfg.frontend_origin], supports_credentials=True)
-    limiter = Limiter(
-        get_remote_address,
-        app=app,
-        default_limits=[],
-        storage_uri=cfg.limiter_storage_uri,
-    )
 
-    db = get_db(cfg.mongo_uri, cfg.db_name)
+    resources = Resources(cfg)
+    resources.register_gauges()
+    db = resources.db
     ensure_indexes(db)
-    cache = None
-    try:
-        cache = redis.Redis.from_url(cfg.redis_cache_url, decode_responses=True)
-        cache.ping()
-    except Exception:
-        cache = None
+    cache = resources.redis
+    vote_buffer = None
+    if cfg.vote_write_mode == "buffered":
+        if resources.redis_available():
+            vote_buffer = VoteBuffer(db, cache, cfg.vote_flush_interval, cfg.vote_flush_batch)
+            vote_buffer.start()
+        else:
+            app.logger.warning("VOTE_WRITE_MODE=buffered needs Redis; writing votes directly")
+    admission = Admission(
+        cache,
+        parse_limits(cfg.vote_ip_limits),
+        parse_limits(cfg.vote_vid_limits),
+        enabled=cfg.rate_limit_enabled,
+    )
+    tally_store = TallyStore(db, cfg.tally_shards, cfg.tally_shard_promote_rate)
+    catalog = CatalogHolder(db, cfg.catalog_check_interval)
+    encoded = EncodedCache()
+    batch_encoded = EncodedCache(max_entries=64)
+    listing_encoded = EncodedCache(max_entries=256)
+    aggregator = ResultsAggregator()
+    if cfg.tally_snapshot_path:
+        snapshot = TallySnapshot.open(cfg.tally_snapshot_path)
+        if snapshot is not None:
+            aggregator.seed(snapshot, catalog.get())
+            snapshot.close()
+    aggregator.refresh(resources.heavy_db, catalog.get())
+    results_snapshot = VersionedSnapshot(
+        cache,
+        "results_overall",
+        rebuild_interval=cfg.results_rebuild_interval,
+        stale_ttl=cfg.results_stale_ttl,
+    )
+    rollups = VoteRollups(
+        db,
+        cfg.rollup_flush_interval,
+        minute_retention=timedelta(hours=cfg.rollup_minute_retention_hours),
+        hour_retention=timedelta(days=cfg.rollup_hour_retention_days),
+        read_db=resources.heavy_db,
+    )
+    rollups.start()
+    precomputed = Precomputed(cache)
+    news_fetcher = NewsFetcher(cache, cfg.news_cache_ttl, cfg.news_fetch_timeout, standby=precomputed.alive)
+    news_fetcher.start()
+    live_hub = LiveHub(
+        cache,
+        lambda: results_snapshot.get(build_results_overall),
+        cfg.results_rebuild_interval,
+    )
+
+    metrics.start_publisher(cache)
+    profiler = metrics.SamplingProfiler() if cfg.profile_slow_ms or cfg.profile_token else None
+
+    @app.before_request
+    def start_timing():
+        metrics.begin_request()
+        g.profile = None
+        if profiler and (cfg.profile_slow_ms or request.headers.get("X-Profile") == cfg.profile_token):
+            g.profile = profiler.begin()
+
+    @app.after_request
+    def record_timing(resp):
+        route = request.url_rule.rule if request.url_rule else "unmatched"
+        db_ops = metrics.request_db_ops()
+        elapsed = metrics.end_request(route, request.method, resp.status_code)
+        if g.get("profile") is not None:
+            samples = profiler.end(g.profile)
+            forced = bool(cfg.profile_token) and request.headers.get("X-Profile") == cfg.profile_token
+            if forced or elapsed * 1000 >= cfg.profile_slow_ms:
+                app.logger.warning(
+                    "profile %s %s %.0fms, %d db ops, %d samples\n%s",
+                    request.method, request.path, elapsed * 1000, db_ops,
+                    sum(samples.values()), metrics.format_profile(samples),
+                )
+        return resp
 
     def ensure_vid_cookie(resp):
         vid = request.cookies.get("vid")
@@ -89,6 +158,11 @@ def create_app():
                 secure=cfg.secure_cookies,
                 expires=expires,
             )
+            # This response carries the visitor's own cookie; shared caches
+            # must not hand it to anyone else.
+            cache_control = resp.headers.get("Cache-Control")
+            if cache_control and "public" in cache_control:
+                resp.headers["Cache-Control"] = cache_control.replace("public", "private")
         return resp
 
     @app.get("/api/health")
@@ -102,57 +176,50 @@ def create_app():
             jsonify({
                 "captcha_provider": cfg.captcha_provider,
                 "captcha_site_key": cfg.captcha_site_key,
+                "live_results": cfg.live_results,
             })
         )
         return ensure_vid_cookie(resp)
 
     @app.get("/api/constituencies")
     def list_constituencies():
-        division = request.args.get("division")
-        q = request.args.get("q", "")
-        filters = {}
-        if division:
-            filters["division"] = division
-        if q:
-            filters["seat"] = {"$regex": q, "$options": "i"}
-        cursor = db.constituencies.find(filters, {
-            "_id": 0,
-            "constituency_no": 1,
-            "division": 1,
-            "division_bn": 1,
-            "seat": 1,
-            "seat_bn": 1,
-            "notes": 1,
-            "is_disabled": 1,
-        }).sort("constituency_no", 1)
-        items = list(cursor)
-        resp = make_response(jsonify(items))
-        return ensure_vid_cookie(resp)
-
-    def constituency_payload(constituency_no: int):
-        doc = db.constituencies.find_one({"constituency_no": constituency_no}, {"_id": 0})
-        if not doc:
-            return None
-        tallies = db.tallies.find_one({"constituency_no": constituency_no}, {"_id": 0})
-        totals = tallies.get("totals", {}) if tallies else {}
-        leader = None
-        is_tied = False
-        if totals:
-            max_votes = max(totals.values())
-            leaders = [cid for cid, v in totals.items() if v == max_votes]
-            if len(leaders) > 1:
-                is_tied = True
+        seats = catalog.get()
+        division = request.args.get("division") or None
+        # Key searches by their tokens, so case and spacing variants share an entry.
+        q = " ".join(tokenize(request.args.get("q", "")[:100]))
+        limit = min(max(request.args.get("limit", len(seats), type=int), 1), len(seats))
+
+        def build():
+            if q:
+                # Ranked typeahead over seat, division and candidate names.
+                items = [seats.summary_by_no[no] for no in seats.search.search(q)]
             else:
-                cid = leaders[0]
-                cand = next((c for c in doc.get("candidates", []) if c.get("candidate_id") == cid), None)
-                if cand:
-                    leader = {
-                        "candidate_id": cid,
-                        "name": cand.get("name"),
-                        "party": cand.get("party"),
-                        "alliance_key": cand.get("alliance_key"),
-                        "votes": max_votes,
-                    }
+                items = seats.summaries
+            items = [c for c in items if not division or c.get("division") == division]
+            return app.json.dumps(items[:limit])
+
+        key = ("constituencies", seats.generation, len(seats), division, q, limit)
+        # Client-chosen filters get their own small LRU and cannot evict the
+        # results and map bodies; only the full list shares ``encoded``.
+        filtered = division or q or limit < len(seats)
+        body = (listing_encoded if filtered else encoded).lookup(key, build)
+        return ensure_vid_cookie(encoded_response(body, max_age=cfg.catalog_max_age))
+
+    def load_seat_totals(nos):
+        if vote_buffer:
+            try:
+                return vote_buffer.totals_many(nos), True
+            except Exception:
+                # Redis down or not reconciled yet: Mongo lacks unflushed
+                # votes, so serve its totals without caching them.
+                return tally_store.totals_many(nos), False
+        return tally_store.totals_many(nos), True
+
+    seat_cache = SeatCache(cache, load_seat_totals, cfg.seat_cache_local_ttl, cfg.seat_cache_ttl)
+
+    def constituency_payload(seats, constituency_no: int, totals: dict):
+        doc = seats.constituency(constituency_no)
+        leader, is_tied = seat_result(totals, seats.candidates_by_seat[constituency_no])
         return {
             "constituency_no": doc.get("constituency_no"),
             "division": doc.get("division"),
@@ -165,25 +232,51 @@ def create_app():
             "is_tied": is_tied,
         }
 
+    def constituency_response(constituency_no: int):
+        seats = catalog.get()
+        if not seats.constituency(constituency_no):
+            return jsonify({"error": "Not found"}), 404
+        totals = seat_cache.get(constituency_no)
+        # Seat totals only grow, so the vote count versions the encoded body.
+        key = ("seat", seats.generation, constituency_no, vote_count(totals))
+        body = encoded.lookup(key, lambda: app.json.dumps(constituency_payload(seats, constituency_no, totals)))
+        return ensure_vid_cookie(encoded_response(body, max_age=cfg.results_max_age))
+
     @app.get("/api/constituencies/<int:constituency_no>")
     def get_constituency(constituency_no: int):
-        payload = constituency_payload(constituency_no)
-        if not payload:
-            return jsonify({"error": "Not found"}), 404
-        resp = make_response(jsonify(payload))
-        return ensure_vid_cookie(resp)
+        return constituency_response(constituency_no)
 
     @app.get("/api/results/constituency/<int:constituency_no>")
     def constituency_results(constituency_no: int):
-        payload = constituency_payload(constituency_no)
-        if not payload:
-            return jsonify({"error": "Not found"}), 404
-        resp = make_response(jsonify(payload))
-        return ensure_vid_cookie(resp)
+        return constituency_response(constituency_no)
+
+    @app.get("/api/results/constituencies")
+    def constituencies_results():
+        try:
+            nos = sorted({int(n) for n in request.args.get("ids", "").split(",") if n.strip()})
+        except ValueError:
+            return jsonify({"error": "Invalid ids"}), 400
+        if not nos:
+            return jsonify({"error": "ids is required"}), 400
+        if len(nos) > MAX_BATCH_SEATS:
+            return jsonify({"error": f"At most {MAX_BATCH_SEATS} ids"}), 400
+        seats = catalog.get()
+        found = [no for no in nos if seats.constituency(no)]
+        totals = seat_cache.get_many(found)
+
+        def build():
+            return app.json.dumps({
+                "constituencies": [constituency_payload(seats, no, totals[no]) for no in found],
+                "not_found": [no for no in nos if no not in totals],
+            })
+
+        # Ids are normalised (sorted, deduplicated), and batches get their own
+        # small LRU so arbitrary id sets cannot evict the shared bodies.
+        key = ("seats", seats.generation, tuple(nos), tuple(vote_count(totals[no]) for no in found))
+        body = batch_encoded.lookup(key, build)
+        return ensure_vid_cookie(encoded_response(body, max_age=cfg.results_max_age))
 
     @app.post("/api/vote")
-    @limiter.limit("50 per hour")
-    @limiter.limit("100 per day")
     def vote():
         data = request.get_json(force=True) or {}
         constituency_no = data.get("constituency_no")
@@ -193,277 +286,241 @@ def create_app():
         if not isinstance(constituency_no, int) or not candidate_id:
             return jsonify({"error": "Invalid payload"}), 400
 
-        doc = db.constituencies.find_one({"constituency_no": constituency_no})
-        if not doc:
+        vid = request.cookies.get("vid")
+        if not vid:
+            return jsonify({"error": "Missing device id cookie"}), 400
+        voter_vid_hash = sha256_hex(vid + cfg.server_salt)
+        ip_prefix = get_ip_prefix(request.remote_addr or "")
+
+        # Shared admission before the captcha round-trip and any Mongo work.
+        retry_after = admission.admit(ip_prefix, voter_vid_hash)
+        if retry_after:
+            resp = make_response(jsonify({"error": "Too many requests"}), 429)
+            resp.headers["Retry-After"] = str(max(1, int(retry_after + 0.999)))
+            return resp
+        if admission.has_voted(voter_vid_hash):
+            return jsonify({"error": "Already voted"}), 409
+
+        # Verification runs while the ballot is validated below.
+        captcha_check = verify_captcha_async(
+            cfg.captcha_provider,
+            cfg.captcha_secret_key,
+            captcha_token,
+            request.remote_addr,
+            timeout=cfg.captcha_timeout,
+            verify_url=cfg.captcha_verify_url or None,
+            ballot=voter_vid_hash,
+            max_workers=cfg.captcha_workers,
+        )
+
+        seats = catalog.get()
+        if not seats.constituency(constituency_no):
             return jsonify({"error": "Invalid constituency"}), 400
-        candidate = next((c for c in doc.get("candidates", []) if c.get("candidate_id") == candidate_id), None)
+        candidate = seats.candidate(constituency_no, candidate_id)
         if not candidate:
             return jsonify({"error": "Invalid candidate"}), 400
 
-        if not verify_captcha(cfg.captcha_provider, cfg.captcha_secret_key, captcha_token, request.remote_addr):
+        try:
+            # The request timeout bounds the call itself; the extra second
+            # covers waiting for a free verification thread.
+            captcha_ok = captcha_check.result(timeout=cfg.captcha_timeout + 1)
+        except FutureTimeoutError:
+            captcha_check.cancel()
+            resp = make_response(jsonify({"error": "Captcha verification busy, try again"}), 503)
+            resp.headers["Retry-After"] = "1"
+            return resp
+        if not captcha_ok:
             return jsonify({"error": "Captcha failed"}), 403
 
-        vid = request.cookies.get("vid")
-        if not vid:
-            return jsonify({"error": "Missing device id cookie"}), 400
-
-        voter_vid_hash = sha256_hex(vid + cfg.server_salt)
-        ip_prefix = get_ip_prefix(request.remote_addr or "")
         ua_hash = sha256_hex(request.headers.get("User-Agent", ""))
         lang_hash = sha256_hex(request.headers.get("Accept-Language", ""))
 
-        try:
-            db.voters.insert_one({
-                "voter_vid_hash": voter_vid_hash,
-                "first_seen_at": now_utc(),
-                "last_seen_at": now_utc(),
-                "ip_prefix": ip_prefix,
-                "ua_hash": ua_hash,
-                "lang_hash": lang_hash,
-            })
-        except DuplicateKeyError:
-            return jsonify({"error": "Already voted"}), 409
-
-        db.votes.insert_one({
+        voted_at = now_utc()
+        vote = {
             "constituency_no": constituency_no,
             "candidate_id": candidate_id,
             "alliance_key": candidate.get("alliance_key"),
             "party": candidate.get("party"),
-            "voted_at": now_utc(),
+            "voted_at": voted_at,
             "voter_vid_hash": voter_vid_hash,
             "ip_prefix": ip_prefix,
             "ua_hash": ua_hash,
-        })
-
-        updated = db.tallies.find_one_and_update(
-            {"constituency_no": constituency_no},
-            {"$inc": {f"totals.{candidate_id}": 1}, "$set": {"updated_at": now_utc()}},
-            upsert=True,
-            return_document=ReturnDocument.AFTER,
-        )
-        if cache:
-            try:
-                cache.delete("results_overall")
-            except Exception:
-                pass
-
-        payload = constituency_payload(constituency_no)
+        }
+        try:
+            updated = commit_vote(db, {
+                "voter_vid_hash": voter_vid_hash,
+                "first_seen_at": voted_at,
+                "last_seen_at": voted_at,
+                "ip_prefix": ip_prefix,
+                "ua_hash": ua_hash,
+                "lang_hash": lang_hash,
+            }, vote, use_transaction=cfg.vote_transactions, buffer=vote_buffer, tallies=tally_store)
+        except DuplicateKeyError:
+            admission.mark_voted(voter_vid_hash)
+            return jsonify({"error": "Already voted"}), 409
+        except BallotNotRecorded:
+            app.logger.warning("vote buffer unavailable", exc_info=True)
+            resp = make_response(jsonify({"error": "Vote not recorded, try again"}), 503)
+            resp.headers["Retry-After"] = "1"
+            return resp
+        admission.mark_voted(voter_vid_hash)
+        rollups.record(vote)
+        metrics.vote_recorded()
+
+        totals = updated.get("totals") if updated else None
+        if totals is None:
+            # Buffered mode before reconcile: answer with the flushed totals
+            # and leave shared caches and aggregates to catch up on their own.
+            totals = tally_store.totals(constituency_no)
+            leader, is_tied = seat_result(totals, seats.candidates_by_seat[constituency_no])
+        else:
+            seat_cache.put(constituency_no, totals)
+            aggregator.apply_totals(constituency_no, totals)
+            leader, is_tied = seat_result(totals, seats.candidates_by_seat[constituency_no])
+            live_hub.publish_seat(constituency_no, totals, leader, is_tied)
         resp = make_response(jsonify({
             "ok": True,
             "message": "Vote recorded",
-            "new_tallies": updated.get("totals", {}) if updated else {},
-            "leader": payload.get("leader") if payload else None,
-            "is_tied": payload.get("is_tied") if payload else False,
+            "new_tallies": totals,
+            "leader": leader,
+            "is_tied": is_tied,
         }))
         return ensure_vid_cookie(resp)
 
+    def build_results_overall():
+        # Only reached while worker.py is not keeping the snapshot fresh.
+        aggregator.refresh(resources.heavy_db, catalog.get())
+        return overall_payload(aggregator)
+
     @app.get("/api/results/overall")
     def results_overall():
-        if cache:
-            try:
-                cached = cache.get("results_overall")
-                if cached:
-                    resp = make_response(cached)
-                    resp.mimetype = "application/json"
-                    return ensure_vid_cookie(resp)
-            except Exception:
-                pass
-        constituencies = list(db.constituencies.find({}, {"_id": 0}))
-        tallies = list(db.tallies.find({}, {"_id": 0}))
-
-        tally_map = {t.get("constituency_no"): t.get("totals", {}) for t in tallies}
-        candidate_lookup = {}
-        disabled_count = 0
-        for c in constituencies:
-            if c.get("is_disabled"):
-                disabled_count += 1
-            for cand in c.get("candidates", []):
-                candidate_lookup[cand.get("candidate_id")] = cand
-
-        votes_by_alliance = {}
-        votes_by_party = {}
-        for totals in tally_map.values():
-            for cid, votes in totals.items():
-                cand = candidate_lookup.get(cid)
-                if not cand:
-                    continue
-                votes_by_alliance[cand.get("alliance_key")] = votes_by_alliance.get(cand.get("alliance_key"), 0) + votes
-                votes_by_party[cand.get("party")] = votes_by_party.get(cand.get("party"), 0) + votes
-
-        seats_leading_by_alliance = {}
-        seats_leading_by_party = {}
-        leaders_by_constituency = {}
-        tied = 0
-        no_votes = 0
-        for c in constituencies:
-            if c.get("is_disabled"):
-                continue
-            totals = tally_map.get(c.get("constituency_no"), {})
-            if not totals:
-                no_votes += 1
-                leaders_by_constituency[c.get("constituency_no")] = {
-                    "leader": None,
-                    "is_tied": False,
-                }
-                continue
-            max_votes = max(totals.values())
-            leaders = [cid for cid, v in totals.items() if v == max_votes]
-            if len(leaders) > 1:
-                tied += 1
-                leaders_by_constituency[c.get("constituency_no")] = {
-                    "leader": None,
-                    "is_tied": True,
-                }
-                continue
-            leader = candidate_lookup.get(leaders[0])
-            if not leader:
-                continue
-            seats_leading_by_alliance[leader.get("alliance_key")] = seats_leading_by_alliance.get(leader.get("alliance_key"), 0) + 1
-            seats_leading_by_party[leader.get("party")] = seats_leading_by_party.get(leader.get("party"), 0) + 1
-            leaders_by_constituency[c.get("constituency_no")] = {
-                "leader": leader,
-                "is_tied": False,
-            }
-
-        top_seats = []
-        for c in constituencies:
-            totals = tally_map.get(c.get("constituency_no"), {})
-            total_votes = sum(totals.values()) if totals else 0
-            top_seats.append({
-                "constituency_no": c.get("constituency_no"),
-                "seat": c.get("seat"),
-                "division": c.get("division"),
-                "total_votes": total_votes,
-            })
-        top_seats.sort(key=lambda x: x.get("total_votes", 0), reverse=True)
-        top_seats = top_seats[:10]
-
-        total_votes = sum(votes_by_party.values())
-        # Projection: forecast final seats as current leads + unresolved seats by vote share.
-        seats_total = len(constituencies) - disabled_count
-        seats_current = sum(seats_leading_by_party.values())
-        unresolved = tied + no_votes
-        party_vote_entries = {k: v for k, v in votes_by_party.items() if v > 0}
-        projection = {}
-        projection_from_unresolved = {}
-        if seats_current > 0:
-            projection = {k: v for k, v in seats_leading_by_party.items() if v > 0}
-        if unresolved > 0 and party_vote_entries:
-            total_party_votes = sum(party_vote_entries.values())
-            quotas = {}
-            remainders = []
-            for party, votes in party_vote_entries.items():
-                exact = (votes / total_party_votes) * unresolved
-                base = int(exact)
-                quotas[party] = base
-                remainders.append((exact - base, votes, party))
-            seats_allocated = sum(quotas.values())
-            remainders.sort(key=lambda x: (x[0], x[1], x[2]), reverse=True)
-            for i in range(unresolved - seats_allocated):
-                _, _, party = remainders[i]
-                quotas[party] += 1
-            projection_from_unresolved = quotas
-            for party, seats in quotas.items():
-                projection[party] = projection.get(party, 0) + seats
-
-        projected_winner = {
-            "party": None,
-            "seats": 0,
-            "is_tied": False,
-            "tied_parties": [],
-        }
-        if projection:
-            max_seats = max(projection.values())
-            top_parties = sorted([party for party, seats in projection.items() if seats == max_seats])
-            projected_winner = {
-                "party": top_parties[0] if len(top_parties) == 1 else None,
-                "seats": max_seats,
-                "is_tied": len(top_parties) > 1,
-                "tied_parties": top_parties if len(top_parties) > 1 else [],
-            }
-
-        payload = {
-            "total_votes": total_votes,
-            "votes_by_alliance": votes_by_alliance,
-            "votes_by_party": votes_by_party,
-            "seats_leading_by_alliance": {
-                **seats_leading_by_alliance,
-                "tied": tied,
-                "no_votes": no_votes,
-            },
-            "seats_leading_by_party": {
-                **seats_leading_by_party,
-                "TIED": tied,
-                "NO_VOTES": no_votes,
-            },
-            "constituencies_count": len(constituencies),
-            "disabled_count": disabled_count,
-            "leaders_by_constituency": leaders_by_constituency,
-            "top_seats_by_votes": top_seats,
-            "projection_by_party": projection,
-            "projection_meta": {
-                "seats_total": seats_total,
-                "seats_current": seats_current,
-                "remaining": unresolved,
-                "current_leads_by_party": seats_leading_by_party,
-                "estimated_from_unresolved_by_party": projection_from_unresolved,
-                "method": "current_leads_plus_vote_share_unresolved",
-            },
-            "projected_winner": projected_winner,
-            "updated_at": now_utc().isoformat(),
-        }
-        if cache:
-            try:
-                cache.setex("results_overall", cfg.results_cache_ttl, json.dumps(payload))
-            except Exception:
-                pass
-        resp = make_response(json.dumps(payload))
-        resp.mimetype = "application/json"
-        return ensure_vid_cookie(resp)
+        text, _ = results_snapshot.get(build_results_overall)
+        body = encoded.get("results_overall", text)
+        return ensure_vid_cookie(encoded_response(
+            body,
+            max_age=cfg.results_max_age,
+            stale=cfg.results_rebuild_interval,
+        ))
+
+    last_refresh = {"at": time.monotonic()}
+
+    def refresh_results():
+        # Per-worker throttle for readers that bypass the shared overall snapshot.
+        now = time.monotonic()
+        if now - last_refresh["at"] >= cfg.results_rebuild_interval:
+            last_refresh["at"] = now
+            aggregator.refresh(resources.heavy_db, catalog.get())
+
+    @app.get("/api/results/map")
+    def results_map():
+        fmt = request.args.get("format", "json")
+        if fmt not in ("json", "binary"):
+            return jsonify({"error": "Invalid format"}), 400
+
+        refresh_results()
+
+        def build():
+            columns = aggregator.map_columns()
+            return mapformat.encode(columns) if fmt == "binary" else app.json.dumps(columns)
+
+        mimetype = mapformat.MIMETYPE if fmt == "binary" else "application/json"
+        body = encoded.lookup(("map", aggregator.revision, fmt), build, mimetype)
+        return encoded_response(body, max_age=cfg.results_max_age, stale=cfg.results_rebuild_interval)
+
+    @app.get("/api/results/projection")
+    def results_projection():
+        method = request.args.get("method", "monte_carlo")
+        level = request.args.get("level", "party")
+        draws = request.args.get("draws", DEFAULT_DRAWS, type=int)
+        if method not in METHODS:
+            return jsonify({"error": "Invalid method"}), 400
+        if level not in LEVELS:
+            return jsonify({"error": "Invalid level"}), 400
+        if draws not in DRAW_COUNTS:
+            return jsonify({"error": "Invalid draws"}), 400
+
+        text = precomputed.get(PROJECTION_KEY.format(method, level, draws))
+        if text:
+            body = encoded.get(("projection", method, level, draws), text)
+        else:
+            body = build_projection(method, level, draws)
+        return encoded_response(body, max_age=cfg.results_max_age, stale=cfg.results_rebuild_interval)
+
+    projections = {}
+    projection_lock = threading.Lock()
+
+    def build_projection(method, level, draws):
+        # Without worker.py: at most one simulation at a time per worker, and
+        # each (method, level, draws) at most once per rebuild interval, however
+        # often votes change the tallies.
+        key = ("projection", method, level, draws)
+        with projection_lock:
+            entry = projections.get(key)
+            if entry and time.monotonic() - entry[0] < cfg.results_rebuild_interval:
+                return entry[1]
+            refresh_results()
+            inputs = aggregator.projection_inputs(level)
+            if entry and entry[2] == inputs["revision"]:
+                body = entry[1]
+            else:
+                body = encoded.get(key, app.json.dumps(projection_payload(inputs, method, level, draws)))
+            projections[key] = (time.monotonic(), body, inputs["revision"])
+            return body
+
+    @app.get("/api/results/timeline")
+    def results_timeline():
+        dim = request.args.get("dim", "total")
+        key = request.args.get("key")
+        granularity = request.args.get("granularity", "auto")
+        span = parse_range(request.args.get("range", "6h"))
+        points = min(max(request.args.get("points", 120, type=int), 1), 720)
+        if dim not in DIMENSIONS:
+            return jsonify({"error": "Invalid dim"}), 400
+        if granularity != "auto" and granularity not in GRANULARITIES:
+            return jsonify({"error": "Invalid granularity"}), 400
+        if span is None:
+            return jsonify({"error": "Invalid range"}), 400
+        if dim == "constituency" and not key:
+            # 300 series at minute resolution is not a trend chart.
+            return jsonify({"error": "key is required for dim=constituency"}), 400
+        if dim == "total":
+            key = ""
+
+        # Rollups only change once per flush, so so does the answer.
+        tick = int(datetime.now(timezone.utc).timestamp() // cfg.rollup_flush_interval)
+        cache_key = ("timeline", dim, key, granularity, span, points, tick)
+        body = encoded.lookup(
+            cache_key,
+            lambda: app.json.dumps(rollups.timeline(dim, key, span, granularity, points)),
+        )
+        return encoded_response(body, max_age=int(cfg.rollup_flush_interval))
+
+    @app.get("/api/results/stream")
+    def results_stream():
+        if not cfg.live_results:
+            return jsonify({"error": "Not found"}), 404
+        q = live_hub.subscribe()
+        body, version = results_snapshot.get(build_results_overall)
+        resp = Response(live_hub.events(q, body, version), mimetype="text/event-stream")
+        resp.headers["Cache-Control"] = "no-cache"
+        resp.headers["X-Accel-Buffering"] = "no"
+        return resp
+
+    @app.get("/api/metrics")
+    def metrics_text():
+        supplied = request.headers.get("Authorization", "")
+        if not cfg.metrics_token:
+            return jsonify({"error": "Not found"}), 404
+        if not hmac.compare_digest(supplied.encode(), f"Bearer {cfg.metrics_token}".encode()):
+            return jsonify({"error": "Unauthorized"}), 401
+        return Response(metrics.render(cache), mimetype="text/plain; version=0.0.4")
 
     @app.get("/api/news")
     def news():
-        if cache:
-            try:
-                cached = cache.get("news_feed")
-                if cached:
-                    resp = make_response(cached)
-                    resp.mimetype = "application/json"
-                    return ensure_vid_cookie(resp)
-            except Exception:
-                pass
-
-        feeds = [
-            {"source": "BBC Bangla", "url": "https://feeds.bbci.co.uk/bengali/rss.xml"},
-            {"source": "Prothom Alo", "url": "https://www.prothomalo.com/feed/"},
-            {"source": "BanglaNews24", "url": "https://www.banglanews24.com/feed/"},
-            {"source": "Dhaka Tribune", "url": "https://www.dhakatribune.com/feed"},
-            {"source": "Jagonews24", "url": "https://www.jagonews24.com/rss/rss.xml"},
-            {"source": "BD24Live", "url": "https://www.bd24live.com/bangla/feed"},
-        ]
-
-        items = []
-        for f in feeds:
-            parsed = feedparser.parse(f["url"])
-            for entry in parsed.entries[:6]:
-                items.append({
-                    "title": entry.get("title"),
-                    "link": entry.get("link"),
-                    "published": feed_published_dhaka(entry),
-                    "source": f["source"],
-                })
-
-        payload = {"items": items[:24], "updated_at": now_utc().isoformat()}
-        if cache:
-            try:
-                cache.setex("news_feed", cfg.news_cache_ttl, json.dumps(payload))
-            except Exception:
-                pass
-        resp = make_response(json.dumps(payload))
+        resp = make_response(precomputed.get(NEWS_KEY) or json.dumps(news_fetcher.payload()))
         resp.mimetype = "application/json"
         return ensure_vid_cookie(resp)
 
-
     return app
 
 
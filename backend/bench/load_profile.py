@@ -0,0 +1,145 @@
+"""Closed-loop HTTP load profile against a running backend.
+
+Usage (from backend/):
+
+    python -m bench.load_profile --base-url http://localhost:8000 \\
+        --concurrency 200 --duration 30 --mix results=90,vote=10
+
+Each client thread loops: pick an endpoint from the mix, send it, record the
+latency. Votes use a fresh ``vid`` cookie per ballot, so run the server with
+CAPTCHA_PROVIDER=none and RATE_LIMIT_ENABLED=false when driving votes.
+"""
+import argparse
+import json
+import random
+import threading
+import time
+import uuid
+
+import requests
+
+
+def percentile(sorted_values, pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    k = min(len(sorted_values) - 1, max(0, int(round(pct / 100.0 * (len(sorted_values) - 1)))))
+    return sorted_values[k]
+
+
+def parse_mix(text: str) -> list:
+    mix = []
+    for part in text.split(","):
+        name, _, weight = part.partition("=")
+        mix.append((name.strip(), int(weight or 1)))
+    return mix
+
+
+class Target:
+    def __init__(self, base_url: str):
+        self.base_url = base_url.rstrip("/")
+        seats = requests.get(f"{self.base_url}/api/constituencies", timeout=10).json()
+        self.ballots = []
+        for seat in seats[:50]:
+            if seat.get("is_disabled"):
+                continue
+            detail = requests.get(f"{self.base_url}/api/constituencies/{seat['constituency_no']}", timeout=10).json()
+            for cand in detail.get("candidates", []):
+                self.ballots.append((seat["constituency_no"], cand["candidate_id"]))
+
+    def request(self, session: requests.Session, name: str):
+        if name == "results":
+            return session.get(f"{self.base_url}/api/results/overall", timeout=30)
+        if name == "seat":
+            no, _ = random.choice(self.ballots)
+            return session.get(f"{self.base_url}/api/results/constituency/{no}", timeout=30)
+        if name == "constituencies":
+            return session.get(f"{self.base_url}/api/constituencies", timeout=30)
+        if name == "news":
+            return session.get(f"{self.base_url}/api/news", timeout=30)
+        if name == "vote":
+            no, cid = random.choice(self.ballots)
+            session.cookies.clear()
+            session.cookies.set("vid", str(uuid.uuid4()))
+            return session.post(
+                f"{self.base_url}/api/vote",
+                json={"constituency_no": no, "candidate_id": cid},
+                timeout=30,
+            )
+        raise ValueError(f"unknown endpoint {name}")
+
+
+def run(target: Target, mix: list, concurrency: int, duration: float) -> dict:
+    names = [name for name, _ in mix]
+    weights = [weight for _, weight in mix]
+    samples = {name: [] for name in names}
+    errors = {name: 0 for name in names}
+    lock = threading.Lock()
+    deadline = time.monotonic() + duration
+
+    def client():
+        session = requests.Session()
+        local = {name: [] for name in names}
+        local_errors = {name: 0 for name in names}
+        while time.monotonic() < deadline:
+            name = random.choices(names, weights)[0]
+            start = time.perf_counter()
+            try:
+                resp = target.request(session, name)
+                ok = resp.status_code < 400
+            except requests.RequestException:
+                ok = False
+            elapsed = (time.perf_counter() - start) * 1000.0
+            if ok:
+                local[name].append(elapsed)
+            else:
+                local_errors[name] += 1
+        with lock:
+            for name in names:
+                samples[name].extend(local[name])
+                errors[name] += local_errors[name]
+
+    threads = [threading.Thread(target=client) for _ in range(concurrency)]
+    started = time.monotonic()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.monotonic() - started
+
+    report = {"concurrency": concurrency, "duration_s": round(elapsed, 2), "endpoints": {}}
+    for name in names:
+        values = sorted(samples[name])
+        report["endpoints"][name] = {
+            "requests": len(values),
+            "errors": errors[name],
+            "rps": round(len(values) / elapsed, 1),
+            "p50_ms": round(percentile(values, 50), 2),
+            "p95_ms": round(percentile(values, 95), 2),
+            "p99_ms": round(percentile(values, 99), 2),
+        }
+    total = sum(len(v) for v in samples.values())
+    report["total_rps"] = round(total / elapsed, 1)
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--duration", type=float, default=30)
+    parser.add_argument("--mix", default="results=90,vote=10")
+    parser.add_argument("--label", default="", help="e.g. sync or gevent; copied into the report")
+    parser.add_argument("--out", help="write the JSON report here as well")
+    args = parser.parse_args()
+
+    report = run(Target(args.base_url), parse_mix(args.mix), args.concurrency, args.duration)
+    report["label"] = args.label
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,416 @@
+"""Reproducible in-process benchmark of the vote and results endpoints.
+
+Usage (from backend/):
+
+    python -m bench.suite                        # every scenario, compared with bench/baselines.json
+    python -m bench.suite --scenario mixed --duration 20 --repeat 5
+    python -m bench.suite --save-baseline        # record this run as the new baseline
+    python -m bench.suite --mongo-uri mongodb://localhost:27017 --redis-url redis://localhost:6379/15
+
+Each scenario builds a fresh app with create_app() in this process, seeds the
+300 constituencies from assets/ plus a prefill of tallies, and drives it
+through Flask test clients: closed-loop /api/results/overall pollers and a
+paced /api/vote stream with a fresh ``vid`` cookie per ballot.
+CAPTCHA_PROVIDER is forced to none and rate limits are off.
+
+Without --mongo-uri / --redis-url the app runs on mongomock and fakeredis
+(pip install mongomock fakeredis). Those are much slower than the real
+servers and mongomock emits no command events, so DB ops are counted per
+collection call instead; only compare against baselines taken the same way.
+With real servers, the bench database and the given Redis db are wiped
+before every scenario.
+"""
+import argparse
+import functools
+import json
+import logging
+import os
+import platform
+import random
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timezone
+
+import redis
+
+import db as db_module
+import metrics
+from app import create_app
+from bench.load_profile import percentile
+from catalog import bump_generation
+from import_candidates import build_docs, load_bn_map
+
+
+ASSETS = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "assets")
+BASELINES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baselines.json")
+BENCH_DB = "bd_elections_bench"
+ROUTES = {"overall": "/api/results/overall", "vote": "/api/vote"}
+# Figures stored with their best and worst repeat, so a baseline shows how far
+# its own runs disagreed.
+SPREAD_FIELDS = ("rps", "p50_ms", "p95_ms")
+
+# pollers: closed-loop /api/results/overall clients (think = pause between
+# polls); vote_rate: ballots per second shared by vote_clients (0 = unpaced);
+# env: settings on top of the bench defaults.
+SCENARIOS = {
+    "polling": {"pollers": 32, "think": 0.0, "vote_clients": 0, "vote_rate": 0, "env": {}},
+    "mixed": {"pollers": 32, "think": 0.1, "vote_clients": 2, "vote_rate": 50, "env": {}},
+    "mixed_buffered": {
+        "pollers": 32, "think": 0.1, "vote_clients": 2, "vote_rate": 50,
+        "env": {"VOTE_WRITE_MODE": "buffered"},
+    },
+    "votes": {"pollers": 0, "think": 0.0, "vote_clients": 4, "vote_rate": 0, "env": {}},
+}
+# Collection calls counted as one database command each under mongomock.
+MONGOMOCK_CALLS = (
+    "find", "find_one", "find_one_and_update", "insert_one", "insert_many", "update_one",
+    "update_many", "replace_one", "delete_one", "delete_many", "bulk_write", "aggregate",
+    "count_documents", "distinct",
+)
+
+
+class StandIns:
+    """Points db.get_db at mongomock and Redis connection pools at fakeredis."""
+
+    def __init__(self):
+        import fakeredis
+        import mongomock
+        import mongomock.collection
+
+        self._mongomock = mongomock
+        self._fakeredis = fakeredis
+        self.client = None
+        self.server = None
+        db_module.MongoClient = lambda uri, **kwargs: self.client
+
+        collection = mongomock.collection.Collection
+        original = collection.create_index
+
+        def create_index(coll, keys, **kwargs):
+            # No partial indexes in mongomock; the one the app uses only
+            # guards replays of buffered votes.
+            if "partialFilterExpression" in kwargs:
+                return None
+            return original(coll, keys, **kwargs)
+
+        collection.create_index = create_index
+        depth = threading.local()
+
+        def counted(method):
+            @functools.wraps(method)
+            def wrapper(*args, **kwargs):
+                # mongomock calls its own public methods internally; only the
+                # outermost call is a command.
+                level = getattr(depth, "n", 0)
+                if level == 0:
+                    metrics.count_db_op()
+                depth.n = level + 1
+                try:
+                    return method(*args, **kwargs)
+                finally:
+                    depth.n = level
+            return wrapper
+
+        for name in MONGOMOCK_CALLS:
+            setattr(collection, name, counted(getattr(collection, name)))
+
+        stand_ins = self
+
+        def from_url(cls, url, **kwargs):
+            return cls(connection_class=fakeredis.FakeConnection, server=stand_ins.server, **kwargs)
+
+        redis.ConnectionPool.from_url = classmethod(from_url)
+
+    def reset(self):
+        self.client = self._mongomock.MongoClient()
+        self.server = self._fakeredis.FakeServer()
+        return self.client[BENCH_DB]
+
+
+class LiveServers:
+    def __init__(self, mongo_uri: str, redis_url: str):
+        self.mongo_uri = mongo_uri
+        self.redis_url = redis_url
+
+    def reset(self):
+        redis.Redis.from_url(self.redis_url).flushdb()
+        client = db_module.MongoClient(self.mongo_uri)
+        client.drop_database(BENCH_DB)
+        return client[BENCH_DB]
+
+
+def seed(database, prefill: int, rng: random.Random) -> list:
+    """Load the catalog from assets/ and spread ``prefill`` votes over the tallies; returns ballots."""
+    docs = build_docs(
+        os.path.join(ASSETS, "bd_elections_2026_candidates.csv"),
+        load_bn_map(os.path.join(ASSETS, "bd_candidates_bn.csv")),
+    )
+    database.constituencies.insert_many([dict(d) for d in docs])
+    bump_generation(database)
+
+    ballots = []
+    tallies = []
+    share = prefill // max(len(docs), 1)
+    now = datetime.now(timezone.utc)
+    for doc in docs:
+        candidates = [c["candidate_id"] for c in doc.get("candidates", [])]
+        if doc.get("is_disabled") or not candidates:
+            continue
+        ballots.extend((doc["constituency_no"], cid) for cid in candidates)
+        weights = [rng.random() ** 2 for _ in candidates]
+        totals = dict(Counter(rng.choices(candidates, weights, k=share)))
+        tallies.append({"constituency_no": doc["constituency_no"], "totals": totals, "updated_at": now})
+    if tallies:
+        database.tallies.insert_many(tallies)
+    return ballots
+
+
+def _db_ops_by_route() -> dict:
+    return {tuple(labels)[0]: (total, n) for labels, (_, total, n) in metrics.REQUEST_DB_OPS.dump()}
+
+
+def run_scenario(name: str, spec: dict, servers, duration: float, warmup: float, prefill: int, seed_value: int) -> dict:
+    rng = random.Random(seed_value)
+    database = servers.reset()
+    ballots = seed(database, prefill, rng)
+
+    env = {
+        "MONGODB_URI": getattr(servers, "mongo_uri", "mongodb://stand-in"),
+        "MONGODB_DB": BENCH_DB,
+        "REDIS_CACHE_URL": getattr(servers, "redis_url", "redis://stand-in/0"),
+        "CAPTCHA_PROVIDER": "none",
+        "RATE_LIMIT_ENABLED": "false",
+        "TALLY_SNAPSHOT_PATH": "",
+        "PROFILE_SLOW_MS": "0",
+        "PROFILE_TOKEN": "",
+        **spec["env"],
+    }
+    saved = {k: os.environ.get(k) for k in env}
+    os.environ.update(env)
+    try:
+        app = create_app()
+    finally:
+        for k, v in saved.items():
+            if v is None:
+                os.environ.pop(k, None)
+            else:
+                os.environ[k] = v
+
+    samples = {"overall": [], "vote": []}
+    errors = {"overall": 0, "vote": 0}
+    lock = threading.Lock()
+    started = time.monotonic()
+    measure_from = started + warmup
+    deadline = measure_from + duration
+    baseline_ops = {}
+    ready = threading.Event()
+
+    def record(endpoint, sent_at, ok):
+        now = time.monotonic()
+        if now < measure_from:
+            return
+        with lock:
+            if ok:
+                samples[endpoint].append((now - sent_at) * 1000.0)
+            else:
+                errors[endpoint] += 1
+
+    def poller(index):
+        client = app.test_client()
+        environ = {"REMOTE_ADDR": f"10.1.{index // 250}.{index % 250 + 1}"}
+        while time.monotonic() < deadline:
+            sent_at = time.monotonic()
+            resp = client.get("/api/results/overall", environ_base=environ)
+            record("overall", sent_at, resp.status_code in (200, 304))
+            if spec["think"]:
+                time.sleep(spec["think"])
+
+    def voter(index):
+        client = app.test_client()
+        local = random.Random(seed_value * 1000 + index)
+        interval = spec["vote_clients"] / spec["vote_rate"] if spec["vote_rate"] else 0
+        next_at = time.monotonic()
+        n = 0
+        while time.monotonic() < deadline:
+            if interval:
+                delay = next_at - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+                next_at += interval
+            no, cid = local.choice(ballots)
+            n += 1
+            client.set_cookie("vid", f"bench-{name}-{index}-{n}")
+            environ = {"REMOTE_ADDR": f"10.2.{local.randrange(256)}.{local.randrange(1, 255)}"}
+            sent_at = time.monotonic()
+            resp = client.post("/api/vote", json={"constituency_no": no, "candidate_id": cid}, environ_base=environ)
+            record("vote", sent_at, resp.status_code == 200)
+
+    def mark_window():
+        time.sleep(max(0.0, measure_from - time.monotonic()))
+        baseline_ops.update(_db_ops_by_route())
+        ready.set()
+
+    threads = [threading.Thread(target=poller, args=(i,)) for i in range(spec["pollers"])]
+    threads += [threading.Thread(target=voter, args=(i,)) for i in range(spec["vote_clients"])]
+    threads.append(threading.Thread(target=mark_window))
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    ready.wait()
+    elapsed = time.monotonic() - measure_from
+    after_ops = _db_ops_by_route()
+
+    report = {"duration_s": round(elapsed, 2), "endpoints": {}}
+    total = 0
+    for endpoint, values in samples.items():
+        if not values and not errors[endpoint]:
+            continue
+        values.sort()
+        ops_total, ops_n = after_ops.get(ROUTES[endpoint], (0, 0))
+        before_total, before_n = baseline_ops.get(ROUTES[endpoint], (0, 0))
+        ops_n -= before_n
+        report["endpoints"][endpoint] = {
+            "requests": len(values),
+            "errors": errors[endpoint],
+            "rps": round(len(values) / elapsed, 1),
+            "p50_ms": round(percentile(values, 50), 2),
+            "p95_ms": round(percentile(values, 95), 2),
+            "p99_ms": round(percentile(values, 99), 2),
+            "db_ops_per_request": round((ops_total - before_total) / ops_n, 2) if ops_n else 0.0,
+        }
+        total += len(values)
+    report["total_rps"] = round(total / elapsed, 1)
+    return report
+
+
+def median_report(reports: list) -> dict:
+    """Field-wise median over repeated runs of one scenario."""
+    if len(reports) == 1:
+        return reports[0]
+
+    def median(values):
+        values = sorted(values)
+        return values[len(values) // 2]
+
+    merged = {
+        "duration_s": median(r["duration_s"] for r in reports),
+        "repeats": len(reports),
+        "endpoints": {},
+        "total_rps": median(r["total_rps"] for r in reports),
+    }
+    for endpoint in reports[0]["endpoints"]:
+        runs = [r["endpoints"][endpoint] for r in reports if endpoint in r["endpoints"]]
+        merged["endpoints"][endpoint] = {field: median(run[field] for run in runs) for field in runs[0]}
+        merged["endpoints"][endpoint]["spread"] = {
+            field: [min(run[field] for run in runs), max(run[field] for run in runs)]
+            for field in SPREAD_FIELDS
+        }
+    return merged
+
+
+def compare(key: str, report: dict, baseline: dict, tolerance: float, db_ops_tolerance: float) -> list:
+    """Print the run next to its baseline; returns the regressions found."""
+    regressions = []
+    for endpoint, now in report["endpoints"].items():
+        was = baseline.get("endpoints", {}).get(endpoint)
+        line = (
+            f"{key:<28} {endpoint:<8} {now['rps']:>8.1f} rps  p50 {now['p50_ms']:>7.2f}  "
+            f"p95 {now['p95_ms']:>7.2f}  p99 {now['p99_ms']:>7.2f} ms  {now['db_ops_per_request']:>5.2f} db ops"
+        )
+        if not was:
+            print(line + "  (no baseline)")
+            continue
+        notes = []
+        if now["rps"] < was["rps"] * (1 - tolerance):
+            notes.append(f"rps {was['rps']} -> {now['rps']}")
+        # p99 is reported but not judged: over a few thousand requests it
+        # moves with every GC pause and background flush.
+        for field in ("p50_ms", "p95_ms"):
+            # Sub-millisecond latencies are scheduler noise, and so is anything
+            # the baseline's own slowest repeat already reached.
+            worst = was.get("spread", {}).get(field, [was[field]] * 2)[1]
+            if now[field] > was[field] * (1 + tolerance) and now[field] - was[field] > 1.0 and now[field] > worst:
+                notes.append(f"{field} {was[field]} -> {now[field]}")
+        if now["db_ops_per_request"] > was["db_ops_per_request"] + db_ops_tolerance:
+            notes.append(f"db ops {was['db_ops_per_request']} -> {now['db_ops_per_request']}")
+        if now["errors"] > was.get("errors", 0):
+            notes.append(f"errors {was.get('errors', 0)} -> {now['errors']}")
+        change = (now["rps"] - was["rps"]) / was["rps"] * 100 if was["rps"] else 0.0
+        print(line + f"  ({change:+.1f}% rps vs baseline)" + (f"  REGRESSION: {'; '.join(notes)}" if notes else ""))
+        regressions.extend(f"{key}/{endpoint}: {note}" for note in notes)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenario", action="append", choices=sorted(SCENARIOS),
+                        help="run only this scenario (repeatable)")
+    parser.add_argument("--duration", type=float, default=10, help="measured seconds per scenario")
+    parser.add_argument("--warmup", type=float, default=2, help="seconds discarded at the start of each scenario")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per scenario; the median of each figure is reported")
+    parser.add_argument("--prefill", type=int, default=300000, help="votes spread over the tallies before the run")
+    parser.add_argument("--seed", type=int, default=2026)
+    parser.add_argument("--mongo-uri", help="use this MongoDB instead of mongomock")
+    parser.add_argument("--redis-url", help="use this Redis db instead of fakeredis")
+    parser.add_argument("--baselines", default=BASELINES_PATH)
+    parser.add_argument("--save-baseline", action="store_true", help="store this run's numbers as the baseline")
+    parser.add_argument("--accept-regressions", action="store_true",
+                        help="let --save-baseline overwrite a baseline this run regressed against")
+    parser.add_argument("--tolerance", type=float, default=0.25,
+                        help="relative drop in rps or rise in p50/p95 that counts as a regression")
+    parser.add_argument("--db-ops-tolerance", type=float, default=0.1)
+    parser.add_argument("--out", help="write the JSON report here as well")
+    args = parser.parse_args()
+
+    # The news fetcher starts with every app; feeds are not part of the benchmark.
+    logging.getLogger("news").setLevel(logging.CRITICAL)
+    if bool(args.mongo_uri) != bool(args.redis_url):
+        parser.error("--mongo-uri and --redis-url go together")
+    servers = LiveServers(args.mongo_uri, args.redis_url) if args.mongo_uri else StandIns()
+    backend = "live" if args.mongo_uri else "stand-ins"
+
+    try:
+        with open(args.baselines, encoding="utf-8") as f:
+            baselines = json.load(f)
+    except FileNotFoundError:
+        baselines = {}
+
+    results = {}
+    regressions = []
+    for name in args.scenario or list(SCENARIOS):
+        report = median_report([
+            run_scenario(name, SCENARIOS[name], servers, args.duration, args.warmup, args.prefill, args.seed)
+            for _ in range(max(args.repeat, 1))
+        ])
+        key = f"{name}@{backend}"
+        results[key] = report
+        regressions += compare(key, report, baselines.get(key, {}), args.tolerance, args.db_ops_tolerance)
+
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(json.dumps(results, indent=2) + "\n")
+    if args.save_baseline and regressions and not args.accept_regressions:
+        print(f"{len(regressions)} regression(s) against {args.baselines}; not saved "
+              "(find the cause, then re-run with --accept-regressions)")
+        sys.exit(1)
+    if args.save_baseline:
+        recorded = {
+            "recorded_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "machine": f"{platform.machine()} x{os.cpu_count()}",
+        }
+        for key, report in results.items():
+            baselines[key] = {**report, **recorded}
+        with open(args.baselines, "w", encoding="utf-8") as f:
+            f.write(json.dumps(baselines, indent=2, sort_keys=True) + "\n")
+        print(f"Saved {len(results)} baseline(s) to {args.baselines}")
+    elif regressions:
+        print(f"{len(regressions)} regression(s) against {args.baselines}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
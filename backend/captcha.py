@@ -1,33 +1,125 @@
-import os
+import hashlib
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+
 import requests
+from requests.adapters import HTTPAdapter
+
+import metrics
+
+
+VERIFY_URLS = {
+    "turnstile": "https://challenges.cloudflare.com/turnstile/v0/siteverify",
+    "recaptcha": "https://www.google.com/recaptcha/api/siteverify",
+}
+RESULT_TTL = 60
+MAX_CACHED_RESULTS = 10000
+
+_session = None
+_session_lock = threading.Lock()
+_executor = None
+_executor_lock = threading.Lock()
+_results = {}
+_results_lock = threading.Lock()
+
+
+def _get_session() -> requests.Session:
+    # One keep-alive pool per worker process, so verifications after the first
+    # skip the TCP and TLS handshakes with the provider.
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=2, pool_maxsize=32)
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                _session = session
+    return _session
+
+
+def _get_executor(max_workers: int) -> ThreadPoolExecutor:
+    # Sized once per worker process, by the first caller (CAPTCHA_WORKERS).
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="captcha")
+    return _executor
+
+
+def _cache_key(provider: str, token: str, remoteip: str | None, ballot: str) -> str:
+    return hashlib.sha256(f"{provider}|{token}|{remoteip or ''}|{ballot}".encode("utf-8")).hexdigest()
 
 
-def verify_captcha(provider: str, secret_key: str, token: str, remoteip: str | None = None) -> bool:
+def _cached(key: str):
+    with _results_lock:
+        hit = _results.get(key)
+        if hit and hit[1] > time.monotonic():
+            return hit[0]
+    return None
+
+
+def _remember(key: str, ok: bool):
+    # Providers reject a token the second time it is verified, so a client
+    # retrying the same vote (e.g. after a dropped response) gets the first
+    # answer instead of a spurious "timeout-or-duplicate". The key includes
+    # the ballot's device, so one solved token cannot vouch for other vids.
+    now = time.monotonic()
+    with _results_lock:
+        if len(_results) >= MAX_CACHED_RESULTS:
+            for k in [k for k, (_, exp) in _results.items() if exp <= now]:
+                del _results[k]
+            if len(_results) >= MAX_CACHED_RESULTS:
+                _results.clear()
+        _results[key] = (ok, now + RESULT_TTL)
+
+
+def verify_captcha(provider: str, secret_key: str, token: str, remoteip: str | None = None,
+                   timeout: float = 3.0, verify_url: str | None = None, ballot: str = "") -> bool:
+    """Ask the provider whether ``token`` is valid.
+
+    ``ballot`` identifies what the token is spent on (the voter's vid hash);
+    only a repeat verification for the same ballot reuses a cached answer.
+    """
     if provider == "none":
         return True
     if not token:
         return False
+    url = verify_url or VERIFY_URLS.get(provider)
+    if not url:
+        return False
+
+    key = _cache_key(provider, token, remoteip, ballot)
+    cached = _cached(key)
+    if cached is not None:
+        return cached
+
+    data = {"secret": secret_key, "response": token}
+    if remoteip:
+        data["remoteip"] = remoteip
+    error = False
+    try:
+        with metrics.track("http", f"captcha:{provider}"):
+            resp = _get_session().post(url, data=data, timeout=timeout)
+        ok = resp.ok and resp.json().get("success") is True
+    except Exception:
+        ok = False
+        error = True
+    if not error:
+        _remember(key, ok)
+    return ok
 
-    if provider == "turnstile":
-        url = "https://challenges.cloudflare.com/turnstile/v0/siteverify"
-        data = {"secret": secret_key, "response": token}
-        if remoteip:
-            data["remoteip"] = remoteip
-        try:
-            resp = requests.post(url, data=data, timeout=10)
-            return resp.ok and resp.json().get("success") is True
-        except Exception:
-            return False
-
-    if provider == "recaptcha":
-        url = "https://www.google.com/recaptcha/api/siteverify"
-        data = {"secret": secret_key, "response": token}
-        if remoteip:
-            data["remoteip"] = remoteip
-        try:
-            resp = requests.post(url, data=data, timeout=10)
-            return resp.ok and resp.json().get("success") is True
-        except Exception:
-            return False
-
-    return False
+
+def verify_captcha_async(provider: str, secret_key: str, token: str, remoteip: str | None = None,
+                         timeout: float = 3.0, verify_url: str | None = None, ballot: str = "",
+                         max_workers: int = 16) -> Future:
+    """Start verification in the background; call ``.result(timeout)`` when needed."""
+    if provider == "none":
+        done = Future()
+        done.set_result(True)
+        return done
+    return _get_executor(max_workers).submit(
+        verify_captcha, provider, secret_key, token, remoteip, timeout, verify_url, ballot
+    )
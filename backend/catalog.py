@@ -0,0 +1,114 @@
+import threading
+import time
+from types import MappingProxyType
+
+from pymongo import ReturnDocument
+
+from search import SearchIndex
+
+
+GENERATION_ID = "catalog"
+SUMMARY_FIELDS = (
+    "constituency_no",
+    "division",
+    "division_bn",
+    "seat",
+    "seat_bn",
+    "notes",
+    "is_disabled",
+)
+
+
+class Catalog:
+    """Read-only index of constituencies and their candidates.
+
+    Built from the ``constituencies`` collection, which only changes when
+    ``import_candidates.py`` runs, so lookups never need to go to Mongo.
+    """
+
+    def __init__(self, constituencies, generation: int = 0):
+        docs = sorted(constituencies, key=lambda c: c.get("constituency_no") or 0)
+        self.generation = generation
+        self.constituencies = tuple(docs)
+        self.by_no = MappingProxyType({c.get("constituency_no"): c for c in docs})
+        self.candidates_by_seat = MappingProxyType({
+            c.get("constituency_no"): MappingProxyType({
+                cand.get("candidate_id"): cand for cand in c.get("candidates", [])
+            })
+            for c in docs
+        })
+        self.candidates = MappingProxyType({
+            cid: cand for seat in self.candidates_by_seat.values() for cid, cand in seat.items()
+        })
+        # Rows served by /api/constituencies, in constituency_no order.
+        self.summaries = tuple(
+            {k: c[k] for k in SUMMARY_FIELDS if k in c} for c in docs
+        )
+        self.summary_by_no = MappingProxyType({s.get("constituency_no"): s for s in self.summaries})
+        self.search = SearchIndex(docs)
+
+    def __len__(self):
+        return len(self.constituencies)
+
+    def constituency(self, constituency_no: int):
+        return self.by_no.get(constituency_no)
+
+    def candidate(self, constituency_no: int, candidate_id: str):
+        return self.candidates_by_seat.get(constituency_no, {}).get(candidate_id)
+
+
+def get_generation(db) -> int:
+    doc = db.meta.find_one({"_id": GENERATION_ID})
+    return int(doc.get("generation", 0)) if doc else 0
+
+
+def bump_generation(db) -> int:
+    doc = db.meta.find_one_and_update(
+        {"_id": GENERATION_ID},
+        {"$inc": {"generation": 1}},
+        upsert=True,
+        return_document=ReturnDocument.AFTER,
+    )
+    return int(doc.get("generation", 0))
+
+
+def load_catalog(db) -> Catalog:
+    # Read the generation first: if an import lands in between, the next
+    # check sees a newer generation and loads again.
+    generation = get_generation(db)
+    return Catalog(db.constituencies.find({}, {"_id": 0, "content_hash": 0}), generation)
+
+
+class CatalogHolder:
+    """Per-worker Catalog, hot-swapped when the import generation changes.
+
+    The generation document is polled at most once per ``check_interval``
+    seconds; a reload builds a new Catalog and swaps the reference, so
+    readers never see a half-built index.
+    """
+
+    def __init__(self, db, check_interval: int):
+        self.db = db
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._catalog = load_catalog(db)
+        self._checked_at = time.monotonic()
+
+    def get(self) -> Catalog:
+        if time.monotonic() - self._checked_at >= self.check_interval:
+            self._check()
+        return self._catalog
+
+    def _check(self):
+        if not self._lock.acquire(blocking=False):
+            return
+        try:
+            self._checked_at = time.monotonic()
+            try:
+                generation = get_generation(self.db)
+            except Exception:
+                return
+            if generation != self._catalog.generation or not len(self._catalog):
+                self._catalog = load_catalog(self.db)
+        finally:
+            self._lock.release()
@@ -11,11 +11,53 @@ class Config:
     captcha_provider: str
     captcha_secret_key: str
     captcha_site_key: str
+    captcha_timeout: float
+    captcha_verify_url: str
+    captcha_workers: int
     secure_cookies: bool
-    limiter_storage_uri: str
+    rate_limit_enabled: bool
+    vote_ip_limits: str
+    vote_vid_limits: str
     redis_cache_url: str
-    results_cache_ttl: int
+    redis_max_connections: int
+    redis_pool_timeout: float
+    redis_socket_timeout: float
+    redis_connect_timeout: float
+    redis_breaker_failures: int
+    redis_breaker_reset: float
+    mongo_max_pool_size: int
+    mongo_min_pool_size: int
+    mongo_connect_timeout_ms: int
+    mongo_server_selection_timeout_ms: int
+    mongo_socket_timeout_ms: int
+    mongo_wait_queue_timeout_ms: int
+    mongo_heavy_read_preference: str
+    results_rebuild_interval: int
+    results_stale_ttl: int
+    results_max_age: int
+    catalog_max_age: int
+    seat_cache_local_ttl: float
+    seat_cache_ttl: int
     news_cache_ttl: int
+    precompute_interval: float
+    precompute_debounce: float
+    precompute_heartbeat_ttl: int
+    news_fetch_timeout: float
+    vote_transactions: bool
+    catalog_check_interval: int
+    vote_write_mode: str
+    vote_flush_interval: float
+    vote_flush_batch: int
+    tally_shards: int
+    tally_shard_promote_rate: float
+    live_results: bool
+    tally_snapshot_path: str
+    rollup_flush_interval: float
+    rollup_minute_retention_hours: int
+    rollup_hour_retention_days: int
+    profile_slow_ms: int
+    profile_token: str
+    metrics_token: str
 
 
 def load_config() -> Config:
@@ -27,9 +69,84 @@ def load_config() -> Config:
         captcha_provider=os.environ.get("CAPTCHA_PROVIDER", "none"),
         captcha_secret_key=os.environ.get("CAPTCHA_SECRET_KEY", ""),
         captcha_site_key=os.environ.get("CAPTCHA_SITE_KEY", ""),
+        captcha_timeout=float(os.environ.get("CAPTCHA_TIMEOUT", "3")),
+        # Overrides the provider's siteverify URL, e.g. to point at a local fake.
+        captcha_verify_url=os.environ.get("CAPTCHA_VERIFY_URL", ""),
+        # Threads per worker process running siteverify calls; under gevent
+        # every in-flight vote waits on one of these.
+        captcha_workers=int(os.environ.get("CAPTCHA_WORKERS", "16")),
         secure_cookies=os.environ.get("SECURE_COOKIES", "false").lower() == "true",
-        limiter_storage_uri=os.environ.get("LIMITER_STORAGE_URI", "memory://"),
+        rate_limit_enabled=os.environ.get("RATE_LIMIT_ENABLED", "true").lower() == "true",
+        # Sliding windows on /api/vote, kept in Redis so they hold across
+        # workers and nodes: per IP prefix (/24 or /64) and per device (vid).
+        vote_ip_limits=os.environ.get("VOTE_IP_LIMITS", "50/hour,100/day"),
+        vote_vid_limits=os.environ.get("VOTE_VID_LIMITS", "10/minute"),
         redis_cache_url=os.environ.get("REDIS_CACHE_URL", "redis://redis:6379/1"),
-        results_cache_ttl=int(os.environ.get("RESULTS_CACHE_TTL", "10")),
+        redis_max_connections=int(os.environ.get("REDIS_MAX_CONNECTIONS", "50")),
+        redis_pool_timeout=float(os.environ.get("REDIS_POOL_TIMEOUT", "5")),
+        redis_socket_timeout=float(os.environ.get("REDIS_SOCKET_TIMEOUT", "2")),
+        redis_connect_timeout=float(os.environ.get("REDIS_CONNECT_TIMEOUT", "1")),
+        # After this many connection errors in a row, Redis calls fail fast for
+        # REDIS_BREAKER_RESET seconds before one call probes again.
+        redis_breaker_failures=int(os.environ.get("REDIS_BREAKER_FAILURES", "5")),
+        redis_breaker_reset=float(os.environ.get("REDIS_BREAKER_RESET", "10")),
+        # MongoDB client pool per worker process; 0 disables a timeout.
+        mongo_max_pool_size=int(os.environ.get("MONGO_MAX_POOL_SIZE", "50")),
+        mongo_min_pool_size=int(os.environ.get("MONGO_MIN_POOL_SIZE", "0")),
+        mongo_connect_timeout_ms=int(os.environ.get("MONGO_CONNECT_TIMEOUT_MS", "5000")),
+        mongo_server_selection_timeout_ms=int(os.environ.get("MONGO_SERVER_SELECTION_TIMEOUT_MS", "5000")),
+        mongo_socket_timeout_ms=int(os.environ.get("MONGO_SOCKET_TIMEOUT_MS", "30000")),
+        mongo_wait_queue_timeout_ms=int(os.environ.get("MONGO_WAIT_QUEUE_TIMEOUT_MS", "5000")),
+        # Aggregation refreshes and timelines tolerate a few seconds of lag, so
+        # they may go to secondaries ("primary" keeps every read on the primary).
+        mongo_heavy_read_preference=os.environ.get("MONGO_HEAVY_READ_PREFERENCE", "secondaryPreferred"),
+        # RESULTS_CACHE_TTL is the pre-snapshot name of the rebuild interval.
+        results_rebuild_interval=int(
+            os.environ.get("RESULTS_REBUILD_INTERVAL", os.environ.get("RESULTS_CACHE_TTL", "10"))
+        ),
+        results_stale_ttl=int(os.environ.get("RESULTS_STALE_TTL", "600")),
+        # Cache-Control max-age for results / constituency list responses; lets
+        # nginx micro-cache them.
+        results_max_age=int(os.environ.get("RESULTS_MAX_AGE", "2")),
+        catalog_max_age=int(os.environ.get("CATALOG_MAX_AGE", "60")),
+        # Per-seat totals: how long a worker trusts its own copy before
+        # re-reading Redis (where votes write through), and the Redis TTL.
+        seat_cache_local_ttl=float(os.environ.get("SEAT_CACHE_LOCAL_TTL", "1.0")),
+        seat_cache_ttl=int(os.environ.get("SEAT_CACHE_TTL", "300")),
         news_cache_ttl=int(os.environ.get("NEWS_CACHE_TTL", "300")),
+        # worker.py: seconds between rounds when idle, delay after a vote
+        # before recomputing, and how long web workers trust its heartbeat.
+        # Keep the interval below RESULTS_REBUILD_INTERVAL.
+        precompute_interval=float(os.environ.get("PRECOMPUTE_INTERVAL", "5")),
+        precompute_debounce=float(os.environ.get("PRECOMPUTE_DEBOUNCE", "0.5")),
+        precompute_heartbeat_ttl=int(os.environ.get("PRECOMPUTE_HEARTBEAT_TTL", "15")),
+        news_fetch_timeout=float(os.environ.get("NEWS_FETCH_TIMEOUT", "5")),
+        # Multi-document transactions need MongoDB running as a replica set.
+        vote_transactions=os.environ.get("VOTE_TRANSACTIONS", "false").lower() == "true",
+        catalog_check_interval=int(os.environ.get("CATALOG_CHECK_INTERVAL", "5")),
+        # "direct" writes every ballot to Mongo; "buffered" counts in Redis and
+        # flushes to Mongo in batches (see writebehind.py).
+        vote_write_mode=os.environ.get("VOTE_WRITE_MODE", "direct"),
+        vote_flush_interval=float(os.environ.get("VOTE_FLUSH_INTERVAL", "1.0")),
+        vote_flush_batch=int(os.environ.get("VOTE_FLUSH_BATCH", "500")),
+        # Direct mode: a seat taking more than TALLY_SHARD_PROMOTE_RATE votes/s
+        # on one worker has its tally split over TALLY_SHARDS documents (0 = off).
+        tally_shards=int(os.environ.get("TALLY_SHARDS", "0")),
+        tally_shard_promote_rate=float(os.environ.get("TALLY_SHARD_PROMOTE_RATE", "20")),
+        # /api/results/stream holds a connection per client; only enable it
+        # with a worker class that can park many idle connections.
+        live_results=os.environ.get("LIVE_RESULTS", "false").lower() == "true",
+        # Written by tally_snapshot.py; workers seed results from it at startup.
+        tally_snapshot_path=os.environ.get("TALLY_SNAPSHOT_PATH", ""),
+        # Vote-over-time buckets (see rollups.py) and how long each granularity is kept.
+        rollup_flush_interval=float(os.environ.get("ROLLUP_FLUSH_INTERVAL", "5")),
+        rollup_minute_retention_hours=int(os.environ.get("ROLLUP_MINUTE_RETENTION_HOURS", "48")),
+        rollup_hour_retention_days=int(os.environ.get("ROLLUP_HOUR_RETENTION_DAYS", "90")),
+        # Sampling profiler: log stacks of requests slower than this (0 = off),
+        # or of any request sent with "X-Profile: <PROFILE_TOKEN>".
+        profile_slow_ms=int(os.environ.get("PROFILE_SLOW_MS", "0")),
+        profile_token=os.environ.get("PROFILE_TOKEN", ""),
+        # /api/metrics needs "Authorization: Bearer <METRICS_TOKEN>"; unset
+        # turns the endpoint off.
+        metrics_token=os.environ.get("METRICS_TOKEN", ""),
     )
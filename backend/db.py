@@ -1,8 +1,8 @@
 from pymongo import MongoClient, ASCENDING
 
 
-def get_db(mongo_uri: str, db_name: str):
-    client = MongoClient(mongo_uri)
+def get_db(mongo_uri: str, db_name: str, event_listeners=None, **client_options):
+    client = MongoClient(mongo_uri, event_listeners=event_listeners or [], **client_options)
     return client[db_name]
 
 
@@ -10,5 +10,21 @@ def ensure_indexes(db):
     db.constituencies.create_index([("constituency_no", ASCENDING)], unique=True)
     db.voters.create_index([("voter_vid_hash", ASCENDING)], unique=True)
     db.tallies.create_index([("constituency_no", ASCENDING)], unique=True)
+    db.tallies.create_index([("updated_at", ASCENDING)])
+    db.tally_shards.create_index([("constituency_no", ASCENDING), ("shard", ASCENDING)], unique=True)
+    db.tally_shards.create_index([("updated_at", ASCENDING)])
     db.votes.create_index([("constituency_no", ASCENDING)])
     db.votes.create_index([("voter_vid_hash", ASCENDING)])
+    db.votes.create_index([("voted_at", ASCENDING)])
+    db.vote_rollups.create_index(
+        [("granularity", ASCENDING), ("dim", ASCENDING), ("key", ASCENDING), ("bucket", ASCENDING)],
+        unique=True,
+    )
+    db.vote_rollups.create_index([("expires_at", ASCENDING)], expireAfterSeconds=0)
+    db.flag_counts.create_index([("constituency_no", ASCENDING)], unique=True)
+    db.adjusted_tallies.create_index([("constituency_no", ASCENDING)], unique=True)
+    db.votes.create_index(
+        [("stream_id", ASCENDING)],
+        unique=True,
+        partialFilterExpression={"stream_id": {"$exists": True}},
+    )
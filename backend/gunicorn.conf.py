@@ -1,3 +1,16 @@
+import os
+
 bind = "0.0.0.0:8000"
-workers = 2
+workers = int(os.environ.get("GUNICORN_WORKERS", "2"))
+# "sync" (default) serves one request per worker at a time. "gevent" runs each
+# request in a greenlet, so requests waiting on Mongo, Redis or the captcha
+# provider no longer hold a whole worker; required for LIVE_RESULTS.
+worker_class = os.environ.get("GUNICORN_WORKER_CLASS", "sync")
+worker_connections = int(os.environ.get("GUNICORN_WORKER_CONNECTIONS", "1000"))
 timeout = 60
+
+
+def post_fork(server, worker):
+    # Mongo clients are per process (resources.py); drop any the master built.
+    import resources
+    resources.after_fork()
@@ -1,8 +1,14 @@
+import argparse
 import csv
 import hashlib
+import json
 import os
+
+from pymongo import UpdateOne
+
 from config import load_config
 from db import get_db, ensure_indexes
+from catalog import bump_generation
 
 
 CSV_PATH = os.environ.get("CANDIDATES_CSV", "/data/bd_elections_2026_candidates.csv")
@@ -64,84 +70,141 @@ def load_bn_map(path: str) -> dict[int, dict]:
     return bn_map
 
 
-def main():
-    cfg = load_config()
-    if not cfg.mongo_uri:
-        raise RuntimeError("MONGODB_URI is required")
+# (alliance_key, party column, default party, candidate column) per CSV slot.
+CANDIDATE_COLUMNS = [
+    ("BNP", "bnp_party", "BNP", "bnp_candidate"),
+    ("JP", "jp_party", "Jatiya Party (Ershad)", "jp_candidate"),
+    ("11PA", "alliance_party", "11 Party Alliance", "alliance_candidate"),
+]
 
-    db = get_db(cfg.mongo_uri, cfg.db_name)
-    ensure_indexes(db)
-    bn_map = load_bn_map(BN_CSV_PATH)
 
-    with open(CSV_PATH, newline="", encoding="utf-8") as f:
+def build_docs(path: str, bn_map: dict) -> list[dict]:
+    docs = []
+    with open(path, newline="", encoding="utf-8") as f:
         reader = csv.DictReader(f)
-        count = 0
         for row in reader:
             constituency_no = int(row.get("constituency_no"))
             division = (row.get("division") or row.get("\ufeffdivision") or "").strip()
             seat = row.get("seat", "").strip()
             notes = row.get("notes", "").strip()
 
-            candidates = []
-            bnp_party = row.get("bnp_party", "BNP").strip() or "BNP"
-            bnp_candidate = row.get("bnp_candidate", "").strip()
-            if bnp_candidate:
-                candidates.append({
-                    "candidate_id": candidate_id(constituency_no, "BNP", bnp_party, bnp_candidate),
-                    "alliance_key": "BNP",
-                    "party": bnp_party,
-                    "name": bnp_candidate,
-                })
-
-            jp_party = row.get("jp_party", "Jatiya Party (Ershad)").strip() or "Jatiya Party (Ershad)"
-            jp_candidate = row.get("jp_candidate", "").strip()
-            if jp_candidate:
-                candidates.append({
-                    "candidate_id": candidate_id(constituency_no, "JP", jp_party, jp_candidate),
-                    "alliance_key": "JP",
-                    "party": jp_party,
-                    "name": jp_candidate,
-                })
-
-            alliance_party = row.get("alliance_party", "11 Party Alliance").strip() or "11 Party Alliance"
-            alliance_candidate = row.get("alliance_candidate", "").strip()
-            if alliance_candidate:
-                candidates.append({
-                    "candidate_id": candidate_id(constituency_no, "11PA", alliance_party, alliance_candidate),
-                    "alliance_key": "11PA",
-                    "party": alliance_party,
-                    "name": alliance_candidate,
-                })
-
             bn_info = bn_map.get(constituency_no, {})
-            division_bn = bn_info.get("division_bn", "")
-            seat_bn = bn_info.get("seat_bn", "")
             party_map = bn_info.get("party_map", {})
 
-            for cand in candidates:
-                party_bn = BN_PARTY_KEYS.get(cand.get("party"), cand.get("party"))
-                cand["party_bn"] = party_bn
-                cand["name_bn"] = party_map.get(party_bn, "")
+            candidates = []
+            for alliance_key, party_col, default_party, candidate_col in CANDIDATE_COLUMNS:
+                party = (row.get(party_col) or "").strip() or default_party
+                name = (row.get(candidate_col) or "").strip()
+                if not name:
+                    continue
+                party_bn = BN_PARTY_KEYS.get(party, party)
+                candidates.append({
+                    "candidate_id": candidate_id(constituency_no, alliance_key, party, name),
+                    "alliance_key": alliance_key,
+                    "party": party,
+                    "name": name,
+                    "party_bn": party_bn,
+                    "name_bn": party_map.get(party_bn, ""),
+                })
 
-            doc = {
+            docs.append({
                 "constituency_no": constituency_no,
                 "division": division,
                 "seat": seat,
-                "division_bn": division_bn,
-                "seat_bn": seat_bn,
+                "division_bn": bn_info.get("division_bn", ""),
+                "seat_bn": bn_info.get("seat_bn", ""),
                 "notes": notes,
                 "is_disabled": False,
                 "candidates": candidates,
-            }
+            })
+    return docs
+
+
+def content_hash(doc: dict) -> str:
+    return sha1_hex(json.dumps(doc, sort_keys=True, ensure_ascii=False))
+
+
+def diff_docs(db, docs: list[dict]) -> dict:
+    """Compare parsed docs with the stored content hashes."""
+    stored = {
+        d.get("constituency_no"): d.get("content_hash")
+        for d in db.constituencies.find({}, {"_id": 0, "constituency_no": 1, "content_hash": 1})
+    }
+    report = {"added": [], "changed": [], "unchanged": [], "removed": []}
+    pending = []
+    seen = set()
+    for doc in docs:
+        no = doc["constituency_no"]
+        seen.add(no)
+        digest = content_hash(doc)
+        if no not in stored:
+            report["added"].append(no)
+        elif stored[no] != digest:
+            report["changed"].append(no)
+        else:
+            report["unchanged"].append(no)
+            continue
+        pending.append({**doc, "content_hash": digest})
+    # Seats missing from the CSV are reported, never deleted: they may hold votes.
+    report["removed"] = sorted(no for no in stored if no not in seen)
+    report["pending"] = pending
+    return report
+
+
+def changed_fields(db, report: dict) -> dict:
+    """Top-level fields that differ for each changed seat (dry-run detail)."""
+    nos = report["changed"]
+    if not nos:
+        return {}
+    stored = {d["constituency_no"]: d for d in db.constituencies.find({"constituency_no": {"$in": nos}}, {"_id": 0})}
+    fields = {}
+    for doc in report["pending"]:
+        old = stored.get(doc["constituency_no"])
+        if old is None:
+            continue
+        fields[doc["constituency_no"]] = sorted(
+            k for k in doc if k != "content_hash" and old.get(k) != doc[k]
+        )
+    return fields
 
-            db.constituencies.update_one(
-                {"constituency_no": constituency_no},
-                {"$set": doc},
-                upsert=True,
-            )
-            count += 1
 
-    print(f"Imported {count} constituencies")
+def main():
+    parser = argparse.ArgumentParser(description="Import candidate CSVs into MongoDB.")
+    parser.add_argument("--dry-run", action="store_true", help="report changes without writing")
+    args = parser.parse_args()
+
+    cfg = load_config()
+    if not cfg.mongo_uri:
+        raise RuntimeError("MONGODB_URI is required")
+
+    db = get_db(cfg.mongo_uri, cfg.db_name)
+    docs = build_docs(CSV_PATH, load_bn_map(BN_CSV_PATH))
+    report = diff_docs(db, docs)
+    print(
+        f"Parsed {len(docs)} constituencies: "
+        f"{len(report['added'])} added, {len(report['changed'])} changed, "
+        f"{len(report['unchanged'])} unchanged, {len(report['removed'])} only in database"
+    )
+
+    if args.dry_run:
+        for no, fields in sorted(changed_fields(db, report).items()):
+            print(f"  changed {no}: {', '.join(fields) or '(metadata only)'}")
+        for no in report["added"]:
+            print(f"  added {no}")
+        for no in report["removed"]:
+            print(f"  only in database {no}")
+        return
+
+    ensure_indexes(db)
+    if not report["pending"]:
+        print("Nothing to import")
+        return
+    db.constituencies.bulk_write([
+        UpdateOne({"constituency_no": doc["constituency_no"]}, {"$set": doc}, upsert=True)
+        for doc in report["pending"]
+    ], ordered=False)
+    generation = bump_generation(db)
+    print(f"Imported {len(report['pending'])} constituencies (catalog generation {generation})")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,132 @@
+import json
+import logging
+import queue
+import threading
+import time
+
+
+CHANNEL = "results:live"
+HEARTBEAT_SECONDS = 15
+
+log = logging.getLogger(__name__)
+
+
+def summary_of(body: str) -> str:
+    # Stream clients receive per-seat leaders as "seat" events, so the periodic
+    # summary leaves out the 300-entry leaders map.
+    payload = json.loads(body)
+    payload.pop("leaders_by_constituency", None)
+    return json.dumps(payload)
+
+
+class LiveHub:
+    """Per-worker fan-out for /api/results/stream.
+
+    A single thread per worker listens on the ``results:live`` pub/sub channel
+    and copies each seat delta into every connected client's queue, and polls
+    the shared results snapshot so a new version goes out as one "summary"
+    event. N clients therefore cost one subscription and one snapshot read
+    per interval, not N.
+    """
+
+    def __init__(self, cache, snapshot_get, interval: int, queue_size: int = 256):
+        self.cache = cache
+        self.snapshot_get = snapshot_get
+        self.interval = max(interval, 1)
+        self.queue_size = queue_size
+        self._subscribers = set()
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def publish_seat(self, constituency_no: int, totals: dict, leader, is_tied: bool):
+        data = json.dumps({
+            "constituency_no": constituency_no,
+            "totals": totals,
+            "leader": leader,
+            "is_tied": is_tied,
+        })
+        if self.cache:
+            try:
+                self.cache.publish(CHANNEL, data)
+                return
+            except Exception:
+                pass
+        self.broadcast("seat", data)
+
+    def subscribe(self) -> queue.Queue:
+        q = queue.Queue(maxsize=self.queue_size)
+        with self._lock:
+            self._subscribers.add(q)
+        self.start()
+        return q
+
+    def unsubscribe(self, q: queue.Queue):
+        with self._lock:
+            self._subscribers.discard(q)
+
+    def broadcast(self, event: str, data: str):
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for q in subscribers:
+            try:
+                q.put_nowait((event, data))
+            except queue.Full:
+                # Client is not keeping up: drop it and tell it to reconnect,
+                # which gets it a fresh snapshot instead of a backlog.
+                self.unsubscribe(q)
+                while True:
+                    try:
+                        q.get_nowait()
+                    except queue.Empty:
+                        break
+                q.put_nowait(("reset", "{}"))
+
+    def start(self):
+        with self._lock:
+            if self._thread:
+                return
+            self._thread = threading.Thread(target=self._run, name="live-hub", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        pubsub = None
+        last_version = None
+        next_summary = 0.0
+        while True:
+            try:
+                if self.cache and pubsub is None:
+                    pubsub = self.cache.pubsub(ignore_subscribe_messages=True)
+                    pubsub.subscribe(CHANNEL)
+                if pubsub is not None:
+                    message = pubsub.get_message(timeout=1.0)
+                    if message and message.get("type") == "message":
+                        self.broadcast("seat", message["data"])
+                else:
+                    time.sleep(1.0)
+                if time.monotonic() >= next_summary:
+                    next_summary = time.monotonic() + self.interval
+                    if self._subscribers:
+                        body, version = self.snapshot_get()
+                        if version != last_version:
+                            last_version = version
+                            self.broadcast("summary", summary_of(body))
+            except Exception:
+                log.exception("live results hub failed; resubscribing")
+                pubsub = None
+                time.sleep(1.0)
+
+    def events(self, q: queue.Queue, snapshot: str, version: int):
+        """Server-Sent Events body for one client."""
+        try:
+            yield f"event: snapshot\nid: {version}\ndata: {snapshot}\n\n"
+            while True:
+                try:
+                    event, data = q.get(timeout=HEARTBEAT_SECONDS)
+                except queue.Empty:
+                    yield ": ping\n\n"
+                    continue
+                yield f"event: {event}\ndata: {data}\n\n"
+                if event == "reset":
+                    return
+        finally:
+            self.unsubscribe(q)
@@ -0,0 +1,53 @@
+import json
+import struct
+import sys
+from array import array
+
+
+MAGIC = b"BDMP"
+FORMAT_VERSION = 1
+MIMETYPE = "application/octet-stream"
+# magic, format version, first constituency_no, seats, trailer length
+HEADER = struct.Struct("<4sHHII")
+# (column, array typecode), in file order; each column starts aligned to its
+# item size, so a browser can view it as a typed array without copying.
+COLUMNS = (("votes", "I"), ("party", "H"), ("alliance", "H"), ("state", "B"))
+TRAILER_FIELDS = ("generation", "total_votes", "states", "alliances", "parties")
+
+
+def _little_endian(arr: array) -> array:
+    if sys.byteorder != "little":
+        arr.byteswap()
+    return arr
+
+
+def encode(columns: dict) -> bytes:
+    """``ResultsAggregator.map_columns()`` as a header, little-endian columns and a JSON trailer.
+
+    Layout: HEADER, then u32 votes, u16 party codes, u16 alliance codes and
+    u8 states (one per seat each), then the dictionaries and scalars as
+    compact JSON.
+    """
+    count = len(columns["votes"])
+    trailer = json.dumps({k: columns[k] for k in TRAILER_FIELDS}, separators=(",", ":")).encode("utf-8")
+    parts = [HEADER.pack(MAGIC, FORMAT_VERSION, columns["first"], count, len(trailer))]
+    for name, typecode in COLUMNS:
+        parts.append(_little_endian(array(typecode, columns[name])).tobytes())
+    parts.append(trailer)
+    return b"".join(parts)
+
+
+def decode(data: bytes) -> dict:
+    magic, version, first, count, trailer_len = HEADER.unpack_from(data)
+    if magic != MAGIC or version != FORMAT_VERSION:
+        raise ValueError("not a map results payload")
+    columns = {"first": first}
+    offset = HEADER.size
+    for name, typecode in COLUMNS:
+        arr = array(typecode)
+        size = arr.itemsize * count
+        arr.frombytes(data[offset:offset + size])
+        columns[name] = list(_little_endian(arr))
+        offset += size
+    columns.update(json.loads(data[offset:offset + trailer_len]))
+    return columns
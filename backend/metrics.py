@@ -0,0 +1,472 @@
+import json
+import logging
+import os
+import socket
+import sys
+import threading
+import time
+from collections import Counter, deque
+from contextlib import contextmanager
+
+import redis
+from pymongo import monitoring
+
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+DB_OPS_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34)
+WORKERS_KEY = "metrics:workers"
+PUBLISH_INTERVAL = 10
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}"
+# Label combinations kept per metric; later ones are counted under "other" so
+# an unexpected label source cannot grow a worker's memory or the scrape.
+MAX_SERIES = 500
+
+log = logging.getLogger(__name__)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(names, values, extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help_text: str, labelnames=()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+        self._overflow = ("other",) * len(self.labelnames)
+
+    def _key(self, labelvalues: tuple) -> tuple:
+        # Called with the lock held.
+        if labelvalues in self._values or len(self._values) < MAX_SERIES:
+            return labelvalues
+        return self._overflow
+
+
+class CounterMetric(_Metric):
+    kind = "counter"
+
+    def inc(self, *labelvalues, amount: float = 1):
+        with self._lock:
+            key = self._key(labelvalues)
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dump(self):
+        with self._lock:
+            return [[list(k), v] for k, v in self._values.items()]
+
+    @staticmethod
+    def merge(into: dict, rows):
+        for labels, value in rows:
+            key = tuple(labels)
+            into[key] = into.get(key, 0) + value
+
+    def render(self, values: dict):
+        for labels, value in sorted(values.items()):
+            yield f"{self.name}{_labels(self.labelnames, labels)} {value}"
+
+
+class HistogramMetric(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, help_text, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value: float, *labelvalues):
+        with self._lock:
+            key = self._key(labelvalues)
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    entry[0][i] += 1
+                    break
+            entry[1] += value
+            entry[2] += 1
+
+    @contextmanager
+    def time(self, *labelvalues):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, *labelvalues)
+
+    def dump(self):
+        with self._lock:
+            return [[list(k), [list(v[0]), v[1], v[2]]] for k, v in self._values.items()]
+
+    @staticmethod
+    def merge(into: dict, rows):
+        for labels, (counts, total, n) in rows:
+            key = tuple(labels)
+            entry = into.setdefault(key, [[0] * len(counts), 0.0, 0])
+            entry[0] = [a + b for a, b in zip(entry[0], counts)]
+            entry[1] += total
+            entry[2] += n
+
+    def render(self, values: dict):
+        for labels, (counts, total, n) in sorted(values.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                le = _labels(self.labelnames, labels, f'le="{bound}"')
+                yield f"{self.name}_bucket{le} {cumulative}"
+            le = _labels(self.labelnames, labels, 'le="+Inf"')
+            yield f"{self.name}_bucket{le} {n}"
+            yield f"{self.name}_sum{_labels(self.labelnames, labels)} {total}"
+            yield f"{self.name}_count{_labels(self.labelnames, labels)} {n}"
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = []
+
+    def counter(self, name, help_text, labelnames=()):
+        metric = CounterMetric(name, help_text, labelnames)
+        self.metrics.append(metric)
+        return metric
+
+    def histogram(self, name, help_text, labelnames=(), buckets=LATENCY_BUCKETS):
+        metric = HistogramMetric(name, help_text, labelnames, buckets)
+        self.metrics.append(metric)
+        return metric
+
+    def dump(self) -> dict:
+        return {m.name: m.dump() for m in self.metrics}
+
+
+REGISTRY = Registry()
+REQUEST_SECONDS = REGISTRY.histogram(
+    "bdelection_http_request_seconds", "Request latency by route.", ("route", "method", "status"))
+REQUEST_DB_OPS = REGISTRY.histogram(
+    "bdelection_http_request_db_ops", "MongoDB commands issued per request.", ("route",), DB_OPS_BUCKETS)
+DEPENDENCY_SECONDS = REGISTRY.histogram(
+    "bdelection_dependency_seconds", "Calls to MongoDB, Redis, HTTP services and parsers.", ("dependency", "operation"))
+DEPENDENCY_ERRORS = REGISTRY.counter(
+    "bdelection_dependency_errors_total", "Failed dependency calls.", ("dependency", "operation"))
+POOL_WAIT_SECONDS = REGISTRY.histogram(
+    "bdelection_pool_wait_seconds", "Time spent waiting for a pooled connection.", ("pool",))
+POOL_CHECKOUT_FAILURES = REGISTRY.counter(
+    "bdelection_pool_checkout_failures_total", "Connection checkouts that failed (e.g. pool exhausted).",
+    ("pool", "reason"))
+CACHE_REQUESTS = REGISTRY.counter(
+    "bdelection_cache_requests_total", "Cache lookups by result (hit, stale, miss).", ("cache", "result"))
+VOTES = REGISTRY.counter("bdelection_votes_total", "Accepted votes.")
+
+_request = threading.local()
+_gauges = []
+_recent_votes = deque()
+_recent_lock = threading.Lock()
+
+
+def cache_event(cache: str, result: str, amount: int = 1):
+    if amount:
+        CACHE_REQUESTS.inc(cache, result, amount=amount)
+
+
+def vote_recorded():
+    VOTES.inc()
+    now = time.monotonic()
+    with _recent_lock:
+        _recent_votes.append(now)
+        while _recent_votes and _recent_votes[0] < now - 60:
+            _recent_votes.popleft()
+
+
+def _votes_last_minute() -> int:
+    now = time.monotonic()
+    with _recent_lock:
+        while _recent_votes and _recent_votes[0] < now - 60:
+            _recent_votes.popleft()
+        return len(_recent_votes)
+
+
+@contextmanager
+def track(dependency: str, operation: str):
+    """Time a dependency call; exceptions are counted and re-raised."""
+    start = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        DEPENDENCY_ERRORS.inc(dependency, operation)
+        raise
+    finally:
+        DEPENDENCY_SECONDS.observe(time.perf_counter() - start, dependency, operation)
+
+
+def begin_request():
+    _request.db_ops = 0
+    _request.started = time.perf_counter()
+
+
+def end_request(route: str, method: str, status: int) -> float:
+    elapsed = time.perf_counter() - getattr(_request, "started", time.perf_counter())
+    REQUEST_SECONDS.observe(elapsed, route, method, status)
+    REQUEST_DB_OPS.observe(getattr(_request, "db_ops", 0), route)
+    _request.db_ops = None
+    return elapsed
+
+
+def request_db_ops() -> int:
+    return getattr(_request, "db_ops", 0) or 0
+
+
+def count_db_op():
+    """Charge one database command to the request running on this thread, if any."""
+    if getattr(_request, "db_ops", None) is not None:
+        _request.db_ops += 1
+
+
+class MongoListener(monitoring.CommandListener):
+    """Times every MongoDB command and counts them against the current request."""
+
+    def started(self, event):
+        count_db_op()
+
+    def succeeded(self, event):
+        DEPENDENCY_SECONDS.observe(event.duration_micros / 1e6, "mongo", event.command_name)
+
+    def failed(self, event):
+        DEPENDENCY_SECONDS.observe(event.duration_micros / 1e6, "mongo", event.command_name)
+        DEPENDENCY_ERRORS.inc("mongo", event.command_name)
+
+
+class MongoPoolListener(monitoring.ConnectionPoolListener):
+    """Connection pool occupancy and checkout waits for the MongoDB client."""
+
+    def __init__(self):
+        self.open = 0
+        self.in_use = 0
+        self._waits = threading.local()
+        self._lock = threading.Lock()
+
+    def _add(self, field: str, delta: int):
+        with self._lock:
+            setattr(self, field, getattr(self, field) + delta)
+
+    def connection_check_out_started(self, event):
+        self._waits.started = time.perf_counter()
+
+    def connection_checked_out(self, event):
+        self._add("in_use", 1)
+        started = getattr(self._waits, "started", None)
+        if started is not None:
+            POOL_WAIT_SECONDS.observe(time.perf_counter() - started, "mongo")
+            self._waits.started = None
+
+    def connection_check_out_failed(self, event):
+        POOL_CHECKOUT_FAILURES.inc("mongo", str(event.reason))
+        self._waits.started = None
+
+    def connection_checked_in(self, event):
+        self._add("in_use", -1)
+
+    def connection_created(self, event):
+        self._add("open", 1)
+
+    def connection_closed(self, event):
+        self._add("open", -1)
+
+    def connection_ready(self, event):
+        pass
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        pass
+
+    def pool_closed(self, event):
+        pass
+
+
+class InstrumentedBlockingPool(redis.BlockingConnectionPool):
+    """BlockingConnectionPool that times how long callers wait for a connection."""
+
+    def get_connection(self, command_name, *keys, **options):
+        start = time.perf_counter()
+        try:
+            return super().get_connection(command_name, *keys, **options)
+        except redis.ConnectionError as exc:
+            if "No connection available" in str(exc):
+                POOL_CHECKOUT_FAILURES.inc("redis", "timeout")
+            raise
+        finally:
+            POOL_WAIT_SECONDS.observe(time.perf_counter() - start, "redis")
+
+
+class InstrumentedPipeline(redis.client.Pipeline):
+    def execute(self, raise_on_error=True):
+        with track("redis", "PIPELINE"):
+            return super().execute(raise_on_error)
+
+
+class InstrumentedRedis(redis.Redis):
+    """redis.Redis that times every command (pipelines as one PIPELINE call)."""
+
+    def execute_command(self, *args, **options):
+        with track("redis", str(args[0]).upper() if args else "?"):
+            return super().execute_command(*args, **options)
+
+    def pipeline(self, transaction=True, shard_hint=None):
+        return InstrumentedPipeline(self.connection_pool, self.response_callbacks, transaction, shard_hint)
+
+
+def gauge(name: str, help_text: str, labelnames, collect):
+    """Register a gauge; ``collect()`` returns (labelvalues, value) pairs. Summed over workers."""
+    _gauges[:] = [g for g in _gauges if g[0] != name]
+    _gauges.append((name, help_text, tuple(labelnames), collect))
+
+
+def _collect_gauges() -> dict:
+    out = {}
+    for name, _, _, collect in _gauges:
+        try:
+            out[name] = [[list(labels), value] for labels, value in collect()]
+        except Exception:
+            out[name] = []
+    return out
+
+
+def _worker_state() -> dict:
+    return {
+        "at": time.time(),
+        "metrics": REGISTRY.dump(),
+        "gauges": _collect_gauges(),
+        "votes_last_minute": _votes_last_minute(),
+    }
+
+
+def start_publisher(cache, interval: int = PUBLISH_INTERVAL):
+    """Share this worker's metrics through Redis so any worker can answer a scrape for all."""
+    if not cache:
+        return
+
+    def run():
+        while True:
+            try:
+                cache.hset(WORKERS_KEY, WORKER_ID, json.dumps(_worker_state()))
+            except Exception:
+                pass
+            time.sleep(interval)
+
+    threading.Thread(target=run, name="metrics-publisher", daemon=True).start()
+
+
+def render(cache=None, interval: int = PUBLISH_INTERVAL) -> str:
+    """Prometheus text exposition, summed over every worker that published recently."""
+    states = [_worker_state()]
+    if cache:
+        try:
+            for worker, raw in cache.hgetall(WORKERS_KEY).items():
+                if worker == WORKER_ID:
+                    continue
+                state = json.loads(raw)
+                if time.time() - state.get("at", 0) < 3 * interval:
+                    states.append(state)
+        except Exception:
+            pass
+
+    lines = []
+    merged = {}
+    for metric in REGISTRY.metrics:
+        values = merged[metric.name] = {}
+        for state in states:
+            metric.merge(values, state["metrics"].get(metric.name, []))
+        lines.append(f"# HELP {metric.name} {metric.help}")
+        lines.append(f"# TYPE {metric.name} {metric.kind}")
+        lines.extend(metric.render(values))
+
+    for name, help_text, labelnames, _ in _gauges:
+        values = {}
+        for state in states:
+            CounterMetric.merge(values, state.get("gauges", {}).get(name, []))
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} gauge")
+        lines.extend(f"{name}{_labels(labelnames, labels)} {value}" for labels, value in sorted(values.items()))
+
+    lines.append("# HELP bdelection_cache_hit_ratio Share of cache lookups served without a rebuild.")
+    lines.append("# TYPE bdelection_cache_hit_ratio gauge")
+    by_cache = {}
+    for (cache_name, result), n in merged[CACHE_REQUESTS.name].items():
+        hits, total = by_cache.get(cache_name, (0, 0))
+        by_cache[cache_name] = (hits + (n if result in ("hit", "stale") else 0), total + n)
+    for cache_name, (hits, total) in sorted(by_cache.items()):
+        lines.append(f'bdelection_cache_hit_ratio{{cache="{_escape(cache_name)}"}} {hits / total if total else 0}')
+
+    lines.append("# HELP bdelection_votes_per_second Accepted votes per second over the last minute.")
+    lines.append("# TYPE bdelection_votes_per_second gauge")
+    lines.append(f"bdelection_votes_per_second {sum(s.get('votes_last_minute', 0) for s in states) / 60}")
+    lines.append("# HELP bdelection_workers Workers included in this scrape.")
+    lines.append("# TYPE bdelection_workers gauge")
+    lines.append(f"bdelection_workers {len(states)}")
+    return "\n".join(lines) + "\n"
+
+
+class SamplingProfiler:
+    """Samples the stacks of in-flight requests from one background thread.
+
+    ``begin``/``end`` bracket a request on its own thread; ``end`` returns
+    folded stacks (``outer;inner`` -> samples) for that request. Only
+    meaningful with OS threads (the sync/gthread workers).
+    """
+
+    def __init__(self, interval: float = 0.005, max_depth: int = 40):
+        self.interval = interval
+        self.max_depth = max_depth
+        self._active = {}
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def begin(self):
+        ident = threading.get_ident()
+        with self._lock:
+            self._active[ident] = Counter()
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+                self._thread.start()
+        return ident
+
+    def end(self, ident) -> Counter:
+        with self._lock:
+            return self._active.pop(ident, Counter())
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            with self._lock:
+                if not self._active:
+                    continue
+                frames = sys._current_frames()
+                for ident, samples in self._active.items():
+                    frame = frames.get(ident)
+                    stack = []
+                    while frame is not None and len(stack) < self.max_depth:
+                        code = frame.f_code
+                        stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}:{frame.f_lineno}")
+                        frame = frame.f_back
+                    if stack:
+                        samples[";".join(reversed(stack))] += 1
+
+
+def format_profile(samples: Counter, top: int = 15) -> str:
+    total = sum(samples.values()) or 1
+    return "\n".join(
+        f"{n:5d} {100 * n / total:5.1f}% {stack}" for stack, n in samples.most_common(top)
+    )
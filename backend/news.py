@@ -0,0 +1,206 @@
+import json
+import logging
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+
+import feedparser
+import requests
+from requests.adapters import HTTPAdapter
+
+import metrics
+
+
+FEEDS = [
+    {"source": "BBC Bangla", "url": "https://feeds.bbci.co.uk/bengali/rss.xml"},
+    {"source": "Prothom Alo", "url": "https://www.prothomalo.com/feed/"},
+    {"source": "BanglaNews24", "url": "https://www.banglanews24.com/feed/"},
+    {"source": "Dhaka Tribune", "url": "https://www.dhakatribune.com/feed"},
+    {"source": "Jagonews24", "url": "https://www.jagonews24.com/rss/rss.xml"},
+    {"source": "BD24Live", "url": "https://www.bd24live.com/bangla/feed"},
+]
+FEEDS_KEY = "news_feeds"
+LOCK_KEY = "news_feeds:lock"
+ITEMS_PER_FEED = 6
+MAX_ITEMS = 24
+MAX_FEED_BYTES = 5 * 1024 * 1024
+DHAKA = timezone(timedelta(hours=6))
+
+log = logging.getLogger(__name__)
+
+
+def feed_published_dhaka(entry):
+    parsed = entry.get("published_parsed")
+    if parsed:
+        dt_utc = datetime(
+            parsed.tm_year,
+            parsed.tm_mon,
+            parsed.tm_mday,
+            parsed.tm_hour,
+            parsed.tm_min,
+            parsed.tm_sec,
+            tzinfo=timezone.utc,
+        )
+        return dt_utc.astimezone(DHAKA).isoformat()
+    return entry.get("published")
+
+
+class NewsFetcher:
+    """Background RSS aggregation for /api/news.
+
+    Feeds are fetched concurrently with a hard per-feed time budget and
+    conditional GETs (ETag / Last-Modified). Each feed's items and validators
+    are cached separately in the ``news_feeds`` Redis hash, so a dead feed
+    keeps its last good items and never empties the others. Requests only
+    ever read that hash; one worker per interval (holder of
+    ``news_feeds:lock``) does the fetching.
+    """
+
+    def __init__(self, cache, refresh_interval: int, timeout: float, feeds=None, standby=None):
+        self.cache = cache
+        # While ``standby()`` is true another process (worker.py) does the
+        # fetching and this one only reads the shared hash.
+        self.standby = standby or (lambda: False)
+        self.refresh_interval = refresh_interval
+        self.timeout = timeout
+        self.feeds = feeds or FEEDS
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=len(self.feeds), pool_maxsize=len(self.feeds))
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.session.headers["User-Agent"] = "bdelection2026-news/1.0"
+        self._pool = ThreadPoolExecutor(max_workers=len(self.feeds), thread_name_prefix="news")
+        self._local = {}
+        self._wake = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread:
+            return
+        self._thread = threading.Thread(target=self._run, name="news-refresh", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while True:
+            try:
+                self.tick()
+            except Exception:
+                log.exception("news refresh failed")
+            self._wake.wait(self.refresh_interval)
+            self._wake.clear()
+
+    def tick(self):
+        """One background round: fetch if this process holds the lock, else read the shared copy."""
+        if not self.standby() and self._acquire():
+            self.refresh()
+        else:
+            self._load_shared()
+
+    def _acquire(self) -> bool:
+        if not self.cache:
+            return True
+        try:
+            # Held for the whole interval: at most one fetch round per interval
+            # across all workers.
+            return bool(self.cache.set(LOCK_KEY, uuid.uuid4().hex, nx=True, ex=self.refresh_interval))
+        except Exception:
+            return True
+
+    def _load_shared(self):
+        if not self.cache:
+            return
+        try:
+            raw = self.cache.hgetall(FEEDS_KEY)
+        except Exception:
+            return
+        for source, state in raw.items():
+            self._local[source] = json.loads(state)
+
+    def refresh(self):
+        """Fetch every feed concurrently and store each result on its own."""
+        self._load_shared()
+        futures = {f["source"]: self._pool.submit(self._fetch, f, self._local.get(f["source"])) for f in self.feeds}
+        updates = {}
+        for source, future in futures.items():
+            state = future.result()
+            if state:
+                updates[source] = state
+                self._local[source] = state
+        if updates and self.cache:
+            try:
+                self.cache.hset(FEEDS_KEY, mapping={k: json.dumps(v) for k, v in updates.items()})
+            except Exception:
+                pass
+
+    def _fetch(self, feed: dict, previous):
+        headers = {}
+        if previous and previous.get("etag"):
+            headers["If-None-Match"] = previous["etag"]
+        if previous and previous.get("last_modified"):
+            headers["If-Modified-Since"] = previous["last_modified"]
+        try:
+            with metrics.track("http", f"news:{feed['source']}"):
+                resp, content = self._download(feed["url"], headers)
+        except Exception as exc:
+            log.warning("news feed %s failed: %s", feed["source"], exc)
+            return None
+        if resp.status_code == 304 and previous:
+            return {**previous, "fetched_at": time.time()}
+        if not resp.ok:
+            log.warning("news feed %s returned %s", feed["source"], resp.status_code)
+            return None
+        with metrics.track("cpu", "feedparser.parse"):
+            parsed = feedparser.parse(content)
+        items = [{
+            "title": entry.get("title"),
+            "link": entry.get("link"),
+            "published": feed_published_dhaka(entry),
+            "source": feed["source"],
+        } for entry in parsed.entries[:ITEMS_PER_FEED]]
+        return {
+            "items": items,
+            "etag": resp.headers.get("ETag"),
+            "last_modified": resp.headers.get("Last-Modified"),
+            "fetched_at": time.time(),
+        }
+
+    def _download(self, url: str, headers: dict):
+        # requests' timeout bounds each socket read, not the whole body, so a
+        # feed that trickles bytes is cut off against an overall deadline.
+        deadline = time.monotonic() + self.timeout
+        with self.session.get(url, headers=headers, timeout=self.timeout, stream=True) as resp:
+            chunks = []
+            size = 0
+            for chunk in resp.iter_content(64 * 1024):
+                chunks.append(chunk)
+                size += len(chunk)
+                if time.monotonic() > deadline:
+                    raise TimeoutError("feed exceeded time budget")
+                if size > MAX_FEED_BYTES:
+                    raise ValueError("feed too large")
+            return resp, b"".join(chunks)
+
+    def payload(self) -> dict:
+        """Merged items from the per-feed caches; never touches the network."""
+        states = dict(self._local)
+        if self.cache:
+            try:
+                states.update({k: json.loads(v) for k, v in self.cache.hgetall(FEEDS_KEY).items()})
+            except Exception:
+                pass
+        metrics.cache_event("news", "hit" if states else "miss")
+        if not states:
+            # Cold start: make sure a fetch round is on its way.
+            self.start()
+            self._wake.set()
+        items = []
+        fetched = []
+        for f in self.feeds:
+            state = states.get(f["source"])
+            if state:
+                items.extend(state.get("items", []))
+                fetched.append(state.get("fetched_at", 0))
+        updated_at = datetime.fromtimestamp(max(fetched), DHAKA) if fetched else datetime.now(DHAKA)
+        return {"items": items[:MAX_ITEMS], "updated_at": updated_at.isoformat()}
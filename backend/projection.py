@@ -0,0 +1,213 @@
+import zlib
+
+import numpy as np
+
+
+METHODS = (
+    "leads_plus_vote_share",
+    "leads_only",
+    "national_share",
+    "expected_seats",
+    "monte_carlo",
+)
+LEVELS = ("party", "alliance")
+# Seats whose leader is this many standard deviations ahead are treated as
+# decided instead of being sampled.
+DECISIVE_Z = 6.0
+# Posterior draws per competitive seat when estimating win probabilities.
+WIN_PROB_DRAWS = 500
+
+
+def largest_remainder(votes_by_group: dict, seats: int) -> dict:
+    """Split ``seats`` by vote share; ties on remainder go to more votes, then name (descending)."""
+    groups = [g for g, v in votes_by_group.items() if v > 0]
+    if seats <= 0 or not groups:
+        return {}
+    votes = np.array([votes_by_group[g] for g in groups], dtype=np.float64)
+    exact = (votes / votes.sum()) * seats
+    base = np.floor(exact).astype(np.int64)
+    names = np.argsort(np.argsort(np.array(groups, dtype=object)))
+    order = np.lexsort((names, votes, exact - base))[::-1]
+    base[order[:seats - int(base.sum())]] += 1
+    return {g: int(n) for g, n in zip(groups, base)}
+
+
+def projected_winner(projection: dict) -> dict:
+    if not projection:
+        return {"party": None, "seats": 0, "is_tied": False, "tied_parties": []}
+    max_seats = max(projection.values())
+    top = sorted(g for g, seats in projection.items() if seats == max_seats)
+    return {
+        "party": top[0] if len(top) == 1 else None,
+        "seats": max_seats,
+        "is_tied": len(top) > 1,
+        "tied_parties": top if len(top) > 1 else [],
+    }
+
+
+def project_seats(seats_leading_by_party: dict, votes_by_party: dict, unresolved: int):
+    """Current leads plus a vote-share split of unresolved seats (the /api/results/overall projection)."""
+    projection = {k: v for k, v in seats_leading_by_party.items() if v > 0}
+    projection_from_unresolved = largest_remainder(votes_by_party, unresolved)
+    for party, seats in projection_from_unresolved.items():
+        projection[party] = projection.get(party, 0) + seats
+    return projection, projection_from_unresolved, projected_winner(projection)
+
+
+class SeatMatrix:
+    """Enabled seats x candidate slots: vote counts and group codes as arrays.
+
+    ``codes`` maps each slot to an index into ``groups`` (party or alliance
+    names), -1 for padding.
+    """
+
+    def __init__(self, constituencies, seat_totals: dict, level: str = "party"):
+        field = "alliance_key" if level == "alliance" else "party"
+        # Seats without candidates (e.g. postponed) cannot be won by anyone.
+        seats = [c for c in constituencies if not c.get("is_disabled") and c.get("candidates")]
+        width = max((len(c.get("candidates", [])) for c in seats), default=0) or 1
+        self.groups = sorted({cand.get(field) for c in seats for cand in c.get("candidates", [])}, key=str)
+        index = {g: i for i, g in enumerate(self.groups)}
+        self.seat_nos = np.array([c.get("constituency_no") for c in seats], dtype=np.int64)
+        self.codes = np.full((len(seats), width), -1, dtype=np.int64)
+        self.votes = np.zeros((len(seats), width), dtype=np.float64)
+        for i, c in enumerate(seats):
+            totals = seat_totals.get(c.get("constituency_no"), {})
+            for j, cand in enumerate(c.get("candidates", [])):
+                self.codes[i, j] = index[cand.get(field)]
+                self.votes[i, j] = totals.get(cand.get("candidate_id"), 0)
+        self.slots = self.codes >= 0
+        self.candidate_count = self.slots.sum(axis=1)
+
+    def seed(self) -> int:
+        # Same tallies, same draws: every worker serves the same intervals.
+        return zlib.crc32(self.votes.tobytes()) ^ zlib.crc32(self.codes.tobytes())
+
+    def national_shares(self) -> np.ndarray:
+        by_group = np.bincount(self.codes[self.slots], weights=self.votes[self.slots], minlength=len(self.groups))
+        total = by_group.sum()
+        if total <= 0:
+            return np.full(len(self.groups), 1.0 / max(len(self.groups), 1))
+        return by_group / total
+
+    def posterior(self, prior_strength: float) -> np.ndarray:
+        """Dirichlet parameters per seat: votes plus a national-share prior."""
+        shares = self.national_shares()
+        prior = np.where(self.slots, shares[np.maximum(self.codes, 0)], 0.0)
+        # Every real candidate keeps a little mass so unvoted seats stay open.
+        prior = np.where(self.slots, np.maximum(prior, 0.01), 0.0) * prior_strength
+        return self.votes + prior
+
+
+def win_probabilities(matrix: SeatMatrix, prior_strength: float, rng) -> np.ndarray:
+    """P(candidate slot wins the seat), seats x slots."""
+    alpha = matrix.posterior(prior_strength)
+    probs = np.zeros_like(alpha)
+    if not len(alpha):
+        return probs
+    total = alpha.sum(axis=1)
+    top2 = np.argsort(-alpha, axis=1)[:, :2]
+    rows = np.arange(len(alpha))
+    p1 = alpha[rows, top2[:, 0]] / total
+    p2 = alpha[rows, top2[:, -1]] / total if alpha.shape[1] > 1 else np.zeros(len(alpha))
+    # Normal approximation to the Dirichlet margin between the top two.
+    sd = np.sqrt(np.maximum(p1 + p2 - (p1 - p2) ** 2, 1e-12) / (total + 1))
+    decided = ((p1 - p2) / sd > DECISIVE_Z) | (matrix.candidate_count == 1)
+    probs[rows[decided], top2[decided, 0]] = 1.0
+
+    open_rows = rows[~decided]
+    if len(open_rows):
+        # Normalised gammas are Dirichlet draws; the winner only needs the argmax.
+        shape = alpha[open_rows]
+        draws = rng.standard_gamma(np.broadcast_to(shape, (WIN_PROB_DRAWS,) + shape.shape))
+        winners = draws.argmax(axis=2)
+        for j in range(alpha.shape[1]):
+            probs[open_rows, j] = (winners == j).mean(axis=0)
+    return probs
+
+
+def simulate(matrix: SeatMatrix, probs: np.ndarray, draws: int, rng) -> np.ndarray:
+    """Seat counts per group for each simulated outcome, draws x groups.
+
+    Decided seats are counted once. For the rest, one uniform per seat and
+    draw picks the winning slot against the cumulative win probabilities;
+    with A_j = (u >= cum_j), the winner indicators telescope, so the counts
+    are a constant row plus one (draws x seats) @ (seats x groups) product
+    per slot boundary.
+    """
+    groups = len(matrix.groups)
+    counts = np.zeros((draws, groups), dtype=np.float32)
+    if not len(probs) or not groups:
+        return counts.astype(np.int64)
+    onehot = np.zeros(probs.shape + (groups,), dtype=np.float32)
+    seat_idx, slot_idx = np.nonzero(matrix.slots)
+    onehot[seat_idx, slot_idx, matrix.codes[seat_idx, slot_idx]] = 1.0
+
+    decided = (probs == 1.0).any(axis=1)
+    counts += np.einsum("sc,scg->g", probs[decided], onehot[decided]).astype(np.float32)
+
+    open_probs = probs[~decided]
+    if len(open_probs):
+        onehot = onehot[~decided]
+        width = open_probs.shape[1]
+        cum = np.cumsum(open_probs, axis=1).astype(np.float32)
+        # Boundaries past a seat's last candidate are unreachable, so round-off
+        # can never hand the seat to a padding slot.
+        last = matrix.candidate_count[~decided] - 1
+        cum[np.arange(width)[None, :] >= last[:, None]] = 2.0
+        u = rng.random((draws, len(open_probs)), dtype=np.float32)
+        counts += onehot[:, 0, :].sum(axis=0)
+        for j in range(width - 1):
+            crossed = (u >= cum[:, j]).astype(np.float32)
+            counts += crossed @ (onehot[:, j + 1, :] - onehot[:, j, :])
+    return np.rint(counts).astype(np.int64)
+
+
+def project(constituencies, seat_totals: dict, seats_leading: dict, votes_by_group: dict,
+            unresolved: int, method: str = "leads_plus_vote_share", level: str = "party",
+            draws: int = 10000, prior_strength: float = 10.0) -> dict:
+    """Seat projection by ``method`` at party or alliance ``level``."""
+    seats_total = sum(1 for c in constituencies if not c.get("is_disabled"))
+    result = {"method": method, "level": level, "seats_total": seats_total}
+
+    if method == "leads_plus_vote_share":
+        projection, from_unresolved, _ = project_seats(seats_leading, votes_by_group, unresolved)
+        result["estimated_from_unresolved"] = from_unresolved
+    elif method == "leads_only":
+        projection = {k: v for k, v in seats_leading.items() if v > 0}
+    elif method == "national_share":
+        projection = largest_remainder(votes_by_group, seats_total)
+    else:
+        matrix = SeatMatrix(constituencies, seat_totals, level)
+        rng = np.random.default_rng(matrix.seed())
+        probs = win_probabilities(matrix, prior_strength, rng)
+        expected = np.bincount(
+            matrix.codes[matrix.slots], weights=probs[matrix.slots], minlength=len(matrix.groups)
+        )
+        if method == "expected_seats":
+            projection = {g: round(float(e), 2) for g, e in zip(matrix.groups, expected) if e > 0}
+        else:
+            counts = simulate(matrix, probs, draws, rng)
+            majority = seats_total // 2 + 1
+            p05, p50, p95 = np.percentile(counts, [5, 50, 95], axis=0)
+            top = counts.max(axis=1)
+            sole_top = (counts == top[:, None]).sum(axis=1) == 1
+            projection = {g: int(m) for g, m in zip(matrix.groups, p50) if expected[matrix.groups.index(g)] > 0}
+            result["draws"] = draws
+            result["majority"] = majority
+            result["intervals"] = {
+                g: {
+                    "mean": round(float(counts[:, i].mean()), 2),
+                    "p05": int(p05[i]),
+                    "p50": int(p50[i]),
+                    "p95": int(p95[i]),
+                    "p_largest": round(float(((counts[:, i] == top) & sole_top).mean()), 4),
+                    "p_majority": round(float((counts[:, i] >= majority).mean()), 4),
+                }
+                for i, g in enumerate(matrix.groups) if expected[i] > 0
+            }
+            result["p_no_majority"] = round(float((top < majority).mean()), 4)
+
+    result["projection"] = projection
+    result["projected_winner"] = projected_winner(projection)
+    return result
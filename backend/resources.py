@@ -0,0 +1,249 @@
+import os
+import threading
+import time
+import weakref
+
+import redis
+from pymongo import ReadPreference
+
+import metrics
+from db import get_db
+
+
+READ_PREFERENCES = {
+    "primary": ReadPreference.PRIMARY,
+    "primaryPreferred": ReadPreference.PRIMARY_PREFERRED,
+    "secondary": ReadPreference.SECONDARY,
+    "secondaryPreferred": ReadPreference.SECONDARY_PREFERRED,
+    "nearest": ReadPreference.NEAREST,
+}
+
+_instances = weakref.WeakSet()
+
+
+class CircuitBreaker:
+    """Opens after ``failures`` consecutive connection errors.
+
+    While open, calls fail immediately instead of each waiting out a
+    connect timeout; after ``reset_after`` seconds one call is let through
+    to probe, and its outcome closes or re-opens the circuit.
+    """
+
+    def __init__(self, failures: int, reset_after: float):
+        self.failures = failures
+        self.reset_after = reset_after
+        self._count = 0
+        self._opened_at = None
+        self._probing = False
+        self._lock = threading.Lock()
+
+    @property
+    def is_open(self) -> bool:
+        return self._opened_at is not None
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            if self._probing or time.monotonic() - self._opened_at < self.reset_after:
+                return False
+            self._probing = True
+            return True
+
+    def success(self):
+        with self._lock:
+            self._count = 0
+            self._opened_at = None
+            self._probing = False
+
+    def failure(self):
+        with self._lock:
+            self._count += 1
+            if self._probing or self._count >= self.failures:
+                self._opened_at = time.monotonic()
+            self._probing = False
+
+
+class CircuitOpenError(redis.ConnectionError):
+    pass
+
+
+def _guarded(breaker, call):
+    if not breaker.allow():
+        raise CircuitOpenError("Redis circuit open")
+    try:
+        result = call()
+    except (redis.ConnectionError, redis.TimeoutError):
+        breaker.failure()
+        raise
+    breaker.success()
+    return result
+
+
+class ManagedPipeline(metrics.InstrumentedPipeline):
+    breaker = None
+
+    def execute(self, raise_on_error=True):
+        return _guarded(self.breaker, lambda: super(ManagedPipeline, self).execute(raise_on_error))
+
+
+class ManagedRedis(metrics.InstrumentedRedis):
+    """InstrumentedRedis behind a circuit breaker.
+
+    redis-py reconnects on the next command after a dropped connection, so
+    the client stays usable through an outage and callers keep their usual
+    try/except fallbacks; the breaker only keeps them from each paying a
+    connect timeout while Redis is down.
+    """
+
+    def __init__(self, breaker: CircuitBreaker, **kwargs):
+        super().__init__(**kwargs)
+        self.breaker = breaker
+
+    def execute_command(self, *args, **options):
+        return _guarded(self.breaker, lambda: super(ManagedRedis, self).execute_command(*args, **options))
+
+    def pipeline(self, transaction=True, shard_hint=None):
+        pipe = ManagedPipeline(self.connection_pool, self.response_callbacks, transaction, shard_hint)
+        pipe.breaker = self.breaker
+        return pipe
+
+
+class LazyDatabase:
+    """Stands in for a pymongo Database, resolving the current process's client on each use."""
+
+    def __init__(self, resources, read_preference=None):
+        self._resources = resources
+        self._read_preference = read_preference
+
+    def _database(self):
+        return self._resources.database(self._read_preference)
+
+    def __getattr__(self, name):
+        return getattr(self._database(), name)
+
+    def __getitem__(self, name):
+        return self._database()[name]
+
+
+class Resources:
+    """Per-process MongoDB and Redis clients, built from Config.
+
+    The Mongo client is created on first use in each process and rebuilt if
+    the pid changes, so a client made before gunicorn forks (preload) is
+    never shared with workers. ``db`` and ``heavy_db`` are safe to hold on
+    to across forks; ``heavy_db`` reads with MONGO_HEAVY_READ_PREFERENCE.
+    The Redis client is created even if Redis is down at boot and recovers
+    by itself once Redis is back.
+    """
+
+    def __init__(self, cfg):
+        self.cfg = cfg
+        self.mongo_pool = metrics.MongoPoolListener()
+        self.redis_breaker = CircuitBreaker(cfg.redis_breaker_failures, cfg.redis_breaker_reset)
+        self._pid = None
+        self._databases = {}
+        self._redis = None
+        self._lock = threading.Lock()
+        self.db = LazyDatabase(self)
+        self.heavy_db = LazyDatabase(self, cfg.mongo_heavy_read_preference)
+        _instances.add(self)
+
+    def _client_options(self) -> dict:
+        cfg = self.cfg
+        return {
+            "maxPoolSize": cfg.mongo_max_pool_size,
+            "minPoolSize": cfg.mongo_min_pool_size,
+            "connectTimeoutMS": cfg.mongo_connect_timeout_ms,
+            "serverSelectionTimeoutMS": cfg.mongo_server_selection_timeout_ms,
+            "socketTimeoutMS": cfg.mongo_socket_timeout_ms or None,
+            "waitQueueTimeoutMS": cfg.mongo_wait_queue_timeout_ms or None,
+        }
+
+    def database(self, read_preference=None):
+        pid = os.getpid()
+        if self._pid != pid:
+            with self._lock:
+                if self._pid != pid:
+                    # Whatever the parent built belongs to the parent; closing
+                    # it here would disturb the parent's sockets.
+                    self.mongo_pool = metrics.MongoPoolListener()
+                    primary = get_db(
+                        self.cfg.mongo_uri,
+                        self.cfg.db_name,
+                        event_listeners=[metrics.MongoListener(), self.mongo_pool],
+                        **self._client_options(),
+                    )
+                    self._databases = {None: primary}
+                    self._pid = pid
+        databases = self._databases
+        if read_preference not in databases:
+            databases[read_preference] = databases[None].client.get_database(
+                self.cfg.db_name, read_preference=READ_PREFERENCES[read_preference]
+            )
+        return databases[read_preference]
+
+    @property
+    def redis(self):
+        """Shared Redis client, or None when REDIS_CACHE_URL is empty."""
+        if self._redis is None and self.cfg.redis_cache_url:
+            with self._lock:
+                if self._redis is None:
+                    # A blocking pool caps connections per worker; under gevent
+                    # every in-flight request would otherwise open its own.
+                    pool = metrics.InstrumentedBlockingPool.from_url(
+                        self.cfg.redis_cache_url,
+                        max_connections=self.cfg.redis_max_connections,
+                        timeout=self.cfg.redis_pool_timeout,
+                        socket_timeout=self.cfg.redis_socket_timeout,
+                        socket_connect_timeout=self.cfg.redis_connect_timeout,
+                        decode_responses=True,
+                    )
+                    self._redis = ManagedRedis(self.redis_breaker, connection_pool=pool)
+        return self._redis
+
+    def redis_available(self) -> bool:
+        client = self.redis
+        if client is None:
+            return False
+        try:
+            return bool(client.ping())
+        except Exception:
+            return False
+
+    def after_fork(self):
+        self._pid = None
+        self._databases = {}
+
+    def pool_stats(self):
+        """(pool, state) -> connections, for the pool gauges."""
+        stats = [
+            (("mongo", "in_use"), self.mongo_pool.in_use),
+            (("mongo", "idle"), max(self.mongo_pool.open - self.mongo_pool.in_use, 0)),
+        ]
+        pool = self._redis.connection_pool if self._redis is not None else None
+        if pool is not None:
+            created = len(getattr(pool, "_connections", []))
+            idle = sum(1 for c in list(pool.pool.queue) if c is not None)
+            stats += [(("redis", "in_use"), created - idle), (("redis", "idle"), idle)]
+        return stats
+
+    def pool_limits(self):
+        stats = [(("mongo",), self.cfg.mongo_max_pool_size)]
+        if self._redis is not None:
+            stats.append((("redis",), self.cfg.redis_max_connections))
+        return stats
+
+    def register_gauges(self):
+        metrics.gauge("bdelection_pool_connections", "Pooled connections by state.", ("pool", "state"), self.pool_stats)
+        metrics.gauge("bdelection_pool_max_connections", "Pool size limits.", ("pool",), self.pool_limits)
+        metrics.gauge(
+            "bdelection_redis_circuit_open", "Workers whose Redis circuit breaker is open.", (),
+            lambda: [((), int(self.redis_breaker.is_open))],
+        )
+
+
+def after_fork():
+    """gunicorn post_fork hook: drop clients inherited from the master."""
+    for resources in list(_instances):
+        resources.after_fork()
@@ -0,0 +1,99 @@
+import gzip
+import hashlib
+import threading
+from collections import OrderedDict
+
+from flask import Response, request
+
+import metrics
+
+try:
+    import brotli
+except ImportError:  # optional; gzip is always available
+    brotli = None
+
+
+MIN_COMPRESS_BYTES = 512
+
+
+class EncodedBody:
+    """A body encoded once: raw bytes, compressed variants and its ETag.
+
+    ``text`` is a JSON string, or bytes served as-is with ``mimetype``.
+    """
+
+    __slots__ = ("text", "raw", "gzip", "br", "etag", "mimetype")
+
+    def __init__(self, text, mimetype: str = "application/json"):
+        self.text = text
+        self.raw = text if isinstance(text, bytes) else text.encode("utf-8")
+        self.mimetype = mimetype
+        self.etag = hashlib.blake2b(self.raw, digest_size=12).hexdigest()
+        self.gzip = None
+        self.br = None
+        if len(self.raw) >= MIN_COMPRESS_BYTES:
+            self.gzip = gzip.compress(self.raw, compresslevel=6)
+            if brotli is not None:
+                self.br = brotli.compress(self.raw, quality=5)
+
+
+class EncodedCache:
+    """Small per-worker LRU of EncodedBody objects keyed by resource."""
+
+    def __init__(self, max_entries: int = 1024):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, text, mimetype: str = "application/json") -> EncodedBody:
+        """Return the encoded form of ``text``, reusing it while ``key`` still maps to it."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.text == text:
+                self._entries.move_to_end(key)
+                metrics.cache_event("encoded", "hit")
+                return entry
+        metrics.cache_event("encoded", "miss")
+        entry = EncodedBody(text, mimetype)
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return entry
+
+    def lookup(self, key, build, mimetype: str = "application/json") -> EncodedBody:
+        """Like ``get`` for keys that already carry a version; ``build()`` runs on a miss only."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                metrics.cache_event("encoded", "hit")
+                return entry
+        return self.get(key, build(), mimetype)
+
+
+def encoded_response(body: EncodedBody, max_age: int, stale: int = 0) -> Response:
+    """Serve ``body`` with ETag/304 handling and the best accepted encoding."""
+    cache_control = f"public, max-age={max_age}"
+    if stale:
+        cache_control += f", stale-while-revalidate={stale}"
+    # Weak ETag: the same entity is served gzip, brotli or identity encoded.
+    etag = f'W/"{body.etag}"'
+
+    if request.if_none_match and request.if_none_match.contains_weak(body.etag):
+        resp = Response(status=304)
+    else:
+        accepted = request.accept_encodings
+        if body.br is not None and accepted["br"]:
+            resp = Response(body.br, mimetype=body.mimetype)
+            resp.headers["Content-Encoding"] = "br"
+        elif body.gzip is not None and accepted["gzip"]:
+            resp = Response(body.gzip, mimetype=body.mimetype)
+            resp.headers["Content-Encoding"] = "gzip"
+        else:
+            resp = Response(body.raw, mimetype=body.mimetype)
+    resp.headers["ETag"] = etag
+    resp.headers["Cache-Control"] = cache_control
+    resp.headers["Vary"] = "Accept-Encoding"
+    return resp
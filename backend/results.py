@@ -0,0 +1,332 @@
+import heapq
+import threading
+from datetime import timedelta
+
+from projection import project_seats
+from tallies import read_tallies
+
+
+# Tally documents are re-read with this much overlap so writes stamped by a
+# worker with a slightly lagging clock are never skipped. Re-applying a seat's
+# totals is idempotent, so the overlap only costs a few extra documents.
+REFRESH_OVERLAP = timedelta(seconds=5)
+# Seat states in the map columns, by code.
+MAP_STATES = ("no_votes", "lead", "tied", "unknown", "disabled")
+NO_VOTES, LEAD, TIED, UNKNOWN, DISABLED = range(len(MAP_STATES))
+
+
+def seat_leader(totals: dict):
+    """Return (leader_candidate_id, is_tied, max_votes) for a seat's totals."""
+    if not totals:
+        return None, False, 0
+    max_votes = max(totals.values())
+    leaders = [cid for cid, v in totals.items() if v == max_votes]
+    if len(leaders) > 1:
+        return None, True, max_votes
+    return leaders[0], False, max_votes
+
+
+def seat_result(totals: dict, candidates_by_id):
+    """Return (leader, is_tied) in the shape served by the constituency endpoints."""
+    cid, is_tied, max_votes = seat_leader(totals)
+    cand = candidates_by_id.get(cid) if cid else None
+    if not cand:
+        return None, is_tied
+    return {
+        "candidate_id": cid,
+        "name": cand.get("name"),
+        "party": cand.get("party"),
+        "alliance_key": cand.get("alliance_key"),
+        "votes": max_votes,
+    }, is_tied
+
+
+def _bump(counter: dict, key, delta: int):
+    value = counter.get(key, 0) + delta
+    if value:
+        counter[key] = value
+    else:
+        counter.pop(key, None)
+
+
+def _dictionary(values):
+    """Sorted names with None at code 0, and name -> code."""
+    names = [None] + sorted({v for v in values if v})
+    return names, {name: code for code, name in enumerate(names) if code}
+
+
+class ResultsAggregator:
+    """Running aggregates behind /api/results/overall.
+
+    Seat totals are applied as deltas: only the changed seat's vote sums and
+    leader are touched, and the party/alliance counters are adjusted in place
+    instead of being recomputed over every constituency.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        # Bumped on every change; keys cached derivations such as projections.
+        self.revision = 0
+        self._reset(None)
+
+    def _reset(self, catalog):
+        self.catalog = catalog
+        self.constituencies = catalog.constituencies if catalog else ()
+        self.candidate_lookup = catalog.candidates if catalog else {}
+        self.disabled = set()
+        self.enabled = set()
+        for c in self.constituencies:
+            if c.get("is_disabled"):
+                self.disabled.add(c.get("constituency_no"))
+            else:
+                self.enabled.add(c.get("constituency_no"))
+
+        self.seat_totals = {}
+        self.seat_votes = {}
+        self.votes_by_alliance = {}
+        self.votes_by_party = {}
+        self.seats_leading_by_alliance = {}
+        self.seats_leading_by_party = {}
+        self.leaders_by_constituency = {}
+        self.tied = 0
+        self.no_votes = 0
+        for no in self.enabled:
+            self.no_votes += 1
+            self.leaders_by_constituency[no] = {"leader": None, "is_tied": False}
+        self.watermark = None
+        self._payload = None
+        self._map_dictionaries = None
+        self.revision += 1
+
+    def load(self, catalog, tallies):
+        with self._lock:
+            self._reset(catalog)
+            for t in tallies:
+                self._apply(t.get("constituency_no"), t.get("totals", {}))
+                self._advance_watermark(t.get("updated_at"))
+
+    def seed(self, snapshot, catalog) -> bool:
+        """Start from a tally snapshot instead of every tally.
+
+        The next ``refresh`` then only reads tallies updated since the
+        snapshot's watermark. A snapshot of another catalog generation is
+        ignored.
+        """
+        if snapshot is None or catalog is None or snapshot.generation != catalog.generation:
+            return False
+        with self._lock:
+            self._reset(catalog)
+            for no, totals in snapshot.totals().items():
+                self._apply(no, totals)
+            self.watermark = snapshot.tallies_watermark
+        return True
+
+    def refresh(self, db, catalog):
+        """Apply tallies written (by any worker) since the last refresh.
+
+        A new catalog (after an import) resets the aggregates and reloads
+        every tally, since seats and candidates may have changed.
+        """
+        with self._lock:
+            if catalog is not self.catalog:
+                self.load(catalog, read_tallies(db))
+                return
+            since = self.watermark - REFRESH_OVERLAP if self.watermark is not None else None
+            for t in read_tallies(db, since):
+                self._apply(t.get("constituency_no"), t.get("totals", {}))
+                self._advance_watermark(t.get("updated_at"))
+
+    def apply_totals(self, constituency_no: int, totals: dict):
+        with self._lock:
+            return self._apply(constituency_no, totals)
+
+    def _advance_watermark(self, updated_at):
+        if updated_at is None:
+            return
+        if self.watermark is None or updated_at > self.watermark:
+            self.watermark = updated_at
+
+    def _apply(self, constituency_no, totals: dict) -> bool:
+        totals = dict(totals or {})
+        previous = self.seat_totals.get(constituency_no, {})
+        if previous == totals:
+            return False
+        self.seat_totals[constituency_no] = totals
+        self.seat_votes[constituency_no] = sum(totals.values())
+
+        for cid in set(previous) | set(totals):
+            delta = totals.get(cid, 0) - previous.get(cid, 0)
+            if not delta:
+                continue
+            cand = self.candidate_lookup.get(cid)
+            if not cand:
+                continue
+            _bump(self.votes_by_alliance, cand.get("alliance_key"), delta)
+            _bump(self.votes_by_party, cand.get("party"), delta)
+
+        if constituency_no in self.enabled:
+            self._update_leader(constituency_no, previous, totals)
+        self._payload = None
+        self.revision += 1
+        return True
+
+    def _seat_state(self, totals: dict):
+        if not totals:
+            return "no_votes", None
+        cid, is_tied, _ = seat_leader(totals)
+        if is_tied:
+            return "tied", None
+        leader = self.candidate_lookup.get(cid)
+        if not leader:
+            return "unknown", None
+        return "lead", leader
+
+    def _update_leader(self, constituency_no, previous: dict, totals: dict):
+        old_state, old_leader = self._seat_state(previous)
+        new_state, new_leader = self._seat_state(totals)
+        if old_state == new_state and old_leader is new_leader:
+            return
+
+        if old_state == "no_votes":
+            self.no_votes -= 1
+        elif old_state == "tied":
+            self.tied -= 1
+        elif old_state == "lead":
+            _bump(self.seats_leading_by_alliance, old_leader.get("alliance_key"), -1)
+            _bump(self.seats_leading_by_party, old_leader.get("party"), -1)
+
+        if new_state == "no_votes":
+            self.no_votes += 1
+            self.leaders_by_constituency[constituency_no] = {"leader": None, "is_tied": False}
+        elif new_state == "tied":
+            self.tied += 1
+            self.leaders_by_constituency[constituency_no] = {"leader": None, "is_tied": True}
+        elif new_state == "lead":
+            _bump(self.seats_leading_by_alliance, new_leader.get("alliance_key"), 1)
+            _bump(self.seats_leading_by_party, new_leader.get("party"), 1)
+            self.leaders_by_constituency[constituency_no] = {"leader": new_leader, "is_tied": False}
+        else:
+            # Leader's candidate is no longer in the catalog; the full recompute
+            # used to skip such seats as well.
+            self.leaders_by_constituency.pop(constituency_no, None)
+
+    def _top_seats(self):
+        top = heapq.nlargest(
+            10,
+            self.constituencies,
+            key=lambda c: self.seat_votes.get(c.get("constituency_no"), 0),
+        )
+        return [{
+            "constituency_no": c.get("constituency_no"),
+            "seat": c.get("seat"),
+            "division": c.get("division"),
+            "total_votes": self.seat_votes.get(c.get("constituency_no"), 0),
+        } for c in top]
+
+    def projection_inputs(self, level: str = "party") -> dict:
+        """Consistent copy of what ``projection.project`` needs, plus the revision it reflects."""
+        with self._lock:
+            alliance = level == "alliance"
+            return {
+                "revision": self.revision,
+                "constituencies": self.constituencies,
+                "seat_totals": dict(self.seat_totals),
+                "seats_leading": dict(self.seats_leading_by_alliance if alliance else self.seats_leading_by_party),
+                "votes_by_group": dict(self.votes_by_alliance if alliance else self.votes_by_party),
+                "unresolved": self.tied + self.no_votes,
+            }
+
+    def map_columns(self) -> dict:
+        """Per-seat leader state as parallel arrays; index i is constituency ``first + i``.
+
+        Alliance and party codes index the ``alliances`` / ``parties``
+        dictionaries, which are built from the catalog (code 0 is "none"), so
+        they stay the same for a catalog generation.
+        """
+        with self._lock:
+            if self._map_dictionaries is None:
+                candidates = self.candidate_lookup.values()
+                self._map_dictionaries = (
+                    _dictionary(c.get("alliance_key") for c in candidates),
+                    _dictionary(c.get("party") for c in candidates),
+                )
+            (alliances, alliance_codes), (parties, party_codes) = self._map_dictionaries
+
+            nos = [c.get("constituency_no") for c in self.constituencies]
+            first = min(nos, default=1)
+            count = max(nos, default=0) - first + 1
+            state = [DISABLED] * count
+            alliance = [0] * count
+            party = [0] * count
+            votes = [0] * count
+            for no in nos:
+                i = no - first
+                votes[i] = self.seat_votes.get(no, 0)
+                if no not in self.enabled:
+                    continue
+                entry = self.leaders_by_constituency.get(no)
+                leader = entry and entry["leader"]
+                if leader:
+                    state[i] = LEAD
+                    alliance[i] = alliance_codes.get(leader.get("alliance_key"), 0)
+                    party[i] = party_codes.get(leader.get("party"), 0)
+                elif entry is None:
+                    state[i] = UNKNOWN
+                else:
+                    state[i] = TIED if entry["is_tied"] else NO_VOTES
+            return {
+                "generation": self.catalog.generation if self.catalog else 0,
+                "total_votes": sum(self.votes_by_party.values()),
+                "first": first,
+                "states": list(MAP_STATES),
+                "alliances": list(alliances),
+                "parties": list(parties),
+                "state": state,
+                "alliance": alliance,
+                "party": party,
+                "votes": votes,
+            }
+
+    def payload(self) -> dict:
+        """Overall results; rebuilt only when a seat changed since the last call."""
+        with self._lock:
+            if self._payload is None:
+                self._payload = self._build_payload()
+            return dict(self._payload)
+
+    def _build_payload(self) -> dict:
+        seats_total = len(self.constituencies) - len(self.disabled)
+        seats_current = sum(self.seats_leading_by_party.values())
+        unresolved = self.tied + self.no_votes
+        projection, projection_from_unresolved, projected_winner = project_seats(
+            self.seats_leading_by_party, self.votes_by_party, unresolved
+        )
+        return {
+            "total_votes": sum(self.votes_by_party.values()),
+            "votes_by_alliance": dict(self.votes_by_alliance),
+            "votes_by_party": dict(self.votes_by_party),
+            "seats_leading_by_alliance": {
+                **self.seats_leading_by_alliance,
+                "tied": self.tied,
+                "no_votes": self.no_votes,
+            },
+            "seats_leading_by_party": {
+                **self.seats_leading_by_party,
+                "TIED": self.tied,
+                "NO_VOTES": self.no_votes,
+            },
+            "constituencies_count": len(self.constituencies),
+            "disabled_count": len(self.disabled),
+            "leaders_by_constituency": dict(sorted(self.leaders_by_constituency.items())),
+            "top_seats_by_votes": self._top_seats(),
+            "projection_by_party": projection,
+            "projection_meta": {
+                "seats_total": seats_total,
+                "seats_current": seats_current,
+                "remaining": unresolved,
+                "current_leads_by_party": dict(self.seats_leading_by_party),
+                "estimated_from_unresolved_by_party": projection_from_unresolved,
+                "method": "current_leads_plus_vote_share_unresolved",
+            },
+            "projected_winner": projected_winner,
+        }
@@ -0,0 +1,162 @@
+import atexit
+import logging
+import math
+import re
+import threading
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+
+from pymongo import UpdateOne
+
+
+GRANULARITIES = {
+    "minute": timedelta(minutes=1),
+    "hour": timedelta(hours=1),
+}
+DIMENSIONS = ("total", "constituency", "party", "alliance")
+RANGE_PATTERN = re.compile(r"^(\d{1,4})([mhd])$")
+RANGE_UNITS = {"m": "minutes", "h": "hours", "d": "days"}
+# "auto" uses minute buckets up to this range, hour buckets beyond it.
+AUTO_MINUTE_RANGE = timedelta(hours=6)
+DHAKA = timezone(timedelta(hours=6))
+
+log = logging.getLogger(__name__)
+
+
+def parse_range(value: str):
+    """``"90m"``, ``"6h"``, ``"7d"`` -> timedelta, or None if malformed."""
+    match = RANGE_PATTERN.match(value or "")
+    if not match or int(match.group(1)) == 0:
+        return None
+    return timedelta(**{RANGE_UNITS[match.group(2)]: int(match.group(1))})
+
+
+def _utc(value: datetime) -> datetime:
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def bucket_start(value: datetime, granularity: str) -> datetime:
+    value = _utc(value).replace(second=0, microsecond=0)
+    return value.replace(minute=0) if granularity == "hour" else value
+
+
+class VoteRollups:
+    """Per-minute and per-hour vote counts by constituency, party and alliance.
+
+    Each worker counts the votes it accepts in memory and adds them to the
+    ``vote_rollups`` collection with one unordered bulk ``$inc`` per flush
+    interval, so trend queries read a few hundred small documents instead of
+    aggregating ``votes`` (from ``read_db`` when given). Every bucket
+    document carries an ``expires_at`` (TTL index): minute buckets are kept
+    for ``minute_retention``, hour buckets for ``hour_retention``.
+    """
+
+    def __init__(self, db, flush_interval: float, minute_retention: timedelta, hour_retention: timedelta,
+                 read_db=None):
+        self.db = db
+        self.read_db = read_db if read_db is not None else db
+        self.flush_interval = flush_interval
+        self.retention = {"minute": minute_retention, "hour": hour_retention}
+        self._pending = Counter()
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def record(self, vote: dict):
+        keys = (
+            ("total", ""),
+            ("constituency", str(vote.get("constituency_no"))),
+            ("party", vote.get("party") or ""),
+            ("alliance", vote.get("alliance_key") or ""),
+        )
+        voted_at = vote.get("voted_at")
+        with self._lock:
+            for granularity in GRANULARITIES:
+                bucket = bucket_start(voted_at, granularity)
+                for dim, key in keys:
+                    self._pending[(granularity, dim, key, bucket)] += 1
+
+    def start(self):
+        if self._thread:
+            return
+        self._thread = threading.Thread(target=self._run, name="vote-rollups", daemon=True)
+        self._thread.start()
+        atexit.register(self.flush)
+
+    def _run(self):
+        stop = threading.Event()
+        while not stop.wait(self.flush_interval):
+            try:
+                self.flush()
+            except Exception:
+                log.exception("vote rollup flush failed")
+
+    def flush(self) -> int:
+        with self._lock:
+            pending, self._pending = self._pending, Counter()
+        if not pending:
+            return 0
+        ops = [
+            UpdateOne(
+                {"granularity": granularity, "dim": dim, "key": key, "bucket": bucket},
+                {
+                    "$inc": {"votes": n},
+                    "$setOnInsert": {"expires_at": bucket + self.retention[granularity]},
+                },
+                upsert=True,
+            )
+            for (granularity, dim, key, bucket), n in pending.items()
+        ]
+        try:
+            self.db.vote_rollups.bulk_write(ops, ordered=False)
+        except Exception:
+            # Put the counts back so the next flush retries them.
+            with self._lock:
+                self._pending.update(pending)
+            raise
+        return len(ops)
+
+    def timeline(self, dim: str, key, span: timedelta, granularity: str = "auto",
+                 max_points: int = 120, now: datetime | None = None) -> dict:
+        """Zero-filled series per key over the last ``span``.
+
+        ``auto`` picks minute buckets for short ranges. Minute buckets older
+        than their retention are gone, so a longer range falls back to hours;
+        consecutive buckets are then merged until at most ``max_points``
+        remain.
+        """
+        if granularity == "auto":
+            granularity = "minute" if span <= AUTO_MINUTE_RANGE else "hour"
+        if granularity == "minute" and span > self.retention["minute"]:
+            granularity = "hour"
+        span = min(span, self.retention[granularity])
+        size = GRANULARITIES[granularity]
+
+        end = bucket_start(now or datetime.now(timezone.utc), granularity) + size
+        count = max(1, math.ceil(span / size))
+        step = max(1, math.ceil(count / max_points))
+        count = math.ceil(count / step) * step
+        start = end - count * size
+
+        query = {"granularity": granularity, "dim": dim, "bucket": {"$gte": start, "$lt": end}}
+        if key is not None:
+            query["key"] = key
+        series = {}
+        for doc in self.read_db.vote_rollups.find(query, {"_id": 0, "key": 1, "bucket": 1, "votes": 1}):
+            index = int((doc["bucket"] - start) / size) // step
+            points = series.setdefault(doc.get("key", ""), [0] * (count // step))
+            points[index] += doc.get("votes", 0)
+
+        return {
+            "dim": dim,
+            "granularity": granularity,
+            "bucket_seconds": int(size.total_seconds()) * step,
+            "from": start.replace(tzinfo=timezone.utc).astimezone(DHAKA).isoformat(),
+            "to": end.replace(tzinfo=timezone.utc).astimezone(DHAKA).isoformat(),
+            "buckets": [
+                (start + i * step * size).replace(tzinfo=timezone.utc).astimezone(DHAKA).isoformat()
+                for i in range(count // step)
+            ],
+            "series": series,
+        }
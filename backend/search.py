@@ -0,0 +1,75 @@
+import re
+import unicodedata
+
+
+BN_DIGITS = str.maketrans("০১২৩৪৫৬৭৮৯", "0123456789")
+# Split on whitespace and punctuation only: Bengali vowel signs are combining
+# marks, so \W would cut words apart.
+SEPARATORS = re.compile(r"[\s\-_,.;:()/\[\]|'\"]+")
+MAX_PREFIX = 24
+
+# Weight of a hit in each field; an exact token hit counts double.
+FIELD_WEIGHTS = {
+    "seat": 100,
+    "seat_bn": 100,
+    "name": 40,
+    "name_bn": 40,
+    "division": 20,
+    "division_bn": 20,
+}
+
+
+def normalize(text: str) -> str:
+    return unicodedata.normalize("NFC", text or "").casefold().translate(BN_DIGITS)
+
+
+def tokenize(text: str) -> list:
+    return [t for t in SEPARATORS.split(normalize(text)) if t]
+
+
+class SearchIndex:
+    """Prefix index for constituency typeahead.
+
+    Every token of the English and Bengali seat names, divisions and candidate
+    names is indexed under all of its prefixes (up to ``MAX_PREFIX`` chars),
+    with Bengali digits folded to ASCII. A query is answered with dict lookups
+    only: each query token must prefix-match some indexed token of the seat,
+    and seats are ranked by the summed weight of their best hits.
+    """
+
+    def __init__(self, constituencies):
+        self._prefix = {}
+        for c in constituencies:
+            no = c.get("constituency_no")
+            fields = [(f, c.get(f)) for f in ("seat", "seat_bn", "division", "division_bn")]
+            for cand in c.get("candidates", []):
+                fields.append(("name", cand.get("name")))
+                fields.append(("name_bn", cand.get("name_bn")))
+            for field, value in fields:
+                weight = FIELD_WEIGHTS[field]
+                for token in tokenize(value):
+                    token = token[:MAX_PREFIX]
+                    for i in range(1, len(token) + 1):
+                        score = weight * 2 if i == len(token) else weight
+                        hits = self._prefix.setdefault(token[:i], {})
+                        if hits.get(no, 0) < score:
+                            hits[no] = score
+
+    def search(self, query: str, limit: int | None = None) -> list:
+        """Return constituency numbers matching every token of ``query``, best first."""
+        tokens = [t[:MAX_PREFIX] for t in tokenize(query)]
+        if not tokens:
+            return []
+        scores = None
+        for token in sorted(set(tokens), key=lambda t: len(self._prefix.get(t, ()))):
+            hits = self._prefix.get(token)
+            if not hits:
+                return []
+            if scores is None:
+                scores = dict(hits)
+            else:
+                scores = {no: s + hits[no] for no, s in scores.items() if no in hits}
+                if not scores:
+                    return []
+        ranked = sorted(scores, key=lambda no: (-scores[no], no))
+        return ranked[:limit] if limit else ranked
@@ -0,0 +1,130 @@
+import json
+import threading
+import time
+from collections import OrderedDict
+
+import metrics
+
+
+SEAT_KEY = "seat:{}"
+
+# Values are "<votes>:<totals json>". A seat's vote count only grows, so an
+# entry is replaced only by one with more votes: write-throughs from
+# different workers landing out of order can never roll a seat back.
+SET_IF_NEWER_SCRIPT = """
+local current = redis.call('GET', KEYS[1])
+if current then
+  local sep = string.find(current, ':', 1, true)
+  if sep and tonumber(string.sub(current, 1, sep - 1)) >= tonumber(ARGV[1]) then
+    redis.call('EXPIRE', KEYS[1], ARGV[3])
+    return 0
+  end
+end
+redis.call('SET', KEYS[1], ARGV[1] .. ':' .. ARGV[2], 'EX', ARGV[3])
+return 1
+"""
+
+
+def vote_count(totals: dict) -> int:
+    return sum(totals.values())
+
+
+def _decode(raw: str):
+    votes, _, body = raw.partition(":")
+    return int(votes), json.loads(body)
+
+
+class SeatCache:
+    """Per-seat tally totals: a per-worker LRU in front of Redis.
+
+    ``put`` (called with the totals a vote returned) updates this worker's
+    entry and the seat's Redis key, touching no other seat. Other workers
+    pick the new totals up from Redis once their local copy is older than
+    ``local_ttl``. ``get_many`` answers from the LRU, then one MGET, then a
+    single ``load(nos)`` call for whatever is left; ``load`` returns the
+    totals and whether they are complete enough to cache.
+    """
+
+    def __init__(self, cache, load, local_ttl: float, ttl: int, capacity: int = 1024):
+        self.cache = cache
+        self.load = load
+        self.local_ttl = local_ttl
+        self.ttl = ttl
+        self.capacity = capacity
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._set_if_newer = cache.register_script(SET_IF_NEWER_SCRIPT) if cache else None
+
+    def _remember(self, no, totals: dict):
+        with self._lock:
+            self._entries[no] = (time.monotonic() + self.local_ttl, totals)
+            self._entries.move_to_end(no)
+            while len(self._entries) > self.capacity:
+                self._entries.popitem(last=False)
+
+    def _store(self, items):
+        if not self._set_if_newer or not items:
+            return
+        try:
+            pipe = self.cache.pipeline(transaction=False)
+            for no, totals in items:
+                self._set_if_newer(
+                    keys=[SEAT_KEY.format(no)],
+                    args=[vote_count(totals), json.dumps(totals), self.ttl],
+                    client=pipe,
+                )
+            pipe.execute()
+        except Exception:
+            pass
+
+    def put(self, constituency_no: int, totals: dict):
+        self._remember(constituency_no, totals)
+        self._store([(constituency_no, totals)])
+
+    def get(self, constituency_no: int) -> dict:
+        return self.get_many([constituency_no])[constituency_no]
+
+    def get_many(self, nos) -> dict:
+        found = {}
+        missing = []
+        now = time.monotonic()
+        with self._lock:
+            for no in nos:
+                entry = self._entries.get(no)
+                if entry is not None and entry[0] > now:
+                    self._entries.move_to_end(no)
+                    found[no] = entry[1]
+                else:
+                    missing.append(no)
+        metrics.cache_event("seat", "hit", len(found))
+        if not missing:
+            return found
+        metrics.cache_event("seat", "miss", len(missing))
+
+        if self.cache:
+            try:
+                raws = self.cache.mget([SEAT_KEY.format(no) for no in missing])
+            except Exception:
+                raws = [None] * len(missing)
+            still = []
+            for no, raw in zip(missing, raws):
+                if raw is None:
+                    still.append(no)
+                    continue
+                _, totals = _decode(raw)
+                found[no] = totals
+                self._remember(no, totals)
+            metrics.cache_event("seat_redis", "hit", len(missing) - len(still))
+            metrics.cache_event("seat_redis", "miss", len(still))
+            missing = still
+
+        if missing:
+            loaded, cacheable = self.load(missing)
+            items = [(no, loaded.get(no, {})) for no in missing]
+            for no, totals in items:
+                found[no] = totals
+            if cacheable:
+                for no, totals in items:
+                    self._remember(no, totals)
+                self._store(items)
+        return found
@@ -0,0 +1,145 @@
+import json
+import time
+import uuid
+
+import metrics
+
+
+# Refreshes built_at only while the hash still holds a body, so a touch after
+# Redis lost the key cannot leave behind a hash with nothing to serve.
+TOUCH_SCRIPT = """
+if redis.call('HEXISTS', KEYS[1], 'body') == 0 then
+  return 0
+end
+redis.call('HSET', KEYS[1], 'built_at', ARGV[1])
+redis.call('EXPIRE', KEYS[1], ARGV[2])
+return 1
+"""
+
+
+class VersionedSnapshot:
+    """Stale-while-revalidate cache for an expensive JSON payload.
+
+    The last good payload lives in a Redis hash together with a monotonically
+    increasing version. Once it is older than ``rebuild_interval`` exactly one
+    worker (holder of the ``<key>:lock`` key) rebuilds it; every other worker
+    keeps serving the stale copy, so rebuilds are capped at one per interval
+    regardless of how often votes arrive or clients poll.
+    """
+
+    def __init__(self, cache, key: str, rebuild_interval: int, stale_ttl: int,
+                 lock_timeout: int = 30, wait_timeout: float = 2.0):
+        self.cache = cache
+        self.key = key
+        self.version_key = f"{key}:version"
+        self.lock_key = f"{key}:lock"
+        self.rebuild_interval = rebuild_interval
+        self.stale_ttl = max(stale_ttl, rebuild_interval)
+        self.lock_timeout = lock_timeout
+        self.wait_timeout = wait_timeout
+        # Per-worker copy, used when Redis is unavailable.
+        self._local = None
+        self._touch = cache.register_script(TOUCH_SCRIPT) if cache else None
+
+    def get(self, build):
+        """Return ``(body, version)``; ``build()`` returns the payload dict."""
+        if not self.cache:
+            return self._get_local(build)
+        try:
+            snap = self.cache.hgetall(self.key)
+        except Exception:
+            return self._get_local(build)
+        if "body" not in snap:
+            snap = None
+
+        if snap and time.time() - float(snap.get("built_at", 0)) < self.rebuild_interval:
+            metrics.cache_event(self.key, "hit")
+            return snap["body"], int(snap["version"])
+
+        token = self._acquire()
+        if token:
+            metrics.cache_event(self.key, "miss")
+            try:
+                return self._rebuild(build)
+            finally:
+                self._release(token)
+        if snap:
+            metrics.cache_event(self.key, "stale")
+            return snap["body"], int(snap["version"])
+        return self._wait_for_first(build)
+
+    def publish(self, payload: dict):
+        """Store ``payload`` as a new version; for a producer outside the request path."""
+        return self._rebuild(lambda: payload)
+
+    def touch(self, build):
+        """Mark the current snapshot as freshly built without changing its version.
+
+        If Redis no longer holds the snapshot, ``build()`` is published instead.
+        """
+        try:
+            if self._touch(keys=[self.key], args=[time.time(), self.stale_ttl]):
+                return
+        except Exception:
+            return
+        self.publish(build())
+
+    def _acquire(self):
+        token = uuid.uuid4().hex
+        try:
+            if self.cache.set(self.lock_key, token, nx=True, ex=self.lock_timeout):
+                return token
+        except Exception:
+            pass
+        return None
+
+    def _release(self, token: str):
+        try:
+            if self.cache.get(self.lock_key) == token:
+                self.cache.delete(self.lock_key)
+        except Exception:
+            pass
+
+    def _rebuild(self, build):
+        payload = build()
+        try:
+            version = int(self.cache.incr(self.version_key))
+        except Exception:
+            return self._store_local(payload, self._local[1] if self._local else 0)
+        body, version = self._store_local(payload, version)
+        try:
+            pipe = self.cache.pipeline()
+            pipe.hset(self.key, mapping={"body": body, "version": version, "built_at": time.time()})
+            pipe.expire(self.key, self.stale_ttl)
+            pipe.execute()
+        except Exception:
+            pass
+        return body, version
+
+    def _wait_for_first(self, build):
+        # Cold start: another worker is building the first snapshot. Wait for it
+        # briefly rather than piling onto the database, then build locally.
+        deadline = time.time() + self.wait_timeout
+        while time.time() < deadline:
+            time.sleep(0.05)
+            try:
+                snap = self.cache.hgetall(self.key)
+            except Exception:
+                break
+            if "body" in snap:
+                metrics.cache_event(self.key, "hit")
+                return snap["body"], int(snap["version"])
+        return self._get_local(build)
+
+    def _get_local(self, build):
+        if self._local and time.time() - self._local[2] < self.rebuild_interval:
+            metrics.cache_event(self.key, "hit")
+            return self._local[0], self._local[1]
+        metrics.cache_event(self.key, "miss")
+        return self._store_local(build(), self._local[1] if self._local else 0)
+
+    def _store_local(self, payload: dict, version: int):
+        payload["version"] = version
+        body = json.dumps(payload)
+        self._local = (body, version, time.time())
+        return body, version
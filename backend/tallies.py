@@ -0,0 +1,162 @@
+import random
+import threading
+import time
+from collections import Counter
+
+from pymongo import ReturnDocument
+
+
+# Votes per seat are counted over this many seconds when looking for hot seats.
+PROMOTE_WINDOW = 10
+
+
+def _add_totals(into: dict, totals: dict):
+    for cid, n in totals.items():
+        into[cid] = into.get(cid, 0) + n
+
+
+def _merge(doc: dict, shards) -> dict:
+    doc = dict(doc)
+    totals = dict(doc.get("totals", {}))
+    for shard in shards:
+        _add_totals(totals, shard.get("totals", {}))
+        updated_at = shard.get("updated_at")
+        if updated_at is not None and (doc.get("updated_at") is None or updated_at > doc["updated_at"]):
+            doc["updated_at"] = updated_at
+    doc["totals"] = totals
+    return doc
+
+
+def read_tallies(db, since=None) -> list:
+    """Tally documents with shard counts folded into ``totals``.
+
+    With ``since``, only seats whose tallies document or any of whose shards
+    changed at or after it.
+    """
+    query = {"updated_at": {"$gte": since}} if since is not None else {}
+    docs = {t.get("constituency_no"): t for t in db.tallies.find(query, {"_id": 0})}
+    touched = {s.get("constituency_no") for s in db.tally_shards.find(query, {"_id": 0, "constituency_no": 1})}
+    missing = [no for no in touched if no not in docs]
+    if missing:
+        for t in db.tallies.find({"constituency_no": {"$in": missing}}, {"_id": 0}):
+            docs[t.get("constituency_no")] = t
+    sharded = touched | {no for no, t in docs.items() if t.get("shards")}
+    if not sharded:
+        return list(docs.values())
+    shards = {}
+    for s in db.tally_shards.find({"constituency_no": {"$in": list(sharded)}}, {"_id": 0}):
+        shards.setdefault(s.get("constituency_no"), []).append(s)
+    for no in sharded:
+        docs[no] = _merge(docs.get(no, {"constituency_no": no, "totals": {}}), shards.get(no, []))
+    return list(docs.values())
+
+
+class TallyStore:
+    """Per-seat vote counters, split over several documents for hot seats.
+
+    A seat starts with one ``tallies`` document bumped by
+    ``find_one_and_update``; Mongo serialises writes to it. When a worker
+    sees one seat take ``promote_rate`` votes/s or more, it marks the seat's
+    tallies document with ``shards: N``. From then on every worker $incs one
+    of N ``tally_shards`` documents picked at random, and reads add the
+    shards to the counts kept on the main document. Promotion is one-way.
+
+    With ``shards`` < 2 this worker never promotes seats, but still honours
+    seats promoted by others.
+    """
+
+    def __init__(self, db, shards: int, promote_rate: float, refresh_interval: float = 5):
+        self.db = db
+        self.shards = shards
+        self.promote_rate = promote_rate
+        self.refresh_interval = refresh_interval
+        self.sharded = {}
+        self._checked_at = 0.0
+        self._counts = Counter()
+        self._window_start = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _shard_count(self, constituency_no) -> int:
+        now = time.monotonic()
+        if now - self._checked_at >= self.refresh_interval:
+            self._checked_at = now
+            self.sharded = {
+                t["constituency_no"]: t["shards"]
+                for t in self.db.tallies.find({"shards": {"$gt": 1}}, {"_id": 0, "constituency_no": 1, "shards": 1})
+            }
+        return self.sharded.get(constituency_no, 0)
+
+    def _note_write(self, constituency_no):
+        if self.shards < 2:
+            return
+        hot = []
+        with self._lock:
+            now = time.monotonic()
+            if now - self._window_start >= PROMOTE_WINDOW:
+                elapsed = now - self._window_start
+                hot = [no for no, n in self._counts.items() if n / elapsed >= self.promote_rate]
+                self._counts = Counter()
+                self._window_start = now
+            self._counts[constituency_no] += 1
+        for no in hot:
+            if no not in self.sharded:
+                self.promote(no)
+
+    def promote(self, constituency_no, shards: int | None = None):
+        shards = shards or self.shards
+        self.db.tallies.update_one(
+            {"constituency_no": constituency_no},
+            {"$max": {"shards": shards}},
+            upsert=True,
+        )
+        self.sharded[constituency_no] = max(shards, self.sharded.get(constituency_no, 0))
+
+    def _merged(self, doc, constituency_no, session=None) -> dict:
+        shards = self.db.tally_shards.find({"constituency_no": constituency_no}, {"_id": 0}, session=session)
+        return _merge(doc or {"constituency_no": constituency_no, "totals": {}}, shards)
+
+    def increment(self, vote: dict, session=None) -> dict:
+        """Count one ballot; returns the seat's tally document after the write."""
+        no = vote["constituency_no"]
+        self._note_write(no)
+        shards = self._shard_count(no)
+        if shards > 1:
+            self.db.tally_shards.update_one(
+                {"constituency_no": no, "shard": random.randrange(shards)},
+                {"$inc": {f"totals.{vote['candidate_id']}": 1}, "$set": {"updated_at": vote["voted_at"]}},
+                upsert=True,
+                session=session,
+            )
+            doc = self.db.tallies.find_one({"constituency_no": no}, {"_id": 0}, session=session)
+            return self._merged(doc, no, session)
+        doc = self.db.tallies.find_one_and_update(
+            {"constituency_no": no},
+            {"$inc": {f"totals.{vote['candidate_id']}": 1}, "$set": {"updated_at": vote["voted_at"]}},
+            upsert=True,
+            projection={"_id": 0},
+            return_document=ReturnDocument.AFTER,
+            session=session,
+        )
+        if doc.get("shards"):
+            # Promoted by another worker since our last look.
+            self.sharded[no] = doc["shards"]
+            return self._merged(doc, no, session)
+        return doc
+
+    def totals_many(self, nos) -> dict:
+        """constituency_no -> totals for the given seats, in two queries at most."""
+        docs = {t["constituency_no"]: t for t in self.db.tallies.find({"constituency_no": {"$in": list(nos)}}, {"_id": 0})}
+        sharded = [no for no, t in docs.items() if t.get("shards")]
+        if sharded:
+            shards = {}
+            for s in self.db.tally_shards.find({"constituency_no": {"$in": sharded}}, {"_id": 0}):
+                shards.setdefault(s["constituency_no"], []).append(s)
+            for no in sharded:
+                docs[no] = _merge(docs[no], shards.get(no, []))
+        return {no: t.get("totals", {}) for no, t in docs.items()}
+
+    def totals(self, constituency_no: int) -> dict:
+        doc = self.db.tallies.find_one({"constituency_no": constituency_no}, {"_id": 0})
+        if doc and doc.get("shards"):
+            doc = self._merged(doc, constituency_no)
+        return doc.get("totals", {}) if doc else {}
@@ -0,0 +1,323 @@
+import argparse
+import json
+import logging
+import mmap
+import os
+import struct
+import sys
+import time
+from array import array
+from datetime import datetime, timedelta, timezone
+
+from catalog import load_catalog
+from config import load_config
+from db import ensure_indexes, get_db
+from results import ResultsAggregator
+
+
+MAGIC = b"BDTS"
+FORMAT_VERSION = 1
+# magic, format version, candidate slots per seat, seats, series buckets,
+# bucket seconds, extras length, catalog generation, tallies watermark,
+# votes watermark, series start (timestamps in epoch microseconds, 0 = none)
+HEADER = struct.Struct("<4sHHIIIIqqqq")
+CID_BYTES = 20  # candidate ids are sha1 hex digests, stored raw
+EPOCH = datetime(1970, 1, 1)
+
+log = logging.getLogger(__name__)
+
+
+def _to_micros(value) -> int:
+    if value is None:
+        return 0
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return (value - EPOCH) // timedelta(microseconds=1)
+
+
+def _from_micros(value: int):
+    # Naive UTC, the way pymongo returns stored datetimes.
+    return EPOCH + timedelta(microseconds=value) if value else None
+
+
+def _u32(values) -> array:
+    arr = array("I", values)
+    if sys.byteorder != "little":
+        arr.byteswap()
+    return arr
+
+
+class TallySnapshot:
+    """Point-in-time copy of every seat's totals plus a national votes-per-bucket series.
+
+    On disk: a fixed header, then seat numbers (u32), candidate ids
+    (``slots`` x 20 raw bytes per seat), counters (u32, seat-major, one per
+    candidate slot), the series (u32 per bucket) and a small JSON trailer for
+    tally entries whose candidate is not in the catalog. ``open`` maps the
+    file and reads counters straight out of the mapping.
+    """
+
+    def __init__(self, generation: int, slots: int, seat_nos, cids, counters, series,
+                 bucket_seconds: int, series_start=None, tallies_watermark=None,
+                 votes_watermark=None, extras=None):
+        self.generation = generation
+        self.slots = slots
+        self.seat_nos = seat_nos
+        self.cids = cids
+        self.counters = counters
+        self.series_counts = series
+        self.bucket_seconds = bucket_seconds
+        self.series_start = series_start
+        self.tallies_watermark = tallies_watermark
+        self.votes_watermark = votes_watermark
+        self.extras = extras or {}
+        self._mmap = None
+
+    @classmethod
+    def open(cls, path: str):
+        """Map ``path``; returns None if it is missing or not a valid snapshot."""
+        try:
+            with open(path, "rb") as f:
+                mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError):
+            return None
+        try:
+            return cls._parse(mm)
+        except (struct.error, ValueError, BufferError) as exc:
+            log.warning("ignoring tally snapshot %s: %s", path, exc)
+        try:
+            mm.close()
+        except BufferError:
+            # A view survived somewhere; the mapping goes when it does.
+            pass
+        return None
+
+    @classmethod
+    def _parse(cls, mm):
+        (magic, version, slots, seats, buckets, bucket_seconds, extras_len,
+         generation, tallies_wm, votes_wm, series_start) = HEADER.unpack_from(mm, 0)
+        if magic != MAGIC or version != FORMAT_VERSION:
+            raise ValueError("unknown format")
+        view = memoryview(mm)
+        # Every view into the mapping, so a failed parse can release them all
+        # and the caller can close the map.
+        views = [view]
+        offset = HEADER.size
+
+        def take(nbytes):
+            nonlocal offset
+            chunk = view[offset:offset + nbytes]
+            views.append(chunk)
+            if len(chunk) != nbytes:
+                raise ValueError("truncated")
+            offset += nbytes
+            return chunk
+
+        def counters(n):
+            chunk = take(4 * n)
+            if sys.byteorder == "little":
+                cast = chunk.cast("I")
+                views.append(cast)
+                return cast
+            arr = array("I", chunk.tobytes())
+            arr.byteswap()
+            return arr
+
+        try:
+            seat_nos = counters(seats)
+            raw_cids = take(CID_BYTES * slots * seats)
+            cids = []
+            for i in range(seats * slots):
+                raw = bytes(raw_cids[i * CID_BYTES:(i + 1) * CID_BYTES])
+                cids.append(raw.hex() if any(raw) else None)
+            snap = cls(
+                generation,
+                slots,
+                seat_nos,
+                cids,
+                counters(seats * slots),
+                counters(buckets),
+                bucket_seconds,
+                series_start=_from_micros(series_start),
+                tallies_watermark=_from_micros(tallies_wm),
+                votes_watermark=_from_micros(votes_wm),
+                extras={int(k): v for k, v in json.loads(bytes(take(extras_len)) or b"{}").items()},
+            )
+        except BaseException:
+            for v in reversed(views):
+                v.release()
+            raise
+        snap._mmap = mm
+        return snap
+
+    def close(self):
+        if self._mmap is not None:
+            # Views into the mapping must go before it can be closed.
+            self.seat_nos = list(self.seat_nos)
+            self.counters = list(self.counters)
+            self.series_counts = list(self.series_counts)
+            self._mmap.close()
+            self._mmap = None
+
+    def totals(self) -> dict:
+        """Tally totals by constituency, in the shape of ``tallies.totals``."""
+        out = {}
+        for i, no in enumerate(self.seat_nos):
+            totals = {}
+            base = i * self.slots
+            for j in range(self.slots):
+                cid = self.cids[base + j]
+                count = self.counters[base + j]
+                if cid and count:
+                    totals[cid] = count
+            totals.update(self.extras.get(no, {}))
+            if totals:
+                out[no] = totals
+        return out
+
+    def series(self) -> list:
+        """(bucket start, votes) pairs, oldest first."""
+        if self.series_start is None:
+            return []
+        step = timedelta(seconds=self.bucket_seconds)
+        return [(self.series_start + i * step, n) for i, n in enumerate(self.series_counts)]
+
+    def write(self, path: str):
+        """Write atomically: readers that mapped the old file keep it until they close."""
+        cids = bytearray()
+        for cid in self.cids:
+            cids += bytes.fromhex(cid) if cid else bytes(CID_BYTES)
+        extras = json.dumps({str(k): v for k, v in self.extras.items()}).encode("utf-8") if self.extras else b""
+        header = HEADER.pack(
+            MAGIC, FORMAT_VERSION, self.slots, len(self.seat_nos), len(self.series_counts),
+            self.bucket_seconds, len(extras), self.generation,
+            _to_micros(self.tallies_watermark), _to_micros(self.votes_watermark),
+            _to_micros(self.series_start),
+        )
+        tmp = f"{path}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(header)
+            _u32(self.seat_nos).tofile(f)
+            f.write(cids)
+            _u32(self.counters).tofile(f)
+            _u32(self.series_counts).tofile(f)
+            f.write(extras)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+
+
+def _bucket_of(voted_at, series_start, bucket_seconds: int) -> int:
+    if voted_at.tzinfo is not None:
+        voted_at = voted_at.astimezone(timezone.utc).replace(tzinfo=None)
+    return int((voted_at - series_start).total_seconds() // bucket_seconds)
+
+
+def build_snapshot(db, catalog, previous=None, bucket_seconds: int = 60, settle_seconds: int = 60):
+    """Build a snapshot, continuing from ``previous`` when it is still usable.
+
+    Totals come from ``tallies`` (only those updated since the previous
+    tallies watermark). The series replays ``votes`` with ``voted_at`` after
+    the previous votes watermark, up to ``settle_seconds`` ago: buffered
+    writes land in Mongo a little after their ``voted_at``, so the most
+    recent votes are left for the next run.
+    """
+    if previous is not None and (previous.generation != catalog.generation
+                                 or previous.bucket_seconds != bucket_seconds):
+        previous = None
+
+    aggregator = ResultsAggregator()
+    if previous is not None:
+        aggregator.seed(previous, catalog)
+    aggregator.refresh(db, catalog)
+
+    cutoff = datetime.now(timezone.utc).replace(tzinfo=None) - timedelta(seconds=settle_seconds)
+    series = list(previous.series_counts) if previous is not None else []
+    series_start = previous.series_start if previous is not None else None
+    since = previous.votes_watermark if previous is not None else None
+    query = {"voted_at": {"$lte": cutoff}}
+    if since is not None:
+        query["voted_at"]["$gt"] = since
+    for vote in db.votes.find(query, {"_id": 0, "voted_at": 1}).sort("voted_at", 1).batch_size(5000):
+        voted_at = vote.get("voted_at")
+        if voted_at is None:
+            continue
+        if series_start is None:
+            first = _to_micros(voted_at)
+            step = bucket_seconds * 1_000_000
+            series_start = _from_micros(first - first % step)
+        bucket = _bucket_of(voted_at, series_start, bucket_seconds)
+        if bucket >= len(series):
+            series.extend([0] * (bucket + 1 - len(series)))
+        series[bucket] += 1
+
+    slots = max((len(c.get("candidates", [])) for c in catalog.constituencies), default=0) or 1
+    seat_nos = []
+    cids = []
+    counters = []
+    extras = {}
+    for c in catalog.constituencies:
+        no = c.get("constituency_no")
+        totals = dict(aggregator.seat_totals.get(no, {}))
+        seat_nos.append(no)
+        candidates = [cand.get("candidate_id") for cand in c.get("candidates", [])]
+        candidates += [None] * (slots - len(candidates))
+        for cid in candidates:
+            cids.append(cid)
+            counters.append(totals.pop(cid, 0) if cid else 0)
+        if totals:
+            extras[no] = totals
+    # Tallies for seats that are no longer in the catalog.
+    for no, totals in aggregator.seat_totals.items():
+        if no not in catalog.by_no and totals:
+            extras[no] = dict(totals)
+
+    return TallySnapshot(
+        catalog.generation,
+        slots,
+        seat_nos,
+        cids,
+        counters,
+        series,
+        bucket_seconds,
+        series_start=series_start,
+        tallies_watermark=aggregator.watermark,
+        votes_watermark=cutoff,
+        extras=extras,
+    )
+
+
+def main():
+    cfg = load_config()
+    parser = argparse.ArgumentParser(description="Write the binary tally snapshot.")
+    parser.add_argument("--out", default=cfg.tally_snapshot_path)
+    parser.add_argument("--interval", type=int, default=0, help="seconds between snapshots (0 = run once)")
+    parser.add_argument("--bucket-seconds", type=int, default=60)
+    parser.add_argument("--settle-seconds", type=int, default=60)
+    args = parser.parse_args()
+    if not cfg.mongo_uri:
+        raise RuntimeError("MONGODB_URI is required")
+    if not args.out:
+        raise RuntimeError("TALLY_SNAPSHOT_PATH or --out is required")
+
+    db = get_db(cfg.mongo_uri, cfg.db_name)
+    ensure_indexes(db)
+    while True:
+        started = time.monotonic()
+        previous = TallySnapshot.open(args.out)
+        snapshot = build_snapshot(db, load_catalog(db), previous, args.bucket_seconds, args.settle_seconds)
+        if previous is not None:
+            previous.close()
+        snapshot.write(args.out)
+        print(
+            f"Wrote {args.out}: {len(snapshot.seat_nos)} seats, {sum(snapshot.counters)} votes, "
+            f"{len(snapshot.series_counts)} buckets in {time.monotonic() - started:.2f}s",
+            flush=True,
+        )
+        if args.interval <= 0:
+            return
+        time.sleep(args.interval)
+
+
+if __name__ == "__main__":
+    main()
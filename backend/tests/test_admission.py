@@ -0,0 +1,67 @@
+import pytest
+import redis
+
+from admission import Admission, LocalWindows, parse_limits
+
+
+class DownRedis:
+    """A client whose every call fails as if Redis were unreachable."""
+
+    def register_script(self, script):
+        def call(**kwargs):
+            raise redis.ConnectionError("down")
+        return call
+
+    def sismember(self, *args):
+        raise redis.ConnectionError("down")
+
+    def sadd(self, *args):
+        raise redis.ConnectionError("down")
+
+
+def test_parse_limits():
+    assert parse_limits("50/hour, 100/day") == [(3600000, 50), (86400000, 100)]
+    assert parse_limits("") == []
+    with pytest.raises(ValueError):
+        parse_limits("50 per hour")
+
+
+def test_redis_down_falls_back_to_local_windows():
+    admission = Admission(DownRedis(), parse_limits("3/minute"), parse_limits("2/minute"))
+    assert admission.admit("10.0.0", "vid-a") == 0
+    assert admission.admit("10.0.0", "vid-a") == 0
+    assert admission.admit("10.0.0", "vid-a") > 0
+    assert admission.admit("10.0.0", "vid-b") == 0
+    assert 0 < admission.admit("10.0.0", "vid-c") <= 60
+    assert admission.has_voted("vid-a") is False
+
+
+def test_no_redis_uses_local_windows():
+    admission = Admission(None, parse_limits("1/second"), [])
+    assert admission.admit("10.0.0", "vid-a") == 0
+    assert admission.admit("10.0.0", "vid-b") > 0
+
+
+def test_disabled_admits_everything():
+    admission = Admission(DownRedis(), parse_limits("1/minute"), parse_limits("1/minute"), enabled=False)
+    assert all(admission.admit("10.0.0", "vid-a") == 0 for _ in range(5))
+
+
+def test_local_windows_slide(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr("admission.time.monotonic", lambda: now[0])
+    windows = LocalWindows()
+    checks = [("k", 1000, 2)]
+    assert windows.admit(checks) == 0
+    now[0] += 0.5
+    assert windows.admit(checks) == 0
+    assert windows.admit(checks) == pytest.approx(0.5)
+    now[0] += 0.6
+    assert windows.admit(checks) == 0
+
+
+def test_local_windows_evict_least_recent_keys():
+    windows = LocalWindows(max_keys=2)
+    for key in ("a", "b", "c"):
+        windows.admit([(key, 60000, 1)])
+    assert list(windows._logs) == ["b", "c"]
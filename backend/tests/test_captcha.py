@@ -0,0 +1,97 @@
+import json
+import threading
+import time
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs
+
+import pytest
+
+import captcha
+
+
+class FakeSiteverify(BaseHTTPRequestHandler):
+    """Single-use tokens, like the real providers: tokens containing "good" pass once."""
+
+    def do_POST(self):
+        form = parse_qs(self.rfile.read(int(self.headers["Content-Length"])).decode())
+        token = form["response"][0]
+        server = self.server
+        server.calls.append(token)
+        if token.startswith("slow"):
+            time.sleep(server.delay)
+        ok = "good" in token and token not in server.spent
+        server.spent.add(token)
+        body = json.dumps({"success": ok}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def siteverify():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FakeSiteverify)
+    server.calls = []
+    server.spent = set()
+    server.delay = 0.5
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    captcha._results.clear()
+    yield server, f"http://127.0.0.1:{server.server_address[1]}/siteverify"
+    server.shutdown()
+    server.server_close()
+
+
+def verify(url, token, ballot, timeout=2.0):
+    return captcha.verify_captcha("turnstile", "secret", token, "10.0.0.1", timeout=timeout, verify_url=url, ballot=ballot)
+
+
+def test_valid_token_passes(siteverify):
+    server, url = siteverify
+    assert verify(url, "good-1", "vid-a") is True
+    assert server.calls == ["good-1"]
+
+
+def test_retry_of_same_ballot_reuses_result(siteverify):
+    server, url = siteverify
+    assert verify(url, "good-1", "vid-a") is True
+    assert verify(url, "good-1", "vid-a") is True
+    assert server.calls == ["good-1"]
+
+
+def test_token_cannot_be_reused_for_another_ballot(siteverify):
+    server, url = siteverify
+    assert verify(url, "good-1", "vid-a") is True
+    assert verify(url, "good-1", "vid-b") is False
+    assert server.calls == ["good-1", "good-1"]
+
+
+def test_invalid_and_missing_tokens_fail(siteverify):
+    _, url = siteverify
+    assert verify(url, "bad-1", "vid-a") is False
+    assert verify(url, "", "vid-a") is False
+
+
+def test_slow_provider_times_out(siteverify):
+    server, url = siteverify
+    assert verify(url, "slow-good", "vid-a", timeout=0.1) is False
+
+
+def test_async_result_honours_timeout(siteverify):
+    server, url = siteverify
+    server.delay = 1.0
+    future = captcha.verify_captcha_async(
+        "turnstile", "secret", "slow-good", "10.0.0.1", timeout=5.0, verify_url=url, ballot="vid-a"
+    )
+    with pytest.raises(FutureTimeoutError):
+        future.result(timeout=0.1)
+    assert future.result(timeout=5.0) is True
+
+
+def test_provider_none_always_passes():
+    assert captcha.verify_captcha_async("none", "", "").result(timeout=0) is True
@@ -0,0 +1,53 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from convert_list_bn import iter_rows  # noqa: E402
+
+
+def collect(lines):
+    issues = []
+    rows = list(iter_rows(lines, lambda *args: issues.append(args)))
+    return rows, issues
+
+
+def test_header_then_rows():
+    rows, _ = collect(["রংপুর বিভাগ", "১\tপঞ্চগড়-১\tবিএনপি\tক\tজামাত\tখ"])
+    assert rows[0]["division_bn"] == "রংপুর বিভাগ"
+    assert rows[0]["constituency_no"] == 1
+    assert (rows[0]["slot2_party"], rows[0]["slot2_candidate"]) == ("জামাত", "খ")
+
+
+def test_division_and_number_in_separate_fields():
+    rows, _ = collect(["রংপুর বিভাগ\t১\tপঞ্চগড়-১\tবিএনপি\tক", "২\tপঞ্চগড়-২\tবিএনপি\tগ"])
+    assert [r["constituency_no"] for r in rows] == [1, 2]
+    assert rows[0]["seat_bn"] == "পঞ্চগড়-১"
+    assert rows[1]["division_bn"] == "রংপুর বিভাগ"
+
+
+def test_division_and_number_in_one_field():
+    rows, _ = collect(["চট্টগ্রাম  বিভাগ ২৭৮\tফেনী-১\tবিএনপি\tক"])
+    assert rows[0]["division_bn"] == "চট্টগ্রাম বিভাগ"
+    assert rows[0]["constituency_no"] == 278
+    assert rows[0]["seat_bn"] == "ফেনী-১"
+
+
+def test_unparsed_lines_are_reported():
+    rows, issues = collect(["রংপুর বিভাগ\tকিছু লেখা", "শিরোনাম"])
+    assert rows == []
+    assert [code for _, code, *_ in issues] == ["division_header_extra", "skipped_line"]
+
+
+def test_party_label_in_candidate_column_is_reported():
+    # Row 1 of bd_candidates_bn.csv: জাপা has no candidate, so আইএবি shifts
+    # into its candidate column.
+    rows, issues = collect([
+        "রংপুর বিভাগ",
+        "১\tপঞ্চগড়-১\tবিএনপি\tমোহাম্মদ নওশাদ জমির\tএনসিপি\tসারজিস আলম\tজাপা\tআইএবি",
+    ])
+    assert (rows[0]["slot3_party"], rows[0]["slot3_candidate"]) == ("জাপা", "আইএবি")
+    assert [(level, code, no, line) for level, code, _, no, line in issues] == [
+        ("warning", "party_in_candidate_column", 1, 2),
+    ]
+    assert "আইএবি" in issues[0][2]
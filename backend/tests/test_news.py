@@ -0,0 +1,141 @@
+import json
+import time
+
+import pytest
+import requests
+
+from news import FEEDS_KEY, LOCK_KEY, NewsFetcher
+
+RSS = """<?xml version="1.0"?>
+<rss version="2.0"><channel><title>t</title>
+{items}
+</channel></rss>"""
+
+
+def rss(*titles):
+    items = "".join(
+        f"<item><title>{t}</title><link>http://x/{t}</link>"
+        f"<pubDate>Mon, 02 Feb 2026 10:00:00 GMT</pubDate></item>"
+        for t in titles
+    )
+    return RSS.format(items=items).encode()
+
+
+class FakeResponse:
+    def __init__(self, status=200, body=b"", headers=None, delay=0.0):
+        self.status_code = status
+        self.ok = status < 400
+        self.headers = headers or {}
+        self.body = body
+        self.delay = delay
+
+    def iter_content(self, size):
+        # Trickles the body out one byte at a time when ``delay`` is set.
+        if not self.delay:
+            yield self.body
+            return
+        for i in range(len(self.body)):
+            time.sleep(self.delay)
+            yield self.body[i:i + 1]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        pass
+
+
+class FakeSession:
+    def __init__(self, routes):
+        self.routes = routes
+        self.calls = []
+
+    def get(self, url, headers=None, timeout=None, stream=False):
+        self.calls.append((url, dict(headers or {})))
+        outcome = self.routes[url]
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+
+FEEDS = [{"source": "A", "url": "http://a/feed"}, {"source": "B", "url": "http://b/feed"}]
+
+
+def make_fetcher(routes, cache=None, timeout=1.0, standby=None):
+    fetcher = NewsFetcher(cache, refresh_interval=60, timeout=timeout, feeds=FEEDS, standby=standby)
+    fetcher.session = FakeSession(routes)
+    return fetcher
+
+
+def titles(payload):
+    return [item["title"] for item in payload["items"]]
+
+
+def test_merges_feeds_in_order():
+    fetcher = make_fetcher({"http://a/feed": FakeResponse(body=rss("a1", "a2")), "http://b/feed": FakeResponse(body=rss("b1"))})
+    fetcher.refresh()
+    assert titles(fetcher.payload()) == ["a1", "a2", "b1"]
+
+
+def test_failed_feed_does_not_empty_the_others():
+    fetcher = make_fetcher({"http://a/feed": FakeResponse(body=rss("a1")), "http://b/feed": FakeResponse(body=rss("b1"))})
+    fetcher.refresh()
+    fetcher.session.routes = {
+        "http://a/feed": requests.ConnectionError("down"),
+        "http://b/feed": FakeResponse(body=rss("b2")),
+    }
+    fetcher.refresh()
+    assert titles(fetcher.payload()) == ["a1", "b2"]
+
+
+def test_error_status_keeps_previous_items():
+    fetcher = make_fetcher({"http://a/feed": FakeResponse(body=rss("a1")), "http://b/feed": FakeResponse(status=500)})
+    fetcher.refresh()
+    assert titles(fetcher.payload()) == ["a1"]
+
+
+def test_slow_feed_is_cut_off_at_the_time_budget():
+    fetcher = make_fetcher({
+        "http://a/feed": FakeResponse(body=rss("a1"), delay=0.01),
+        "http://b/feed": FakeResponse(body=rss("b1")),
+    }, timeout=0.2)
+    started = time.monotonic()
+    fetcher.refresh()
+    assert time.monotonic() - started < 1.0
+    assert titles(fetcher.payload()) == ["b1"]
+
+
+def test_not_modified_reuses_items_and_sends_validators():
+    fetcher = make_fetcher({
+        "http://a/feed": FakeResponse(body=rss("a1"), headers={"ETag": '"v1"'}),
+        "http://b/feed": FakeResponse(body=rss("b1")),
+    })
+    fetcher.refresh()
+    fetcher.session.routes["http://a/feed"] = FakeResponse(status=304)
+    fetcher.refresh()
+    assert ("http://a/feed", {"If-None-Match": '"v1"'}) in fetcher.session.calls
+    assert titles(fetcher.payload()) == ["a1", "b1"]
+
+
+def test_standby_reads_shared_copy_without_fetching():
+    fakeredis = pytest.importorskip("fakeredis")
+    cache = fakeredis.FakeRedis(decode_responses=True)
+    cache.hset(FEEDS_KEY, "A", json.dumps({"items": [{"title": "shared"}], "fetched_at": 1}))
+    fetcher = make_fetcher({}, cache=cache, standby=lambda: True)
+    fetcher.tick()
+    assert fetcher.session.calls == []
+    assert not cache.exists(LOCK_KEY)
+    assert titles(fetcher.payload()) == ["shared"]
+
+
+def test_only_the_lock_holder_fetches():
+    fakeredis = pytest.importorskip("fakeredis")
+    cache = fakeredis.FakeRedis(decode_responses=True)
+    routes = {"http://a/feed": FakeResponse(body=rss("a1")), "http://b/feed": FakeResponse(body=rss("b1"))}
+    first = make_fetcher(routes, cache=cache)
+    second = make_fetcher(routes, cache=cache)
+    first.tick()
+    second.tick()
+    assert len(first.session.calls) == 2
+    assert second.session.calls == []
+    assert titles(second.payload()) == ["a1", "b1"]
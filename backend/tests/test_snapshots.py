@@ -0,0 +1,35 @@
+import json
+
+import pytest
+
+fakeredis = pytest.importorskip("fakeredis")
+
+from snapshots import VersionedSnapshot  # noqa: E402
+
+
+@pytest.fixture
+def snapshot():
+    cache = fakeredis.FakeRedis(decode_responses=True)
+    return VersionedSnapshot(cache, "results_overall", rebuild_interval=60, stale_ttl=60)
+
+
+def test_touch_after_flush_republishes(snapshot):
+    snapshot.publish({"total": 1})
+    snapshot.cache.flushdb()
+    snapshot.touch(lambda: {"total": 2})
+    body, _ = snapshot.get(lambda: pytest.fail("should serve the republished body"))
+    assert json.loads(body)["total"] == 2
+
+
+def test_touch_keeps_version(snapshot):
+    _, version = snapshot.publish({"total": 1})
+    snapshot.touch(lambda: pytest.fail("body still present"))
+    body, touched = snapshot.get(lambda: pytest.fail("snapshot is fresh"))
+    assert touched == version
+    assert json.loads(body)["total"] == 1
+
+
+def test_hash_without_body_is_a_miss(snapshot):
+    snapshot.cache.hset(snapshot.key, "built_at", 9e12)
+    body, _ = snapshot.get(lambda: {"total": 3})
+    assert json.loads(body)["total"] == 3
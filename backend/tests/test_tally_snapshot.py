@@ -0,0 +1,47 @@
+from array import array
+
+import pytest
+
+from tally_snapshot import TallySnapshot
+
+
+CID = "ab" * 20
+
+
+@pytest.fixture
+def snapshot_file(tmp_path):
+    path = str(tmp_path / "tallies.bin")
+    TallySnapshot(
+        generation=3,
+        slots=1,
+        seat_nos=array("I", [1, 2]),
+        cids=[CID, None],
+        counters=array("I", [7, 0]),
+        series=array("I", [1, 2, 3]),
+        bucket_seconds=60,
+        extras={2: {"x": 1}},
+    ).write(path)
+    return path
+
+
+def test_round_trip(snapshot_file):
+    snap = TallySnapshot.open(snapshot_file)
+    assert snap.generation == 3
+    assert snap.totals()[1] == {CID: 7}
+    snap.close()
+
+
+@pytest.mark.parametrize("cut", [10, 60, 90, -5])
+def test_truncated_file_is_ignored(snapshot_file, cut):
+    with open(snapshot_file, "rb") as f:
+        data = f.read()
+    with open(snapshot_file, "wb") as f:
+        f.write(data[:cut])
+    assert TallySnapshot.open(snapshot_file) is None
+
+
+def test_garbage_and_missing_files_are_ignored(tmp_path):
+    path = tmp_path / "garbage.bin"
+    path.write_bytes(b"not a snapshot at all" * 10)
+    assert TallySnapshot.open(str(path)) is None
+    assert TallySnapshot.open(str(tmp_path / "missing.bin")) is None
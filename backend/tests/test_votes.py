@@ -0,0 +1,38 @@
+import pytest
+
+fakeredis = pytest.importorskip("fakeredis")
+mongomock = pytest.importorskip("mongomock")
+
+import redis  # noqa: E402
+
+from votes import BallotNotRecorded, commit_vote  # noqa: E402
+from writebehind import VoteBuffer  # noqa: E402
+
+
+class DownBuffer:
+    def record(self, vote):
+        raise redis.ConnectionError("Redis circuit open")
+
+
+@pytest.fixture
+def db():
+    db = mongomock.MongoClient().db
+    db.voters.create_index("voter_vid_hash", unique=True)
+    return db
+
+
+def ballot():
+    return {"voter_vid_hash": "v1"}, {"constituency_no": 1, "candidate_id": "a", "voted_at": None}
+
+
+def test_voter_can_retry_after_buffer_failure(db):
+    with pytest.raises(BallotNotRecorded):
+        commit_vote(db, *ballot(), buffer=DownBuffer())
+    assert db.voters.count_documents({}) == 0
+
+    cache = fakeredis.FakeRedis(decode_responses=True)
+    buffer = VoteBuffer(db, cache, flush_interval=1, batch_size=100)
+    buffer.reconcile()
+    updated = commit_vote(db, *ballot(), buffer=buffer)
+    assert updated["totals"] == {"a": 1}
+    assert db.voters.count_documents({"voter_vid_hash": "v1"}) == 1
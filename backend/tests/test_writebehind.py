@@ -0,0 +1,36 @@
+import pytest
+
+fakeredis = pytest.importorskip("fakeredis")
+mongomock = pytest.importorskip("mongomock")
+
+from writebehind import READY_KEY, NotReady, VoteBuffer, tally_key  # noqa: E402
+
+
+@pytest.fixture
+def buffer():
+    cache = fakeredis.FakeRedis(decode_responses=True)
+    db = mongomock.MongoClient().db
+    db.tallies.insert_one({"constituency_no": 1, "totals": {"a": 5}})
+    return VoteBuffer(db, cache, flush_interval=1, batch_size=100)
+
+
+def vote(cid="a"):
+    return {"constituency_no": 1, "candidate_id": cid, "voted_at": None}
+
+
+def test_reads_wait_for_reconcile(buffer):
+    # Redis came back empty: the hash only has what arrived since.
+    buffer.cache.hset(tally_key(1), "a", 1)
+    with pytest.raises(NotReady):
+        buffer.totals_many([1])
+    with pytest.raises(NotReady):
+        buffer.totals(1)
+    assert buffer.record(vote()) is None
+
+
+def test_reconciled_totals_include_buffered_votes(buffer):
+    buffer.record(vote())
+    buffer.reconcile()
+    assert buffer.cache.exists(READY_KEY)
+    assert buffer.totals_many([1, 2]) == {1: {"a": 6}, 2: {}}
+    assert buffer.record(vote("b")) == {"a": 6, "b": 1}
@@ -0,0 +1,49 @@
+from pymongo import ReturnDocument
+
+
+class BallotNotRecorded(Exception):
+    """The write-behind buffer could not take the ballot; the voter may retry."""
+
+
+def _write_ballot(db, voter: dict, vote: dict, session=None, tallies=None):
+    # The voters insert goes first: its unique index on voter_vid_hash is what
+    # rejects repeat voters, raising DuplicateKeyError before anything counts.
+    db.voters.insert_one(voter, session=session)
+    db.votes.insert_one(vote, session=session)
+    if tallies is not None:
+        return tallies.increment(vote, session=session)
+    return db.tallies.find_one_and_update(
+        {"constituency_no": vote["constituency_no"]},
+        {"$inc": {f"totals.{vote['candidate_id']}": 1}, "$set": {"updated_at": vote["voted_at"]}},
+        upsert=True,
+        projection={"_id": 0},
+        return_document=ReturnDocument.AFTER,
+        session=session,
+    )
+
+
+def commit_vote(db, voter: dict, vote: dict, use_transaction: bool = False, buffer=None, tallies=None) -> dict:
+    """Record one ballot and return the seat's updated tally document.
+
+    With ``use_transaction`` (needs a replica set) the voter, vote and tally
+    writes commit atomically. With a write-behind ``buffer`` only the voter
+    insert goes to Mongo; the vote and tally are handed to Redis and flushed
+    later; the returned totals are None while the buffer's Redis tallies are
+    being rebuilt. A ``tallies`` store (see tallies.py) spreads hot seats over
+    shard documents. Raises DuplicateKeyError if the voter has already voted,
+    and BallotNotRecorded if the buffer is unreachable.
+    """
+    if buffer is not None:
+        db.voters.insert_one(voter)
+        try:
+            totals = buffer.record(vote)
+        except Exception as exc:
+            # The ballot never reached Redis: drop the voter row again so the
+            # voter is not locked out by a vote that was not counted.
+            db.voters.delete_one({"_id": voter["_id"]})
+            raise BallotNotRecorded() from exc
+        return {"constituency_no": vote["constituency_no"], "totals": totals}
+    if not use_transaction:
+        return _write_ballot(db, voter, vote, tallies=tallies)
+    with db.client.start_session() as session:
+        return session.with_transaction(lambda s: _write_ballot(db, voter, vote, session=s, tallies=tallies))
@@ -0,0 +1,185 @@
+import argparse
+import json
+import logging
+import time
+from datetime import datetime, timezone
+
+from catalog import CatalogHolder
+from config import load_config
+from db import ensure_indexes
+from live import CHANNEL
+from news import NewsFetcher
+from projection import LEVELS, METHODS, project
+from resources import Resources
+from results import ResultsAggregator
+from snapshots import VersionedSnapshot
+from tally_snapshot import TallySnapshot
+
+
+HEARTBEAT_KEY = "precompute:heartbeat"
+PROJECTION_KEY = "precompute:projection:{}:{}:{}"
+NEWS_KEY = "precompute:news"
+# Draws for projections served without ?draws=, and every value ?draws= may
+# take; each is precomputed, so clients cannot ask for arbitrary simulations.
+DEFAULT_DRAWS = 10000
+DRAW_COUNTS = (1000, DEFAULT_DRAWS)
+
+log = logging.getLogger(__name__)
+
+
+def overall_payload(aggregator) -> dict:
+    payload = aggregator.payload()
+    payload["updated_at"] = datetime.now(timezone.utc).isoformat()
+    return payload
+
+
+def projection_payload(inputs: dict, method: str, level: str, draws: int) -> dict:
+    payload = project(
+        inputs["constituencies"],
+        inputs["seat_totals"],
+        inputs["seats_leading"],
+        inputs["votes_by_group"],
+        inputs["unresolved"],
+        method=method,
+        level=level,
+        draws=draws,
+    )
+    payload["updated_at"] = datetime.now(timezone.utc).isoformat()
+    return payload
+
+
+class Precomputed:
+    """Web-side reader for bodies published by the precompute worker.
+
+    A body is only used while the worker's heartbeat is present, so if the
+    worker stops, callers get None within the heartbeat TTL and compute on
+    demand as before.
+    """
+
+    def __init__(self, cache):
+        self.cache = cache
+
+    def get(self, key: str):
+        if not self.cache:
+            return None
+        try:
+            heartbeat, body = self.cache.mget([HEARTBEAT_KEY, key])
+        except Exception:
+            return None
+        return body if heartbeat else None
+
+    def alive(self) -> bool:
+        if not self.cache:
+            return False
+        try:
+            return bool(self.cache.exists(HEARTBEAT_KEY))
+        except Exception:
+            return False
+
+
+class PrecomputeWorker:
+    """Builds overall results, projections and news outside the request path.
+
+    Every ``interval`` seconds, and ``debounce`` seconds after a vote shows up
+    on the live results channel, one round refreshes the aggregator from the
+    tallies and publishes the overall results into the shared
+    ``results_overall`` snapshot. Projections for every method and level are
+    rebuilt at most once per RESULTS_REBUILD_INTERVAL, and only after the
+    tallies changed. News feeds are fetched on their own thread. Each round
+    renews the heartbeat that tells web workers to read rather than build.
+    """
+
+    def __init__(self, cfg, resources):
+        self.cfg = cfg
+        self.resources = resources
+        self.cache = resources.redis
+        self.catalog = CatalogHolder(resources.db, cfg.catalog_check_interval)
+        self.aggregator = ResultsAggregator()
+        if cfg.tally_snapshot_path:
+            snapshot = TallySnapshot.open(cfg.tally_snapshot_path)
+            if snapshot is not None:
+                self.aggregator.seed(snapshot, self.catalog.get())
+                snapshot.close()
+        self.results_snapshot = VersionedSnapshot(
+            self.cache,
+            "results_overall",
+            rebuild_interval=cfg.results_rebuild_interval,
+            stale_ttl=cfg.results_stale_ttl,
+        )
+        self.news_fetcher = NewsFetcher(self.cache, cfg.news_cache_ttl, cfg.news_fetch_timeout)
+        self._published_revision = None
+        self._projected_revision = None
+        self._projected_at = 0.0
+
+    def run_once(self):
+        started = time.monotonic()
+        self.aggregator.refresh(self.resources.heavy_db, self.catalog.get())
+        revision = self.aggregator.revision
+        if revision != self._published_revision:
+            self.results_snapshot.publish(overall_payload(self.aggregator))
+            self._published_revision = revision
+        else:
+            self.results_snapshot.touch(lambda: overall_payload(self.aggregator))
+
+        ttl = self.cfg.results_stale_ttl
+        if revision != self._projected_revision and started - self._projected_at >= self.cfg.results_rebuild_interval:
+            for level in LEVELS:
+                inputs = self.aggregator.projection_inputs(level)
+                for method in METHODS:
+                    for draws in DRAW_COUNTS:
+                        body = json.dumps(projection_payload(inputs, method, level, draws))
+                        self.cache.set(PROJECTION_KEY.format(method, level, draws), body, ex=ttl)
+            self._projected_revision = revision
+            self._projected_at = started
+
+        self.cache.set(NEWS_KEY, json.dumps(self.news_fetcher.payload()), ex=ttl)
+        self.cache.set(HEARTBEAT_KEY, time.time(), ex=self.cfg.precompute_heartbeat_ttl)
+
+    def run(self):
+        self.news_fetcher.start()
+        pubsub = None
+        next_round = 0.0
+        while True:
+            now = time.monotonic()
+            if now >= next_round:
+                try:
+                    self.run_once()
+                except Exception:
+                    log.exception("precompute round failed")
+                next_round = time.monotonic() + self.cfg.precompute_interval
+            try:
+                if pubsub is None:
+                    pubsub = self.cache.pubsub(ignore_subscribe_messages=True)
+                    pubsub.subscribe(CHANNEL)
+                message = pubsub.get_message(timeout=max(next_round - time.monotonic(), 0.01))
+                if message and message.get("type") == "message":
+                    # A vote landed; pick up the rest of the burst, then recompute.
+                    next_round = min(next_round, time.monotonic() + self.cfg.precompute_debounce)
+            except Exception:
+                pubsub = None
+                time.sleep(max(min(next_round - time.monotonic(), 1.0), 0))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Precompute results, projections and news into Redis.")
+    parser.add_argument("--once", action="store_true", help="run a single round and exit")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    cfg = load_config()
+    if not cfg.mongo_uri:
+        raise RuntimeError("MONGODB_URI is required")
+    if not cfg.redis_cache_url:
+        raise RuntimeError("REDIS_CACHE_URL is required")
+
+    resources = Resources(cfg)
+    ensure_indexes(resources.db)
+    worker = PrecomputeWorker(cfg, resources)
+    if args.once:
+        worker.news_fetcher.refresh()
+        worker.run_once()
+        return
+    worker.run()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,5 @@
+#!/bin/sh
+set -e
+
+echo "Starting precompute worker..."
+exec python worker.py
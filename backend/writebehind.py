@@ -0,0 +1,229 @@
+import json
+import logging
+import threading
+import time
+import uuid
+from collections import Counter
+from datetime import datetime, timezone
+
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+
+from tallies import read_tallies
+
+
+STREAM_KEY = "votes:stream"
+READY_KEY = "tallies:ready"
+FLUSHER_LOCK_KEY = "votes:flusher:lock"
+
+log = logging.getLogger(__name__)
+
+# Rebuilds every tally:<no> hash atomically from the Mongo totals passed in
+# ARGV[2], plus any stream entries appended after ARGV[1] while the caller was
+# reading, so votes landing during a reconcile are not lost.
+RECONCILE_SCRIPT = """
+local base = cjson.decode(ARGV[2])
+local entries = redis.call('XRANGE', KEYS[1], '(' .. ARGV[1], '+')
+for _, entry in ipairs(entries) do
+  local fields = entry[2]
+  local no, cid
+  for i = 1, #fields, 2 do
+    if fields[i] == 'constituency_no' then no = fields[i + 1] end
+    if fields[i] == 'candidate_id' then cid = fields[i + 1] end
+  end
+  if no and cid then
+    base[no] = base[no] or {}
+    base[no][cid] = (base[no][cid] or 0) + 1
+  end
+end
+for no, totals in pairs(base) do
+  local key = 'tally:' .. no
+  redis.call('DEL', key)
+  for cid, n in pairs(totals) do
+    redis.call('HSET', key, cid, n)
+  end
+end
+redis.call('SET', KEYS[2], '1')
+return #entries
+"""
+
+
+class NotReady(Exception):
+    """The Redis tally hashes are missing or still being rebuilt by reconcile."""
+
+
+def tally_key(constituency_no) -> str:
+    return f"tally:{constituency_no}"
+
+
+def sortable_id(entry_id: str) -> str:
+    # Stream ids are "<ms>-<seq>"; zero-pad both parts so they order as strings.
+    ms, seq = entry_id.split("-")
+    return f"{int(ms):015d}-{int(seq):010d}"
+
+
+def _encode(vote: dict) -> dict:
+    fields = {}
+    for k, v in vote.items():
+        if v is None:
+            continue
+        fields[k] = v.isoformat() if isinstance(v, datetime) else str(v)
+    return fields
+
+
+def _decode(fields: dict) -> dict:
+    vote = dict(fields)
+    vote["constituency_no"] = int(vote["constituency_no"])
+    if "voted_at" in vote:
+        vote["voted_at"] = datetime.fromisoformat(vote["voted_at"])
+    return vote
+
+
+class VoteBuffer:
+    """Write-behind path for ballots (VOTE_WRITE_MODE=buffered).
+
+    ``record`` bumps the seat's Redis hash with HINCRBY and appends the raw
+    vote to a Redis stream in one MULTI. A single flusher, elected with a
+    Redis lock, drains the stream in id order into Mongo with ``insert_many``
+    and ``bulk_write``. Each tally document remembers the last stream id it
+    absorbed (``flushed_through``) and votes carry a unique ``stream_id``, so
+    replaying a batch after a crash never double counts.
+    """
+
+    def __init__(self, db, cache, flush_interval: float, batch_size: int):
+        self.db = db
+        self.cache = cache
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.token = uuid.uuid4().hex
+        self._reconcile = cache.register_script(RECONCILE_SCRIPT)
+        self._thread = None
+
+    def record(self, vote: dict) -> dict:
+        key = tally_key(vote["constituency_no"])
+        pipe = self.cache.pipeline()
+        pipe.hincrby(key, vote["candidate_id"], 1)
+        pipe.xadd(STREAM_KEY, _encode(vote))
+        pipe.hgetall(key)
+        pipe.exists(READY_KEY)
+        _, _, totals, ready = pipe.execute()
+        # Until reconcile has run, the hash only holds votes since Redis
+        # came back; the vote is safe in the stream, but its totals are not.
+        return {cid: int(n) for cid, n in totals.items()} if ready else None
+
+    def totals(self, constituency_no: int) -> dict:
+        return self.totals_many([constituency_no])[constituency_no]
+
+    def totals_many(self, nos) -> dict:
+        """Seat totals from the Redis hashes; raises NotReady before reconcile has finished."""
+        pipe = self.cache.pipeline(transaction=False)
+        pipe.exists(READY_KEY)
+        for no in nos:
+            pipe.hgetall(tally_key(no))
+        ready, *results = pipe.execute()
+        if not ready:
+            raise NotReady()
+        return {no: {cid: int(n) for cid, n in totals.items()} for no, totals in zip(nos, results)}
+
+    def start(self):
+        if self._thread:
+            return
+        self._thread = threading.Thread(target=self._run, name="vote-flusher", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while True:
+            try:
+                if self._is_leader():
+                    if not self.cache.exists(READY_KEY):
+                        self.reconcile()
+                    while self.flush_once() >= self.batch_size:
+                        pass
+            except Exception:
+                log.exception("vote flush failed")
+            time.sleep(self.flush_interval)
+
+    def _is_leader(self) -> bool:
+        ttl = max(int(self.flush_interval * 10), 5)
+        if self.cache.set(FLUSHER_LOCK_KEY, self.token, nx=True, ex=ttl):
+            return True
+        if self.cache.get(FLUSHER_LOCK_KEY) == self.token:
+            self.cache.expire(FLUSHER_LOCK_KEY, ttl)
+            return True
+        return False
+
+    def reconcile(self):
+        """Rebuild the Redis tally hashes from Mongo plus unflushed stream entries."""
+        flushed = {}
+        base = {}
+        for t in read_tallies(self.db):
+            no = str(t.get("constituency_no"))
+            base[no] = dict(t.get("totals", {}))
+            flushed[no] = t.get("flushed_through")
+
+        last_id = "0-0"
+        while True:
+            entries = self.cache.xrange(STREAM_KEY, min=f"({last_id}", count=self.batch_size)
+            if not entries:
+                break
+            for entry_id, fields in entries:
+                last_id = entry_id
+                no = fields.get("constituency_no")
+                through = flushed.get(no)
+                if through and sortable_id(entry_id) <= through:
+                    continue
+                seat = base.setdefault(no, {})
+                seat[fields["candidate_id"]] = seat.get(fields["candidate_id"], 0) + 1
+        replayed = self._reconcile(keys=[STREAM_KEY, READY_KEY], args=[last_id, json.dumps(base)])
+        log.info("reconciled %d tally hashes (%d late stream entries)", len(base), replayed)
+
+    def flush_once(self) -> int:
+        entries = self.cache.xrange(STREAM_KEY, count=self.batch_size)
+        if not entries:
+            return 0
+        self._apply(entries)
+        self.cache.xdel(STREAM_KEY, *[entry_id for entry_id, _ in entries])
+        return len(entries)
+
+    def _apply(self, entries):
+        by_seat = {}
+        docs = []
+        for entry_id, fields in entries:
+            vote = _decode(fields)
+            vote["stream_id"] = sortable_id(entry_id)
+            docs.append(vote)
+            by_seat.setdefault(vote["constituency_no"], []).append(vote)
+
+        # Votes first: if we crash before the tallies are written, the replay
+        # skips the already-inserted rows and still applies the increments.
+        try:
+            self.db.votes.insert_many(docs, ordered=False)
+        except BulkWriteError as exc:
+            if any(e.get("code") != 11000 for e in exc.details.get("writeErrors", [])):
+                raise
+
+        flushed = {
+            t["constituency_no"]: t.get("flushed_through")
+            for t in self.db.tallies.find(
+                {"constituency_no": {"$in": list(by_seat)}},
+                {"_id": 0, "constituency_no": 1, "flushed_through": 1},
+            )
+        }
+        ops = []
+        now = datetime.now(timezone.utc)
+        for no, votes in by_seat.items():
+            through = flushed.get(no)
+            fresh = [v for v in votes if through is None or v["stream_id"] > through]
+            if not fresh:
+                continue
+            counts = Counter(v["candidate_id"] for v in fresh)
+            ops.append(UpdateOne(
+                {"constituency_no": no, "flushed_through": through},
+                {
+                    "$inc": {f"totals.{cid}": n for cid, n in counts.items()},
+                    "$set": {"updated_at": now, "flushed_through": fresh[-1]["stream_id"]},
+                },
+                upsert=True,
+            ))
+        if ops:
+            self.db.tallies.bulk_write(ops, ordered=False)
@@ -1,16 +1,44 @@
-import re
+import argparse
 import csv
+import json
+import re
+import sys
+import time
 
 BN_DIGITS = str.maketrans("০১২৩৪৫৬৭৮৯", "0123456789")
+SLOTS = 4
+
+WHITESPACE = re.compile(r"\s+")
+MULTI_SPACE = re.compile(r"\s{2,}")
+BN_NUMBER = re.compile(r"^[০-৯]+$")
+ANY_NUMBER = re.compile(r"^[০-৯0-9]+$")
+# "রংপুর বিভাগ ১" (division and seat number in one field), optionally
+# followed by more of the row.
+DIVISION_PREFIX = re.compile(r"^(.*বিভাগ)\s+([০-৯]+)(?:\s+(.*))?$")
+
+DIVISION_WORD = "বিভাগ"
+POSTPONED_WORD = "স্থগিত"
+POSTPONED_NOTE = "নির্বাচন স্থগিত"
+# Dash-ish placeholders the source uses for "no candidate"
+EMPTY_VALUES = {"—", "-", "N/A", "n/a", "না", "নাই", "ন/a"}
+# Party labels as they appear in the source; one of these in a candidate
+# column means the party/candidate pairs are shifted.
+KNOWN_PARTIES = {"বিএনপি", "জামাত", "জাপা", "এনসিপি", "আইএবি"}
+
+FIELDNAMES = ["division_bn", "constituency_no", "seat_bn"]
+for _i in range(1, SLOTS + 1):
+    FIELDNAMES += [f"slot{_i}_party", f"slot{_i}_candidate"]
+FIELDNAMES.append("notes")
+
 
 def bn_to_int(s: str):
     s = s.translate(BN_DIGITS)
     return int(s)
 
 def clean(x: str) -> str:
-    x = re.sub(r"\s+", " ", x or "").strip()
+    x = WHITESPACE.sub(" ", x or "").strip()
     # Normalize dash-ish values
-    if x in {"—", "-", "— ", " - ", "N/A", "n/a", "না", "নাই", "ন/a"}:
+    if x in EMPTY_VALUES:
         return ""
     return x
 
@@ -19,48 +47,63 @@ def split_fields(line: str):
     if "\t" in line:
         parts = [p for p in line.split("\t") if p.strip() != ""]
     else:
-        parts = [p for p in re.split(r"\s{2,}", line) if p.strip() != ""]
+        parts = [p for p in MULTI_SPACE.split(line) if p.strip() != ""]
     return [clean(p) for p in parts]
 
 def is_division_header(parts):
     # e.g. "রংপুর বিভাগ", "চট্টগ্রাম  বিভাগ"
-    return len(parts) >= 1 and "বিভাগ" in parts[0] and not re.match(r"^[০-৯0-9]+$", parts[0])
+    return len(parts) >= 1 and DIVISION_WORD in parts[0] and not ANY_NUMBER.match(parts[0])
+
+def split_division_prefix(parts):
+    """Split a row that starts with its division, e.g. "রংপুর বিভাগ ১ পঞ্চগড়-১ ...".
+
+    Returns (division, row parts starting at the number), or (None, parts).
+    """
+    if not parts or DIVISION_WORD not in parts[0]:
+        return None, parts
+    if len(parts) >= 3 and BN_NUMBER.match(parts[1]):
+        return normalize_division_name(parts[0]), parts[1:]
+    m = DIVISION_PREFIX.match(parts[0])
+    if m:
+        head = [m.group(2)] + ([m.group(3)] if m.group(3) else [])
+        return normalize_division_name(m.group(1)), head + parts[1:]
+    return None, parts
 
 def looks_like_row_start(parts):
     # row starts with Bengali number like "১" or "২৯৮"
-    return len(parts) >= 2 and re.match(r"^[০-৯]+$", parts[0])
+    return len(parts) >= 2 and BN_NUMBER.match(parts[0])
 
 def normalize_division_name(s: str) -> str:
-    return re.sub(r"\s+", " ", s).strip()
+    return WHITESPACE.sub(" ", s).strip()
 
-def parse_row(parts, current_division):
+def _ignore(*args):
+    pass
+
+def parse_row(parts, current_division, issue=_ignore):
     # Expected rough pattern:
     # [no, seat, party1, cand1, party2, cand2, party3, cand3, party4, cand4]
     # But sometimes extra notes like "নির্বাচন স্থগিত"
-    # We'll be defensive.
-
-    row = {
-        "division_bn": current_division,
-        "constituency_no": "",
-        "seat_bn": "",
-        "slot1_party": "", "slot1_candidate": "",
-        "slot2_party": "", "slot2_candidate": "",
-        "slot3_party": "", "slot3_candidate": "",
-        "slot4_party": "", "slot4_candidate": "",
-        "notes": "",
-    }
+    # We'll be defensive; anything suspicious goes to ``issue``.
+
+    row = dict.fromkeys(FIELDNAMES, "")
+    row["division_bn"] = current_division
 
     # Constituency no
     try:
-        row["constituency_no"] = bn_to_int(parts[0])
+        no = bn_to_int(parts[0])
     except Exception:
         row["notes"] = "could_not_parse_constituency_no"
+        issue("error", "bad_constituency_no", f"cannot parse {parts[0]!r}")
         return row
+    row["constituency_no"] = no
+    if not current_division:
+        issue("warning", "no_division", "row appears before any division header", no)
 
     # Handle postponed line style: e.g. ["১৪৫", "শেরপুর-৩", "নির্বাচন স্থগিত"]
-    if len(parts) >= 3 and "স্থগিত" in " ".join(parts[2:]):
+    if len(parts) >= 3 and POSTPONED_WORD in " ".join(parts[2:]):
         row["seat_bn"] = parts[1]
-        row["notes"] = "নির্বাচন স্থগিত"
+        row["notes"] = POSTPONED_NOTE
+        issue("info", "postponed", "election postponed", no)
         return row
 
     # seat
@@ -71,76 +114,151 @@ def parse_row(parts, current_division):
     rest = parts[2:]
 
     # Some rows contain inline note like "ইসলামী আন্দোলনের প্রার্থীকে সমর্থন[১]"
-    # We'll keep anything containing "সমর্থন" or bracket ref as notes if it breaks pairing.
-    # Pair parse: party, candidate repeated.
+    # Pair parse: party, candidate repeated; an unpaired token becomes a note.
     pairs = []
     i = 0
     while i < len(rest):
-        party = rest[i] if i < len(rest) else ""
+        party = rest[i]
         cand = rest[i+1] if i+1 < len(rest) else ""
-        # If party looks like a long note and candidate missing, treat as note
         if cand == "" and party:
-            # note-ish
             row["notes"] = (row["notes"] + " | " if row["notes"] else "") + party
+            issue("warning", "notes_fallback", f"unpaired token {party!r} kept as note", no)
             i += 1
             continue
         pairs.append((party, cand))
         i += 2
 
-    # Fill up to 4 slots
-    for idx in range(4):
-        if idx < len(pairs):
-            row[f"slot{idx+1}_party"] = pairs[idx][0]
-            row[f"slot{idx+1}_candidate"] = pairs[idx][1]
+    if len(pairs) > SLOTS:
+        dropped = ", ".join(f"{p}/{c}" for p, c in pairs[SLOTS:])
+        issue("warning", "extra_pairs_dropped", f"more than {SLOTS} pairs; dropped {dropped}", no)
+
+    # Fill up to SLOTS slots
+    for idx, (party, cand) in enumerate(pairs[:SLOTS], start=1):
+        row[f"slot{idx}_party"] = party
+        row[f"slot{idx}_candidate"] = cand
+        if cand in KNOWN_PARTIES:
+            issue("warning", "party_in_candidate_column",
+                  f"slot{idx} candidate is the party label {cand!r} (party {party!r})", no)
+        elif cand and not party:
+            issue("warning", "missing_party", f"slot{idx} candidate {cand!r} has no party", no)
 
     return row
 
-def main():
-    input_path = "input.txt"
-    output_path = "bd_candidates_bn.csv"
+def iter_rows(lines, issue=_ignore):
+    """Yield one CSV row dict per constituency line of ``lines``.
 
-    rows = []
+    Works line by line, so memory stays flat however long the source is.
+    ``issue(level, code, message, constituency_no, line_no)`` receives every
+    problem found along the way.
+    """
     current_division = ""
+    previous_no = None
+    for line_no, raw_line in enumerate(lines, start=1):
+        line = raw_line.strip()
+        if not line:
+            continue
+
+        def report(level, code, message, constituency_no=None, _line_no=line_no):
+            issue(level, code, message, constituency_no, _line_no)
+
+        parts = split_fields(line)
+
+        # Some lines begin with division + number in same line
+        # Example: "রংপুর বিভাগ ১ পঞ্চগড়-১ ..."; checked before the header
+        # test, which would otherwise swallow the whole row.
+        division, parts = split_division_prefix(parts)
+        if division:
+            current_division = division
+        elif is_division_header(parts):
+            current_division = normalize_division_name(parts[0])
+            if len(parts) > 1:
+                report("warning", "division_header_extra",
+                       f"ignored text after division header: {' '.join(parts[1:])[:60]!r}")
+            continue
+
+        if not looks_like_row_start(parts):
+            report("info", "skipped_line", f"not a constituency row: {line[:60]!r}")
+            continue
+
+        row = parse_row(parts, current_division, report)
+        no = row["constituency_no"]
+        # A drop back to 1 starts the next election in a multi-election dump.
+        if isinstance(no, int) and previous_no is not None and no <= previous_no and no != 1:
+            report("warning", "out_of_order", f"follows {previous_no}", no)
+        if isinstance(no, int):
+            previous_no = no
+        yield row
+
+def convert(input_path, output_path, report_path=None):
+    """Stream ``input_path`` into the CSV; returns (rows, issue counts by code)."""
+    counts = {}
+    report_file = open(report_path, "w", encoding="utf-8") if report_path else None
+
+    def issue(level, code, message, constituency_no, line_no):
+        key = (level, code)
+        counts[key] = counts.get(key, 0) + 1
+        if report_file:
+            report_file.write(json.dumps({
+                "line": line_no,
+                "constituency_no": constituency_no,
+                "level": level,
+                "code": code,
+                "message": message,
+            }, ensure_ascii=False) + "\n")
+
+    rows = 0
+    try:
+        with open(input_path, "r", encoding="utf-8") as f, \
+                open(output_path, "w", encoding="utf-8", newline="") as out:
+            w = csv.DictWriter(out, fieldnames=FIELDNAMES)
+            w.writeheader()
+            for row in iter_rows(f, issue):
+                w.writerow(row)
+                rows += 1
+    finally:
+        if report_file:
+            report_file.close()
+    return rows, counts
+
+def benchmark(input_path, repeat):
+    # Parse the input ``repeat`` times back to back, as one long dump, without
+    # touching the disk for output.
+    import resource
+
+    counted = {"lines": 0}
+
+    def lines():
+        for _ in range(repeat):
+            with open(input_path, "r", encoding="utf-8") as f:
+                for line in f:
+                    counted["lines"] += 1
+                    yield line
+
+    start = time.perf_counter()
+    rows = sum(1 for _ in iter_rows(lines()))
+    elapsed = time.perf_counter() - start
+    peak_kib = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    print(f"{counted['lines']} lines, {rows} rows in {elapsed:.2f}s: "
+          f"{counted['lines'] / elapsed:,.0f} lines/s, {rows / elapsed:,.0f} rows/s, "
+          f"peak RSS {peak_kib / 1024:.1f} MiB")
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert the Bengali candidate list to CSV.")
+    parser.add_argument("--input", default="input.txt")
+    parser.add_argument("--output", default="bd_candidates_bn.csv")
+    parser.add_argument("--report", help="write issues as JSON lines to this file")
+    parser.add_argument("--benchmark", type=int, metavar="N",
+                        help="parse the input N times without writing and print throughput")
+    args = parser.parse_args()
+
+    if args.benchmark:
+        benchmark(args.input, args.benchmark)
+        return
 
-    with open(input_path, "r", encoding="utf-8") as f:
-        for raw_line in f:
-            line = raw_line.strip()
-            if not line:
-                continue
-
-            parts = split_fields(line)
-
-            # Detect division header
-            if is_division_header(parts):
-                current_division = normalize_division_name(parts[0])
-                continue
-
-            # Some lines begin with division + number in same line
-            # Example: "রংপুর বিভাগ ১ পঞ্চগড়-১ ..."
-            if len(parts) >= 3 and "বিভাগ" in parts[0] and re.match(r"^[০-৯]+$", parts[1]):
-                current_division = normalize_division_name(parts[0])
-                # convert into a row by shifting
-                parts = [parts[1]] + parts[2:]
-
-            if looks_like_row_start(parts):
-                rows.append(parse_row(parts, current_division))
-
-    fieldnames = [
-        "division_bn","constituency_no","seat_bn",
-        "slot1_party","slot1_candidate",
-        "slot2_party","slot2_candidate",
-        "slot3_party","slot3_candidate",
-        "slot4_party","slot4_candidate",
-        "notes"
-    ]
-
-    with open(output_path, "w", encoding="utf-8", newline="") as out:
-        w = csv.DictWriter(out, fieldnames=fieldnames)
-        w.writeheader()
-        for r in rows:
-            w.writerow(r)
-
-    print(f"✅ Wrote {len(rows)} rows to {output_path}")
+    rows, counts = convert(args.input, args.output, args.report)
+    print(f"✅ Wrote {rows} rows to {args.output}")
+    for (level, code), n in sorted(counts.items()):
+        print(f"  {level}: {code} x{n}", file=sys.stderr)
 
 if __name__ == "__main__":
     main()
@@ -179,22 +179,66 @@ export default function StatsPage({ lang }) {
     }
 
     let active = true
+    let source = null
+    let pollId = null
+    const store = (data) => {
+      setStats(data)
+      setLoadingStats(false)
+      localStorage.setItem(STATS_CACHE_KEY, JSON.stringify(data))
+    }
     const load = () => {
       setLoadingStats(true)
       apiGet('/api/results/overall').then((data) => {
         if (!active) return
-        setStats(data)
-        setLoadingStats(false)
-        localStorage.setItem(STATS_CACHE_KEY, JSON.stringify(data))
+        store(data)
       }).catch(() => {
         setLoadingStats(false)
       })
     }
-    load()
-    const id = setInterval(load, 10000)
+    const poll = () => {
+      load()
+      pollId = setInterval(load, 10000)
+    }
+    const stream = () => {
+      source = new EventSource('/api/results/stream', { withCredentials: true })
+      source.addEventListener('snapshot', (e) => {
+        if (active) store(JSON.parse(e.data))
+      })
+      source.addEventListener('summary', (e) => {
+        if (!active) return
+        const summary = JSON.parse(e.data)
+        setStats((prev) => ({ ...summary, leaders_by_constituency: prev?.leaders_by_constituency || {} }))
+      })
+      source.addEventListener('seat', (e) => {
+        if (!active) return
+        const seat = JSON.parse(e.data)
+        setStats((prev) => prev && ({
+          ...prev,
+          leaders_by_constituency: {
+            ...(prev.leaders_by_constituency || {}),
+            [seat.constituency_no]: { leader: seat.leader, is_tied: seat.is_tied }
+          }
+        }))
+        setSeatDetail((prev) => (prev && prev.constituency_no === seat.constituency_no
+          ? { ...prev, totals: seat.totals, leader: seat.leader, is_tied: seat.is_tied }
+          : prev))
+      })
+      source.addEventListener('reset', () => {
+        source.close()
+        if (active) stream()
+      })
+    }
+    apiGet('/api/config').then((cfg) => {
+      if (!active) return
+      if (cfg.live_results && typeof EventSource !== 'undefined') stream()
+      else poll()
+    }).catch(() => {
+      if (active) poll()
+    })
     return () => {
       active = false
-      clearInterval(id)
+      if (source) source.close()
+      if (pollId) clearInterval(pollId)
     }
   }, [])
 